@@ -0,0 +1,103 @@
+"""
+Checks the import cost of the packages against a budget, using `python -X importtime`.
+
+Every package is imported in a fresh interpreter. The check fails when an import loads a heavy dependency that
+should only be imported on first use, or when it takes longer than its budget. The budgets are measured relative
+to importing pandas and numpy, which every package needs, so they hold on slower machines too.
+
+Run from the repository root:
+
+    python benchmarks/import_budget.py
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded by importing each package; they are imported where they are used
+DEFERRED_MODULES = {
+    'data_prep': ['chardet', 'openpyxl', 'plotly', 'scipy.stats', 'statsmodels'],
+    'visualization': ['chardet', 'openpyxl', 'plotly.express', 'scipy.stats', 'statsmodels'],
+    'frontend': ['openpyxl', 'plotly.express', 'scipy.stats', 'statsmodels'],
+    'prepare_data': ['chardet', 'openpyxl', 'plotly', 'scipy.stats', 'statsmodels'],
+    'dashboard': ['openpyxl', 'plotly.express', 'scipy.stats', 'statsmodels'],
+}
+
+# Allowed import time of each package in milliseconds, on top of the time taken to import pandas and numpy
+BUDGETS_MS = {
+    'data_prep': 150,
+    'visualization': 150,
+    'frontend': 1000,
+    'prepare_data': 150,
+    'dashboard': 1500,
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check the import time of the packages against a budget.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of imports per package; the fastest one is used')
+    parser.add_argument('--scale', type=float, default=1.0, help='Factor applied to every time budget')
+    return parser.parse_args()
+
+def import_time(statement):
+    """
+    Imports modules in a fresh interpreter and reports what was loaded.
+
+    Parameters:
+        statement (str): The import statement to run.
+
+    Returns:
+        tuple: The cumulative import time of each top-level import in microseconds, and the set of loaded modules.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT,
+                            env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True, check=True)
+    times = {}
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        loaded.add(name.strip())
+        # Top-level imports are the only ones without indentation
+        if not name.startswith('  '):
+            times[name.strip()] = int(cumulative)
+    return times, loaded
+
+def check(package, repeat, scale):
+    """
+    Checks one package against its deferred modules and time budget.
+
+    Returns:
+        list: A message for each violation; empty if the package is within budget.
+    """
+    problems = []
+    best_ms = None
+    for _ in range(repeat):
+        times, loaded = import_time(f"import numpy, pandas; import {package}")
+        best_ms = min(best_ms or float('inf'), times[package] / 1000)
+
+    for module in DEFERRED_MODULES[package]:
+        if module in loaded:
+            problems.append(f"{package} loads {module} at import time")
+    budget = BUDGETS_MS[package] * scale
+    if best_ms > budget:
+        problems.append(f"{package} takes {best_ms:.0f} ms to import, over its budget of {budget:.0f} ms")
+    print(f"{package:<15} {best_ms:8.0f} ms  (budget {budget:.0f} ms)")
+    return problems
+
+def main():
+    args = parse_args()
+    baseline, _ = import_time('import numpy, pandas')
+    print(f"{'numpy + pandas':<15} {(baseline['numpy'] + baseline['pandas']) / 1000:8.0f} ms  (not counted)")
+
+    problems = []
+    for package in BUDGETS_MS:
+        problems += check(package, args.repeat, args.scale)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmarks the data preparation and visualization pipeline on synthetic data and checks for regressions.
+
+For each dataset size a synthetic NORS outage file and a Capital IQ PP&E workbook are generated (and kept for
+later runs), and every stage is timed: loading and filtering the outage data, aggregating it, preparing the
+financial data, linking, loading the visualizer and each `plot_*` method. The best wall time of several repeats
+and the peak memory allocated during the stage (measured in a separate run with tracemalloc) are recorded.
+
+The results are compared with a JSON baseline, and the script exits with status 1 if any stage got slower or
+used more memory than the threshold allows. Run from the repository root:
+
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 1000000
+    python benchmarks/run_benchmarks.py --update_baseline
+
+Baselines are only comparable on the same machine and library versions, which are recorded alongside them.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic_data import write_outage_csv, write_ppe_workbook
+from data_prep import OutageDataProcessor, FinancialDataTransformer, DataPreparer
+from visualization import PlotlyVisualizer
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the data preparation and visualization pipeline.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e4, 1e5, 1e6], help='Numbers of outage records to benchmark, e.g. 1e4 1e6 1e8')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs per stage; the fastest one is recorded')
+    parser.add_argument('--data_dir', type=str, default=os.path.join(ROOT, 'benchmarks', 'data'), help='Directory for the generated data files, which are reused by later runs')
+    parser.add_argument('--baseline', type=str, default=os.path.join(ROOT, 'benchmarks', 'baseline.json'), help='JSON file with the baseline results')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative increase in wall time and peak memory before a stage counts as a regression')
+    parser.add_argument('--min_time', type=float, default=0.005, help='Wall time differences below this many seconds are ignored as noise')
+    parser.add_argument('--update_baseline', action='store_true', help='Write the results to the baseline file instead of comparing with it')
+    parser.add_argument('--output', type=str, default=None, help='Also write the results to this JSON file')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to parse the outage file')
+    parser.add_argument('--stage_workers', type=int, default=2, help='Number of preparation branches (outage and financial data) run at the same time; 1 runs them one after the other')
+    parser.add_argument('--streaming', action='store_true', help='Aggregate the outage counts chunk by chunk; needed for files larger than memory')
+    return parser.parse_args()
+
+def measure(run, repeat):
+    """
+    Measures a stage.
+
+    Parameters:
+        run (callable): Runs the stage from scratch and returns its result.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        tuple: The result of the last run and a dict with the best wall time in seconds and the peak memory in MB.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+
+    # tracemalloc slows the code down, so memory is measured in a separate, untimed run
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {'wall_s': round(best, 6), 'peak_mb': round(peak / 2**20, 3)}
+
+def prepare_inputs(data_dir, n_rows):
+    """
+    Generates the data files for a size, unless they already exist.
+
+    Returns:
+        tuple: The outage and PP&E file names inside data_dir.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    outage_file = f"outage_{n_rows}.csv"
+    # PP&E screens grow with the outage data, but far more slowly
+    n_entities = min(max(n_rows // 1000, 100), 100000)
+    ppe_file = f"ppe_{n_entities}.xlsx"
+    if not os.path.exists(os.path.join(data_dir, outage_file)):
+        print(f"Generating {n_rows} outage records...")
+        write_outage_csv(os.path.join(data_dir, outage_file), n_rows)
+    if not os.path.exists(os.path.join(data_dir, ppe_file)):
+        print(f"Generating a PP&E workbook with {n_entities} entities...")
+        write_ppe_workbook(os.path.join(data_dir, ppe_file), n_entities)
+    return outage_file, ppe_file
+
+def run_size(args, n_rows):
+    """
+    Runs every stage on one dataset size.
+
+    Returns:
+        dict: The measurements of each stage, keyed by stage name.
+    """
+    outage_file, ppe_file = prepare_inputs(args.data_dir, n_rows)
+    results = {}
+    def stage(name, run):
+        # The pipeline prints progress messages, which would swamp the report
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            result, results[name] = measure(run, args.repeat)
+        print(f"  {name:<38} {results[name]['wall_s']:10.4f} s {results[name]['peak_mb']:10.1f} MB")
+        return result
+
+    outage = stage('outage.load_filter', lambda: OutageDataProcessor(outage_file, 2021, 2023, folder=args.data_dir, workers=args.workers, streaming=args.streaming))
+    stage('outage.aggregate', outage.get_outage_frequency)
+    stage('financial.prepare_financial_data', lambda: FinancialDataTransformer(ppe_file, folder=args.data_dir, normalize=True).prepare_financial_data())
+    dataprep = stage('prepare.total', lambda: DataPreparer(outage_file, ppe_file, folder=args.data_dir, normalize=True, workers=args.workers, streaming=args.streaming, stage_workers=args.stage_workers))
+    stage('prepare.link_data', dataprep.link_data)
+
+    # Fits are not memoized, so every repeat measures the full work of a callback
+    visualizer = stage('visualizer.load', lambda: PlotlyVisualizer(fit_cache_size=0, data=dataprep.get_data()))
+    stage('plot_average_outage_vs_ppe', lambda: visualizer.plot_average_outage_vs_ppe(enable_interval=True, dashboard=True))
+    stage('plot_granular_outage_vs_ppe', lambda: visualizer.plot_granular_outage_vs_ppe(enable_interval=True, dashboard=True))
+    stage('plot_outage_per_ppe_over_time', lambda: visualizer.plot_outage_per_ppe_over_time(show_percentiles=True, dashboard=True))
+    stage('plot_outage_per_ppe_boxplot', lambda: visualizer.plot_outage_per_ppe_boxplot(include_grand_total=True, dashboard=True))
+    return results
+
+def environment():
+    """ Describes the machine and library versions the results were measured with. """
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__}
+
+def find_regressions(results, baseline, threshold, min_time):
+    """
+    Compares results with a baseline.
+
+    Returns:
+        list: A message for each stage whose wall time or peak memory grew by more than the threshold.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for name, current in stages.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            if current['wall_s'] > previous['wall_s'] * (1 + threshold) and current['wall_s'] - previous['wall_s'] > min_time:
+                regressions.append(f"{size} rows, {name}: wall time {previous['wall_s']:.4f} s -> {current['wall_s']:.4f} s")
+            if current['peak_mb'] > previous['peak_mb'] * (1 + threshold) and current['peak_mb'] - previous['peak_mb'] > 1:
+                regressions.append(f"{size} rows, {name}: peak memory {previous['peak_mb']:.1f} MB -> {current['peak_mb']:.1f} MB")
+    return regressions
+
+def main():
+    args = parse_args()
+    logging.disable(logging.WARNING)
+
+    results = {}
+    for size in args.sizes:
+        n_rows = int(size)
+        print(f"{n_rows} outage records:")
+        results[str(n_rows)] = run_size(args, n_rows)
+    report = {'environment': environment(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}.")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != report['environment']:
+        print("Warning: the baseline was recorded on a different machine or with different library versions.")
+    regressions = find_regressions(results, baseline['results'], args.threshold, args.min_time)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+if __name__ == '__main__':
+    main()
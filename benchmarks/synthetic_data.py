@@ -0,0 +1,116 @@
+"""
+Generates synthetic NORS outage exports and Capital IQ PP&E workbooks for the benchmarks.
+
+The files follow the layouts the data preparation reads: the outage CSV has the columns of a NORS export (as in
+`datasets/fake_data_generator.ipynb`), and the PP&E workbook has the S&P Capital IQ header rows and 'CQnYYYY'
+quarter columns of `datasets/ppe.xlsx`. Generation is seeded, so the same size and seed always give the same file.
+"""
+import os
+import numpy as np
+import pandas as pd
+from config.config import company_aliases
+
+STATUSES = np.array(['Final', 'InProgress', 'Pending'])
+CITIES = np.array(['Gainesville', 'San Francisco', 'New York', 'Chicago'])
+YES_NO = np.array(['Yes', 'No'])
+FIRST_YEAR = 2000
+LAST_YEAR = 2023
+
+def outage_companies(unknown=10):
+    """
+    Returns the raw company names written to the outage file: every alias from the config, plus names that do
+    not resolve to a company and are filtered out during preparation.
+    """
+    return np.array(list(company_aliases) + [f"REGIONAL CARRIER {i}" for i in range(unknown)])
+
+def write_outage_csv(path, n_rows, seed=0, chunk_rows=1000000, start_year=2015, end_year=2024):
+    """
+    Writes a synthetic NORS outage export.
+
+    The file is written in chunks, so files much larger than memory can be generated.
+
+    Parameters:
+        path (str): The CSV file to write.
+        n_rows (int): The number of outage records.
+        seed (int, optional): The random seed; defaults to 0.
+        chunk_rows (int, optional): The number of records generated and written at a time; defaults to 1000000.
+        start_year, end_year (int, optional): The range of incident years; defaults to 2015 to 2024.
+    """
+    rng = np.random.default_rng(seed)
+    companies = outage_companies()
+    first_day = np.datetime64(f"{start_year}-01-01")
+    n_days = (np.datetime64(f"{end_year + 1}-01-01") - first_day).astype(int)
+    temp_path = f"{path}.tmp"
+    for offset in range(0, n_rows, chunk_rows):
+        n = min(chunk_rows, n_rows - offset)
+        incident_times = (first_day + rng.integers(0, n_days, n).astype('timedelta64[D]')).astype('datetime64[s]')
+        incident_times += rng.integers(0, 86400, n).astype('timedelta64[s]')
+        empty = np.full(n, '')
+        chunk = pd.DataFrame({
+            'u_legacy_smartcode_outage_id': np.char.add(rng.integers(1, 100, n).astype(str),
+                                                        np.char.add('-', rng.integers(100000, 1000000, n).astype(str))),
+            'u_outage_report_status': STATUSES[rng.integers(0, len(STATUSES), n)],
+            'u_company': companies[rng.integers(0, len(companies), n)],
+            'u_previous_report_status': STATUSES[rng.integers(0, len(STATUSES), n)],
+            'u_incident_date_time': np.char.replace(np.datetime_as_string(incident_times, unit='s'), 'T', ' '),
+            'u_duration_hours': rng.integers(1, 25, n),
+            'u_duration_minutes': rng.integers(0, 60, n),
+            'u_states_affected': empty,
+            'u_city_affected': CITIES[rng.integers(0, len(CITIES), n)],
+            'u_incident_description': np.full(n, 'Random incident description'),
+            'u_cause_description': empty,
+            'u_wireline_affected_ind': YES_NO[rng.integers(0, 2, n)],
+            'u_wireless_affected_ind': YES_NO[rng.integers(0, 2, n)],
+            'u_voip_affected_ind': YES_NO[rng.integers(0, 2, n)],
+            'u_number_of_blocked_calls': rng.integers(0, 1000, n),
+            'u_ds3s': rng.integers(0, 10, n),
+            'u_assignment.u_nors_assign_reason1': empty,
+            'u_assignment.u_nors_assign_person1': empty,
+            'u_assignment.u_nors_assign_reason2': empty,
+            'u_assignment.u_nors_assign_person2': empty,
+            'u_assignment.u_nors_assign_groupnum': empty,
+        })
+        chunk.to_csv(temp_path, mode='w' if offset == 0 else 'a', header=offset == 0, index=False)
+    os.replace(temp_path, path)
+
+def write_ppe_workbook(path, n_entities, seed=0):
+    """
+    Writes a synthetic S&P Capital IQ PP&E workbook with quarterly columns from 2000 to 2023.
+
+    The first entities are the canonical companies from the config, so they link with the outage data. The rest are
+    other entities that are filtered out, as in a real screen. Some cells hold '#N/A' like Capital IQ exports.
+
+    Parameters:
+        path (str): The .xlsx or .csv file to write.
+        n_entities (int): The number of entity rows; at least the number of canonical companies are written.
+        seed (int, optional): The random seed; defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+    canonical = sorted(set(company_aliases.values()))
+    names = canonical + [f"Entity {i} Holdings, Inc." for i in range(max(0, n_entities - len(canonical)))]
+    quarters = [f"CQ{q}{year}" for year in range(FIRST_YEAR, LAST_YEAR + 1) for q in range(1, 5)]
+
+    # Each entity's PP&E drifts from its own starting level, in dollars
+    levels = rng.uniform(1e8, 8e10, (len(names), 1))
+    values = np.round(levels * np.cumprod(rng.normal(1.01, 0.03, (len(names), len(quarters))), axis=1))
+    values = values.astype(object)
+    values[rng.random(values.shape) < 0.01] = '#N/A'
+
+    width = 2 + len(quarters)
+    rows = [[None] * width for _ in range(4)]
+    rows.append(['SP_ENTITY_NAME', 'SP_ENTITY_ID'] + ['PP&E'] * len(quarters))
+    rows.append([None, None] + quarters)
+    rows += [[None] * width for _ in range(2)]
+    rows += [[name, None] + list(row) for name, row in zip(names, values)]
+
+    temp_path = f"{path}.tmp"
+    if path.endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        for row in rows:
+            sheet.append(row)
+        workbook.save(temp_path)
+    else:
+        pd.DataFrame(rows).to_csv(temp_path, header=False, index=False)
+    os.replace(temp_path, path)
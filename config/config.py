@@ -23,6 +23,9 @@ company_aliases = {
       "FRONTIER COMMUNICATIONS": "Frontier Communications Parent, Inc."
 }
 
+# Minimum similarity (0-1) for fuzzy matching company names that have no exact alias; None disables fuzzy matching
+alias_fuzzy_cutoff = None
+
 # Dictionary for quarters mapping
 quarters_mapping = {
     "Q1": "01-01",
@@ -1,42 +1,154 @@
 import argparse
 import os
 from dash import Dash
-from frontend import create_layout, register_callbacks
+from flask import Response, jsonify
+from frontend import create_layout, register_callbacks, FigureCache, CallbackMetrics
 from visualization import PlotlyVisualizer
-from data_prep import DataPreparer
+from data_prep import FileWatcher, expand_input_files
+from prepare_data import build_prepared_data
 import webbrowser
 from threading import Timer
 
 # Parse command-line arguments
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Run the Dash web application for visualizing data.")
     parser.add_argument('--directory', type=str, default='datasets', help='Directory where data files are stored')
-    parser.add_argument('--outage_file', type=str, required=True, help='Filename of the outage data file')
+    parser.add_argument('--outage_file', type=str, required=True, help="Filename of the outage data file, or a directory or glob pattern such as 'nors/*.csv' to read many partial files")
     parser.add_argument('--ppe_file', type=str, required=True, help='Filename of the property, plant, and equipment data file')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to parse the outage data file')
+    parser.add_argument('--stage_workers', type=int, default=2, help='Number of preparation branches (outage and financial data) run at the same time; 1 runs them one after the other')
+    parser.add_argument('--streaming', action='store_true', help='Aggregate outage counts chunk by chunk to keep memory use flat on large outage files')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory for caching the filtered outage and financial data between runs; defaults to <directory>/.cache')
+    parser.add_argument('--no_cache', action='store_true', help='Always parse the raw data files instead of using the cache')
+    parser.add_argument('--incremental', action='store_true', help='Treat the outage file as append-only and parse only the rows added since the last run')
+    parser.add_argument('--force', action='store_true', help='Prepare the data at startup even if prepared_data.csv is up to date with the input files')
+    parser.add_argument('--webgl_threshold', type=int, default=1000, help='Number of points above which plots are drawn with WebGL')
+    parser.add_argument('--max_points_per_series', type=int, default=1000, help='Number of points per company above which time series are downsampled; zooming in shows more detail')
+    parser.add_argument('--watch', choices=['prepared', 'inputs'], default=None, help="Reload the dashboard data in the background when prepared_data.csv changes ('prepared'), or also prepare it again when the outage or PP&E file changes ('inputs')")
+    parser.add_argument('--watch_interval', type=float, default=5.0, help='Seconds between checks of the watched files')
+    parser.add_argument('--fit_cache_size', type=int, default=128, help='Number of regression fits kept in memory and reused across callbacks; 0 disables reuse')
+    parser.add_argument('--fit_cache_ttl', type=float, default=600, help='Seconds a kept regression fit stays valid; 0 keeps fits until they are evicted')
+    parser.add_argument('--figure_cache_size', type=int, default=64, help='Number of dashboard figures kept in memory; figures are also cached on disk in the cache directory')
+    parser.add_argument('--slow_callback_threshold', type=float, default=None, help='Seconds above which a dashboard callback is logged as slow, with its inputs')
+    parser.add_argument('--slow_callback_log', type=str, default=None, help='JSON-lines file that slow callbacks are appended to; requires --slow_callback_threshold')
+    parser.add_argument('--background_callbacks', action='store_true', help='Run the regressions of the first tab as background jobs that are cancelled when their inputs change; requires pip install "dash[diskcache]"')
     
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-def main():
-    args = parse_args()
+def create_background_manager(directory):
+    """
+    Creates the manager that runs background callbacks in subprocesses and stores their results in a directory.
+
+    Parameters:
+        directory (str): The directory for the job results.
+
+    Returns:
+        DiskcacheManager: The background callback manager.
+
+    Raises:
+        ImportError: If the diskcache extras of Dash are not installed.
+    """
+    # The extras are optional, so they are only imported when background callbacks are enabled
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+        background_manager = DiskcacheManager(diskcache.Cache(directory))
+    except ImportError as e:
+        raise ImportError('Background callbacks require the diskcache extras of Dash: pip install "dash[diskcache]"') from e
+    return background_manager
 
+def create_app(args):
+    """
+    Prepares the data and builds the Dash app with its layout, callbacks and health endpoint.
+
+    Used both by `main` and by the production WSGI entry point in `wsgi.py`.
+
+    Parameters:
+        args (Namespace): The parsed command-line arguments.
+
+    Returns:
+        Dash: The app; `app.server` is its Flask WSGI application.
+
+    Raises:
+        FileNotFoundError: If the outage or PP&E file does not exist.
+    """
     app = Dash(__name__, suppress_callback_exceptions=True)
 
     # Build paths to the data files
     outage_file_path = os.path.join(args.directory, args.outage_file)
     ppe_file_path = os.path.join(args.directory, args.ppe_file)
 
+    # Check if the specified files exist
+    outage_files = expand_input_files(outage_file_path)
+    if not outage_files or not all(os.path.exists(path) for path in outage_files + [ppe_file_path]):
+        raise FileNotFoundError("One or more specified data files are missing.")
+
+    # Data preparation using the specified files. It is skipped when prepared_data.csv is up to date with the inputs,
+    # and otherwise reuses cached intermediate data when the inputs are unchanged
+    cache_dir = None if args.no_cache else args.cache_dir or os.path.join(args.directory, '.cache')
+    def build(force=False, dataprep=None):
+        return build_prepared_data(args.directory, args.outage_file, args.ppe_file, workers=args.workers, streaming=args.streaming, cache_dir=cache_dir, incremental=args.incremental, force=force, dataprep=dataprep, stage_workers=args.stage_workers)
+    dataprep = build(force=args.force)
+    prepared_data_file = 'prepared_data.csv'
+    # Freshly prepared data is handed over in memory instead of being read back from the CSV file
+    visualizer = PlotlyVisualizer(filename=prepared_data_file, directory=args.directory, fit_cache_size=args.fit_cache_size, fit_cache_ttl=args.fit_cache_ttl or None, webgl_threshold=args.webgl_threshold, max_points_per_series=args.max_points_per_series, data=None if dataprep is None else dataprep.get_data())
+    # A layout function builds the dropdowns and date ranges from the data current when the page is loaded
+    app.layout = lambda: create_layout(visualizer, refresh_interval=args.watch_interval if args.watch else None)
+    figure_cache = FigureCache(args.figure_cache_size, cache_dir=cache_dir and os.path.join(cache_dir, 'figures'))
+    background_manager = None
+    if args.background_callbacks:
+        # The job results are kept on disk, so any server worker can answer the browser's polls for a job
+        background_manager = create_background_manager(os.path.join(cache_dir or os.path.join(args.directory, '.cache'), 'jobs'))
+    # Background jobs hand their timings back through the job store, as their own memory is gone when they finish
+    metrics = CallbackMetrics(slow_threshold=args.slow_callback_threshold, slow_log_path=args.slow_callback_log,
+                              job_queue=None if background_manager is None else background_manager.handle)
+    metrics.init_app(app.server)
+    metrics.add_cache('figure', figure_cache.stats)
+    metrics.add_cache('fit', visualizer.fit_cache.stats)
+    register_callbacks(app, visualizer, figure_cache=figure_cache, metrics=metrics, background_manager=background_manager)
+
+    # Lets load balancers and process managers check that the data is loaded and the app is serving
+    @app.server.route('/health')
+    def health():
+        return jsonify(status='ok', rows=len(visualizer.df), data_version=visualizer.data_version,
+                       data_fingerprint=visualizer.data_fingerprint, pid=os.getpid(), fit_cache=visualizer.fit_cache.stats())
+
+    # Callback latency and response size histograms for Prometheus to scrape
+    @app.server.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    # Rebuilds the data off the request path; the visualizer swaps the new snapshot in atomically
+    def reload_data(changed_paths):
+        nonlocal dataprep
+        data = None
+        if ppe_file_path in changed_paths or outage_file_path in changed_paths:
+            # Every server worker watches the inputs, but the build holds the manifest's lock: the first worker
+            # prepares the data and the others find the manifest current and only load the saved file. An earlier
+            # build in memory is only reused while prepared_data.csv is its own output, and then only its outage data
+            # is refreshed when the PP&E file is unchanged
+            reusable = dataprep if ppe_file_path not in changed_paths else None
+            dataprep = build(dataprep=reusable)
+            data = None if dataprep is None else dataprep.get_data()
+        if visualizer.update_data(data=data):
+            print(f"Reloaded the dashboard data (version {visualizer.data_version}).")
+
+    app.data_watcher = None
+    if args.watch:
+        watched = [os.path.join(args.directory, prepared_data_file)]
+        if args.watch == 'inputs':
+            watched += [outage_file_path, ppe_file_path]
+        app.data_watcher = FileWatcher(watched, reload_data, interval=args.watch_interval)
+
+    return app
+
+def main():
+    args = parse_args()
+
     try:
-        # Check if the specified files exist
-        if not os.path.exists(outage_file_path) or not os.path.exists(ppe_file_path):
-            raise FileNotFoundError("One or more specified data files are missing.")
-
-        # Data preparation using the specified files
-        dataprep = DataPreparer(folder=args.directory, outage_file_name=args.outage_file, financial_file_name=args.ppe_file,normalize=True)
-        dataprep.save_to_csv(folder=args.directory)
-        prepared_data_file = 'prepared_data.csv'
-        visualizer = PlotlyVisualizer(filename=prepared_data_file, directory=args.directory)
-        app.layout = create_layout(visualizer)
-        register_callbacks(app, visualizer)
+        app = create_app(args)
+        if app.data_watcher is not None:
+            app.data_watcher.start()
 
         def open_browser():
             webbrowser.open_new("http://127.0.0.1:8050/")
@@ -50,6 +162,5 @@ def main():
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
-
 if __name__ == '__main__':
     main()
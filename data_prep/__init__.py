@@ -1,7 +1,14 @@
 # Content of data_prep/__init__.py
+from .schema import LINKED_SCHEMA, apply_schema, memory_report
+from .instrumentation import StageTracer, tracer
+from .alias_resolver import AliasResolver
 from .outage_transformer import OutageDataProcessor
 from .financial_transformer import FinancialDataTransformer
+from .frame_cache import FrameCache
 from .data_prepper import DataPreparer
-from .read_util import find_encoding, read_file
+from .file_watcher import FileWatcher
+from .build_manifest import BuildManifest
+from .partition_manifest import PartitionManifest
+from .read_util import find_encoding, read_file, read_raw_file, expand_input_files
 
-__all__ = ['OutageDataProcessor', 'FinancialDataTransformer', 'DataPreparer', 'find_encoding', 'read_file']
+__all__ = ['AliasResolver', 'OutageDataProcessor', 'FinancialDataTransformer', 'DataPreparer', 'FrameCache', 'FileWatcher', 'BuildManifest', 'PartitionManifest', 'StageTracer', 'tracer', 'find_encoding', 'read_file', 'read_raw_file', 'expand_input_files', 'LINKED_SCHEMA', 'apply_schema', 'memory_report']
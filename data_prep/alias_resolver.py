@@ -0,0 +1,81 @@
+import difflib
+import re
+import numpy as np
+import pandas as pd
+
+
+class AliasResolver:
+    """
+    Maps raw company names to canonical names, resolving each distinct raw string only once.
+
+    Names are normalized before lookup: parenthetical parts such as exchange tickers are removed, whitespace is
+    collapsed, and case is ignored. Resolutions are memoized, so a column with millions of rows but only hundreds of
+    distinct names costs hundreds of lookups. Results are returned as a categorical whose categories are the sorted
+    canonical names, which keeps the codes identical across chunks, files, and worker processes.
+
+    Attributes:
+        aliases (dict): Normalized alias to canonical name.
+        categories (Index): The sorted canonical names used as categories.
+        fuzzy_cutoff (float or None): Similarity cutoff for fuzzy matching of unseen names, or None to disable it.
+    """
+    def __init__(self, aliases, include_canonical=False, fuzzy_cutoff=None):
+        """
+        Initializes the AliasResolver.
+
+        Parameters:
+            aliases (dict): Raw company name to canonical name, e.g. `company_aliases` from the config.
+            include_canonical (bool, optional): If True, canonical names also resolve to themselves; defaults to False.
+            fuzzy_cutoff (float, optional): If set, names without an exact alias are matched to the closest alias with a
+                difflib similarity ratio of at least this value; defaults to None (exact matches only).
+        """
+        self.aliases = {self.normalize(alias): canonical for alias, canonical in aliases.items()}
+        if include_canonical:
+            for canonical in aliases.values():
+                self.aliases.setdefault(self.normalize(canonical), canonical)
+        self.categories = pd.Index(sorted(set(aliases.values())))
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.__memo = {}
+
+    @staticmethod
+    def normalize(name):
+        """
+        Normalizes a company name by removing parenthetical parts, collapsing whitespace, and upper-casing it.
+        """
+        name = re.sub(r"\s*\([^)]+\)", "", name)
+        return " ".join(name.split()).upper()
+
+    def resolve(self, values):
+        """
+        Resolves a column of raw company names.
+
+        Parameters:
+            values (Series): The raw company names.
+
+        Returns:
+            Series: A categorical Series of canonical names, with NaN for names that could not be resolved.
+        """
+        codes, uniques = pd.factorize(values)
+        # The extra trailing -1 makes factorize's missing-value code (-1) resolve to NaN
+        lookup = np.array([self.__resolve_code(value) for value in uniques] + [-1], dtype=np.int32)
+        categorical = pd.Categorical.from_codes(lookup[codes], categories=self.categories)
+        return pd.Series(categorical, index=values.index, name=values.name)
+
+    def resolve_name(self, name):
+        """
+        Resolves a single raw company name, returning the canonical name or None.
+        """
+        code = self.__resolve_code(name)
+        return self.categories[code] if code >= 0 else None
+
+    def __resolve_code(self, raw):
+        """ Returns the category code of a raw name, or -1 if it cannot be resolved. Results are memoized. """
+        if raw not in self.__memo:
+            canonical = None
+            if isinstance(raw, str):
+                key = self.normalize(raw)
+                canonical = self.aliases.get(key)
+                if canonical is None and self.fuzzy_cutoff is not None and key:
+                    matches = difflib.get_close_matches(key, self.aliases.keys(), n=1, cutoff=self.fuzzy_cutoff)
+                    canonical = self.aliases[matches[0]] if matches else None
+            self.__memo[raw] = self.categories.get_loc(canonical) if canonical is not None else -1
+        return self.__memo[raw]
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+from .read_util import file_fingerprint
+from .file_lock import file_lock
+
+# Bump whenever the preparation changes in a way that affects its output, so existing outputs are rebuilt
+MANIFEST_VERSION = 1
+
+
+class BuildManifest:
+    """
+    Records the input files and parameters a prepared data file was built from, so an unchanged build can be skipped.
+
+    The manifest is stored next to the output, e.g. 'prepared_data.manifest.json' for 'prepared_data.csv'. A build is
+    current when the inputs, the parameters and the output file itself all match the recorded fingerprints.
+
+    Builds of the same output are serialized with `lock()`, so when several processes notice the same input change,
+    only the first prepares the data and the others find the manifest current.
+
+    Attributes:
+        output_path (str): The prepared data file.
+        manifest_path (str): The JSON file holding the manifest.
+        lock_path (str): The lock file taken by `lock()`.
+    """
+    def __init__(self, output_path):
+        """
+        Parameters:
+            output_path (str): The prepared data file the manifest describes.
+        """
+        self.output_path = output_path
+        self.manifest_path = f"{os.path.splitext(output_path)[0]}.manifest.json"
+        self.lock_path = f"{os.path.splitext(output_path)[0]}.lock"
+
+    def lock(self):
+        """
+        Returns a context manager holding the build lock of the output, shared by all processes, for checking the
+        manifest, building the output and recording it in one step.
+        """
+        return file_lock(self.lock_path)
+
+    def is_current(self, input_files, **params):
+        """
+        Checks whether the output was built from the current input files with the same parameters.
+
+        Parameters:
+            input_files (list): Paths of the files the output is built from.
+            **params: Preparation parameters that affect the output. Values must be JSON serializable.
+
+        Returns:
+            bool: True if the output is up to date and preparation can be skipped.
+        """
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            expected = self.__describe(input_files, params)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable build manifest {self.manifest_path}: {e}")
+            return False
+        return manifest == expected
+
+    def record(self, input_files, **params):
+        """
+        Records the inputs and parameters of the output that was just built.
+        """
+        manifest = self.__describe(input_files, params)
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def __describe(self, input_files, params):
+        # Round-tripped through JSON so the result compares equal to a loaded manifest
+        return json.loads(json.dumps({
+            'version': MANIFEST_VERSION,
+            'inputs': [file_fingerprint(path) for path in input_files],
+            'params': params,
+            'output': file_fingerprint(self.output_path),
+        }, default=str))
@@ -1,48 +1,129 @@
 import pandas as pd
-from data_prep import OutageDataProcessor, FinancialDataTransformer
+from data_prep import OutageDataProcessor, FinancialDataTransformer, FrameCache
+from .schema import apply_schema, format_quarter, memory_report
+from .frame_cache import hash_mapping
+from .instrumentation import tracer
+from .stage_graph import StageGraph
+from config.config import company_aliases, alias_fuzzy_cutoff
 import os
 
 class DataPreparer:
-    def __init__(self, outage_file_name, financial_file_name, start_year=2021, end_year=2023, folder='datasets', normalize=False):
+    @tracer.traced('prepare')
+    def __init__(self, outage_file_name, financial_file_name, start_year=2021, end_year=2023, folder='datasets', normalize=False, workers=1, streaming=False, cache_dir=None, incremental=False, stage_workers=2):
         """
         Initializes DataPreparer with specific configurations for processing outage and financial data.
 
         Parameters:
-            outage_file_name (str): The filename of the outage data CSV file.
+            outage_file_name (str): The filename of the outage data CSV file, or a directory or glob pattern naming several partial files.
             financial_file_name (str): The filename of the financial data CSV file.
             start_year (int, optional): The start year for filtering the data; defaults to 2021.
             end_year (int, optional): The end year for filtering the data; defaults to 2023.
             folder (str, optional): The directory where the data files are stored; defaults to 'datasets'.
             normalize (bool, optional): A flag to normalize the financial data during preparation; defaults to False.
+            workers (int, optional): The number of processes used to parse the outage data file; defaults to 1 (serial).
+            streaming (bool, optional): A flag to aggregate outage counts chunk by chunk without keeping the filtered rows; defaults to False.
+            cache_dir (str, optional): A directory for caching the filtered outage and financial data between runs; defaults to None (no caching).
+            incremental (bool, optional): A flag to treat the outage file as append-only and parse only new rows on each load. The watermark is stored in cache_dir, which is then required; defaults to False.
+            stage_workers (int, optional): The number of preparation branches run at the same time; defaults to 2, which prepares the outage and financial data concurrently. 1 prepares them one after the other.
 
-        Initializes data processing objects for both outage and financial data and links the prepared data.
+        Initializes data processing objects for both outage and financial data and links the prepared data. The outage
+        and financial branches are independent until they are linked, so they run as separate stages of a `StageGraph`.
         """
-        self.outage_processor = OutageDataProcessor(outage_file_name, start_year, end_year, folder=folder)
-        self.financial_processor = FinancialDataTransformer(financial_file_name, folder=folder, normalize=normalize)
+        cache = FrameCache(cache_dir) if cache_dir else None
+        stages = StageGraph(workers=stage_workers)
+        stages.add('outage', lambda: OutageDataProcessor(outage_file_name, start_year, end_year, folder=folder, workers=workers, streaming=streaming, cache=cache,
+                                                         incremental=incremental, state_dir=cache_dir))
+        stages.add('financial', lambda: self.__prepare_financial_data(financial_file_name, folder, normalize, cache))
+        results = stages.run()
+        self.outage_processor = results['outage']
+        self.financial_processor = results['financial']
         self.link_data()
+        tracer.current().rows_out = len(self.linked_data)
 
-    def link_data(self):
+    @staticmethod
+    def __prepare_financial_data(financial_file_name, folder, normalize, cache):
+        # The transformer prepares its data on first access, so it is accessed here to do the work within the stage
+        financial_processor = FinancialDataTransformer(financial_file_name, folder=folder, normalize=normalize, cache=cache)
+        financial_processor.get_financial_data()
+        return financial_processor
+
+    @staticmethod
+    def build_params(start_year=2021, end_year=2023, normalize=False):
+        """
+        Returns the parameters that determine the linked data, for recording in a `BuildManifest`.
+
+        The worker counts, streaming, caching and incremental options only change how the data is prepared, not the
+        result, so they are left out.
+
+        Parameters:
+            start_year, end_year, normalize: As for the constructor.
+
+        Returns:
+            dict: The JSON-serializable parameters, including a hash of the company aliases.
+        """
+        return {'start_year': start_year, 'end_year': end_year, 'normalize': normalize,
+                'company_aliases': hash_mapping(company_aliases), 'fuzzy_cutoff': alias_fuzzy_cutoff}
+
+    @tracer.traced('link')
+    def link_data(self, changed_keys=None):
         """
         Links prepared outage and financial data by 'Company', 'Year', and 'Quarter'.
 
         Fetches aggregated outage data and unpivoted financial data, then merges them on 'Company', 'Year', and 'Quarter'.
         The resulting DataFrame is cleaned to remove any rows with missing values and ensures all PP&E values are numeric.
+        Columns follow the compact dtypes declared in `schema.LINKED_SCHEMA`.
+
+        Parameters:
+            changed_keys (MultiIndex, optional): The (Company, Year, Quarter) groups whose outage counts changed. When given
+                and data has already been linked, only those quarters are merged again; defaults to None (link everything).
         """
         print("Linking Data...")
+        keys = ['Company', 'Year', 'Quarter']
         aggregated_outage_data = self.outage_processor.get_outage_frequency()
         unpivoted_finance = self.financial_processor.get_financial_data()
-        self.linked_data = pd.merge(
+        tracer.current().rows_in = (0 if aggregated_outage_data is None else len(aggregated_outage_data)) + len(unpivoted_finance)
+
+        relink_all = changed_keys is None or getattr(self, 'linked_data', None) is None
+        if not relink_all:
+            if aggregated_outage_data is None:
+                aggregated_outage_data = pd.DataFrame(columns=keys + ['Count'])
+            is_changed = pd.MultiIndex.from_frame(aggregated_outage_data[keys]).isin(changed_keys)
+            aggregated_outage_data = aggregated_outage_data[is_changed]
+
+        linked_data = pd.merge(
             aggregated_outage_data,
             unpivoted_finance,
-            on=['Company', 'Year', 'Quarter'],
+            on=keys,
             how='inner'
         )
-        self.linked_data = self.linked_data.dropna(how='any')
-        self.linked_data['PP&E'] = pd.to_numeric(self.linked_data['PP&E'], errors='coerce')
-        self.linked_data = self.linked_data.dropna(subset=['PP&E'])
+        linked_data = linked_data.dropna(how='any')
+        linked_data['PP&E'] = pd.to_numeric(linked_data['PP&E'], errors='coerce')
+        linked_data = linked_data.dropna(subset=['PP&E'])
+
+        if relink_all:
+            self.linked_data = apply_schema(linked_data)
+        else:
+            unchanged = ~pd.MultiIndex.from_frame(self.linked_data[keys]).isin(changed_keys)
+            self.linked_data = pd.concat([self.linked_data[unchanged], linked_data], ignore_index=True)
+            self.linked_data = self.linked_data.sort_values(keys, kind='stable').reset_index(drop=True)
+            self.linked_data = apply_schema(self.linked_data)
+            print(f"Re-linked {len(changed_keys)} changed quarters.")
 
+        tracer.current().rows_out = len(self.linked_data)
         print("Data linked successfully.")
 
+    @tracer.traced('refresh')
+    def refresh(self):
+        """
+        Reloads the outage data and links it again.
+
+        In incremental mode only the rows appended to the outage file since the last load are parsed, and only the
+        quarters whose counts changed are merged again.
+        """
+        self.outage_processor.load_and_process_outage_data()
+        self.link_data(changed_keys=self.outage_processor.changed_keys)
+        tracer.current().rows_out = len(self.linked_data)
+
     def get_data(self):
         """
         Returns the linked data after preparation.
@@ -52,6 +133,15 @@ class DataPreparer:
         """
         return self.linked_data
 
+    def memory_report(self):
+        """
+        Reports the dtype and memory footprint of each column of the linked data.
+
+        Returns:
+            DataFrame: One row per column with its dtype and size in bytes, followed by a 'Total' row.
+        """
+        return memory_report(self.linked_data)
+
     def save_to_csv(self, folder='visualization', file_name='prepared_data.csv'):
         """
         Saves the linked data to a CSV file in a specified directory.
@@ -61,8 +151,13 @@ class DataPreparer:
             file_name (str, optional): The name of the file to save; defaults to 'prepared_data.csv'.
 
         Ensures the target directory exists and writes the linked data to a CSV file, without including the index.
+        Quarters are written as 'Q1'..'Q4' labels. The file is written under a temporary name and then renamed, so
+        readers such as a watching dashboard never see it half written.
         """
         os.makedirs(folder, exist_ok=True)
         file_path = f"{folder}/{file_name}"
-        self.linked_data.to_csv(file_path, index=False)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with tracer.span('save_csv', rows_in=len(self.linked_data)):
+            self.linked_data.assign(Quarter=format_quarter(self.linked_data['Quarter'])).to_csv(temp_path, index=False)
+            os.replace(temp_path, file_path)
         print(f"Data saved successfully to {file_path}.")
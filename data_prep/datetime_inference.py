@@ -0,0 +1,79 @@
+import pandas as pd
+from .read_util import FileMemo
+
+# Candidate timestamp formats, in order of preference
+DATETIME_FORMATS = ["%Y-%m-%d %H:%M:%S", "%d-%m-%Y %H:%M", "%m/%d/%Y", "%Y-%m-%d"]
+
+# Formats inferred per file, until the file changes
+_inferred_formats = FileMemo()
+
+
+def infer_datetime_formats(sample, formats=DATETIME_FORMATS):
+    """
+    Picks the formats that parse a sample of timestamp strings.
+
+    Formats are tried in order against the values the previous formats could not parse, so the result lists
+    only the formats that actually occur in the sample, ordered by preference.
+
+    Parameters:
+        sample (Series): A sample of raw timestamp strings.
+        formats (list, optional): The candidate formats; defaults to DATETIME_FORMATS.
+
+    Returns:
+        list: The winning formats.
+    """
+    remaining = sample.dropna().astype(str)
+    winners = []
+    for fmt in formats:
+        if remaining.empty:
+            break
+        parsed = pd.to_datetime(remaining, format=fmt, errors='coerce')
+        if parsed.notna().any():
+            winners.append(fmt)
+            remaining = remaining[parsed.isna()]
+    return winners
+
+
+def get_datetime_formats(filepath, load_sample):
+    """
+    Returns the inferred timestamp formats of a file, sampling it only the first time each version of it is seen.
+
+    Parameters:
+        filepath (str): Path to the file the timestamps come from.
+        load_sample (callable): Returns a Series of raw timestamp strings sampled from the file.
+
+    Returns:
+        list: The winning formats for the file.
+    """
+    return _inferred_formats.get_or_compute(filepath, lambda: infer_datetime_formats(load_sample()))
+
+
+def parse_datetimes(column, formats):
+    """
+    Parses a column of timestamp strings with a single vectorized pass per inferred format.
+
+    Values that none of the inferred formats can parse go to a fallback path that tries the remaining candidate
+    formats and then parses each distinct leftover value individually. Unparseable values become NaT.
+
+    Parameters:
+        column (Series): The raw timestamp strings.
+        formats (list): The formats inferred for the file.
+
+    Returns:
+        Series: The parsed timestamps.
+    """
+    result = pd.Series(pd.NaT, index=column.index, dtype='datetime64[ns]')
+    pending = column.notna()
+    fallback_formats = [fmt for fmt in DATETIME_FORMATS if fmt not in formats]
+    for fmt in list(formats) + fallback_formats:
+        if not pending.any():
+            return result
+        parsed = pd.to_datetime(column[pending], format=fmt, errors='coerce')
+        result[pending] = parsed
+        pending &= result.isna()
+
+    if pending.any():
+        leftovers = column[pending]
+        parsed = {value: pd.to_datetime(value, errors='coerce') for value in leftovers.unique()}
+        result[pending] = leftovers.map(parsed)
+    return result
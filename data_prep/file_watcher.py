@@ -0,0 +1,86 @@
+import logging
+import threading
+from .read_util import file_fingerprint, is_partitioned_input, expand_input_files
+
+
+class FileWatcher:
+    """
+    Watches files from a background thread and calls a function when any of them changes.
+
+    Files are polled by size and modification time, so no extra dependency is needed. A change is only reported once
+    the file has stopped changing for one polling interval, so a file that is still being written is not read half
+    way through.
+
+    Attributes:
+        paths (list): The watched files.
+        interval (float): Seconds between polls.
+    """
+    def __init__(self, paths, on_change, interval=5.0):
+        """
+        Initializes the FileWatcher.
+
+        Parameters:
+            paths (list): The files to watch. Files that do not exist yet are watched for their creation. A directory or
+                glob pattern is watched as the set of files it matches, so adding, removing or changing any of them is a change.
+            on_change (callable): Called from the watcher thread with the list of changed paths.
+            interval (float, optional): Seconds between polls; defaults to 5.
+        """
+        self.paths = list(paths)
+        self.interval = interval
+        self.__on_change = on_change
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__seen = {path: self.__fingerprint(path) for path in self.paths}
+
+    def start(self):
+        """ Starts watching in a daemon thread. """
+        if self.__thread is None or not self.__thread.is_alive():
+            self.__stop.clear()
+            self.__thread = threading.Thread(target=self.__run, name='FileWatcher', daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self):
+        """ Stops watching and waits for the thread to finish. """
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def poll(self):
+        """
+        Checks the files once and calls `on_change` for those that changed and have since stopped changing.
+
+        Returns:
+            list: The changed paths reported.
+        """
+        pending = {path: fingerprint for path in self.paths
+                   if (fingerprint := self.__fingerprint(path)) != self.__seen[path]}
+        if not pending:
+            return []
+        # Wait for writers to finish before reporting the change
+        if self.__stop.wait(self.interval):
+            return []
+        changed = [path for path, fingerprint in pending.items() if self.__fingerprint(path) == fingerprint]
+        if not changed:
+            return []
+        try:
+            self.__on_change(changed)
+        except Exception as e:
+            logging.exception(f"Error while handling a change of {', '.join(changed)}: {e}")
+        # Files touched by the handler itself are not reported again
+        for path in self.paths:
+            self.__seen[path] = self.__fingerprint(path)
+        return changed
+
+    def __run(self):
+        while not self.__stop.wait(self.interval):
+            self.poll()
+
+    @staticmethod
+    def __fingerprint(path):
+        try:
+            if is_partitioned_input(path):
+                return tuple(file_fingerprint(name) for name in expand_input_files(path))
+            return file_fingerprint(path)
+        except FileNotFoundError:
+            return None
@@ -1,9 +1,12 @@
 import pandas as pd
 import re
-from .read_util import find_encoding, read_file
-from config.config import company_aliases
+from .read_util import read_raw_file, read_quarterly_workbook
+from .frame_cache import hash_mapping
+from .alias_resolver import AliasResolver
+from .schema import LINKED_SCHEMA
+from .instrumentation import tracer
+from config.config import company_aliases, alias_fuzzy_cutoff
 import os
-import numpy as np
 
 class FinancialDataTransformer:
     """
@@ -15,7 +18,7 @@ class FinancialDataTransformer:
         start_year (int): The first year in the data range for filtering.
         data (DataFrame or None): The processed financial data ready for analysis.
     """
-    def __init__(self, financial_data_file_name, folder='datasets', normalize=False):
+    def __init__(self, financial_data_file_name, folder='datasets', normalize=False, cache=None):
         """
         Initializes the FinancialDataProcessor with specified file, year range, and data folder.
 
@@ -24,11 +27,14 @@ class FinancialDataTransformer:
             start_year (int): The starting year for data to include in processing.
             end_year (int): The ending year for data to include in processing.
             folder (str): The directory where financial data files are stored.
+            cache (FrameCache): An optional cache of unpivoted financial data. On a hit the file is not parsed at all.
         """
         self.financial_data_file_path = f"{folder}/{financial_data_file_name}"
         self.finance_data = None
         self.is_data_prepared = False  
         self.normalize = normalize
+        self.cache = cache
+        self.alias_resolver = AliasResolver(company_aliases, include_canonical=True, fuzzy_cutoff=alias_fuzzy_cutoff)
 
     def get_financial_data(self):
         """
@@ -63,14 +69,14 @@ class FinancialDataTransformer:
         self.is_data_prepared = False
         self.finance_data = self.get_financial_data()
 
+    @tracer.traced('financial.prepare')
     def prepare_financial_data(self):
         """
         Conducts a series of data preparation steps on the financial data file specified in the object's attributes. 
         This method is designed to be run once unless explicitly re-invoked.
 
         Steps involved:
-        - Reads data from the specified file path.
-        - Loads raw data considering the file format.
+        - Reads the raw data from the specified file path once, considering the file format.
         - Aligns and formats column headers.
         - Formats company names and removes unwanted columns.
         - Filters columns based on specific criteria.
@@ -85,31 +91,47 @@ class FinancialDataTransformer:
             UnicodeDecodeError: For encoding issues in the file.
             Exception: Catches and logs unexpected errors during data processing.
         """
+        if self.cache is not None:
+            cache_key = self.cache.make_key('financial', [self.financial_data_file_path], normalize=self.normalize,
+                                            company_aliases=hash_mapping(company_aliases), fuzzy_cutoff=alias_fuzzy_cutoff)
+            self.finance_data = self.cache.load(cache_key)
+            if self.finance_data is not None:
+                return
+
         print('Reading finance data from:', self.financial_data_file_path)
-        self.finance_data = read_file(self.financial_data_file_path)
-        self.__load_raw_data()
-        self.__align_data()
-        self.__format_company_column()
-        self.__filter_financial_columns()
-        self.__convert_columns_to_numeric()
-        self.__unpivot_data(['Company'], normalize=self.normalize)
-        self.__extract_and_format_columns()
-        self.__filter_and_clean_company_data()
+        with tracer.span('financial.read') as span:
+            self.__load_raw_data()
+            span.rows_out = len(self.finance_data)
+        with tracer.span('financial.clean', rows_in=len(self.finance_data)) as span:
+            self.__align_data()
+            self.__format_company_column()
+            self.__filter_financial_columns()
+            self.__convert_columns_to_numeric()
+            span.rows_out = len(self.finance_data)
+        with tracer.span('financial.unpivot', rows_in=len(self.finance_data)) as span:
+            self.__unpivot_data(['Company'], normalize=self.normalize)
+            self.__extract_and_format_columns()
+            self.__filter_and_clean_company_data()
+            span.rows_out = len(self.finance_data)
+        tracer.current().rows_out = len(self.finance_data)
+
+        if self.cache is not None:
+            self.cache.save(cache_key, self.finance_data)
 
     def __load_raw_data(self):
         """
         Loads raw data from a specified file path into a pandas DataFrame. The method supports both CSV and Excel file formats.
+
+        .xlsx workbooks are streamed in read-only mode and only the entity name and quarterly columns are kept. Other
+        layouts fall back to reading the whole sheet. Cells holding '#'-prefixed error strings are then set to NaN.
         """
-        file_extension = os.path.splitext(self.financial_data_file_path)[1]
         try:
-            if file_extension == '.csv':
-                encoding = find_encoding(self.financial_data_file_path)
-                self.finance_data = pd.read_csv(self.financial_data_file_path, header=None, encoding=encoding)
-                self.finance_data = self.finance_data.applymap(lambda x: np.nan if isinstance(x, str) and x.startswith('#') else x)
-            elif file_extension in ['.xls', '.xlsx']:
-                self.finance_data = pd.read_excel(self.financial_data_file_path, header=None, engine='openpyxl')
-            else:
-                raise ValueError("Unsupported file format: {}".format(file_extension))
+            self.finance_data = None
+            if os.path.splitext(self.financial_data_file_path)[1] == '.xlsx':
+                self.finance_data = read_quarterly_workbook(self.financial_data_file_path)
+            if self.finance_data is None:
+                self.finance_data, _ = read_raw_file(self.financial_data_file_path)
+            self.__null_error_cells()
         except pd.errors.EmptyDataError:
             raise ValueError("No data: The file is empty.")
         except pd.errors.ParserError as e:
@@ -121,6 +143,21 @@ class FinancialDataTransformer:
         except Exception as e:
             raise SystemError(f"An unexpected error occurred: {e}")
 
+    def __null_error_cells(self):
+        """
+        Replaces '#'-prefixed error strings such as '#N/A' with NaN, one vectorized pass per text column.
+        """
+        for col in self.finance_data.columns:
+            values = self.finance_data[col]
+            if values.dtype != object:
+                continue
+            try:
+                is_error = values.str.startswith('#', na=False)
+            except AttributeError:
+                continue  # No string values in this column
+            if is_error.any():
+                self.finance_data[col] = values.mask(is_error)
+
     def __align_data(self):
         """
         Aligns and formats the column headers of the financial data based on specific criteria.
@@ -150,7 +187,8 @@ class FinancialDataTransformer:
             pattern = re.compile(r'CQ[1-4]\d{4}')
             return any(re.match(pattern, str(col)) for col in columns)
 
-        if 'Company' not in self.finance_data.columns or not check_column_pattern(self.finance_data.columns):
+        has_company_column = 'Company' in self.finance_data.columns or 'SP_ENTITY_NAME' in self.finance_data.columns
+        if not has_company_column or not check_column_pattern(self.finance_data.columns):
             print("The data file is missing the 'Company' column or does not have any quarter-year format columns; attempting to clean data...")
 
             # Drops all rows with all null values
@@ -168,15 +206,14 @@ class FinancialDataTransformer:
 
     def __format_company_column(self):
         """
-        Renames and formats the 'Company' column in the financial data.
+        Renames the 'Company' column in the financial data and resolves it to canonical company names.
         """
         self.finance_data.rename(columns={'SP_ENTITY_NAME':'Company'},inplace=True)
         if 'SP_ENTITY_ID' in self.finance_data.columns:
             self.finance_data.drop('SP_ENTITY_ID', axis=1, inplace=True)
             print(f"Column 'SP_ENTITY_ID' removed successfully.")
 
-        self.finance_data['Company'] = self.finance_data['Company'].str.replace(r"\s*\([^)]+\)", "", regex=True)
-        self.finance_data['Company'] = self.finance_data['Company'].str.strip()
+        self.finance_data['Company'] = self.alias_resolver.resolve(self.finance_data['Company'])
         
     def __filter_financial_columns(self):
         """
@@ -205,15 +242,14 @@ class FinancialDataTransformer:
         print("Data successfully unpivoted and normalized.")
 
     def __extract_and_format_columns(self):
-        """Extracts year and quarter from the 'Quarter' column and formats them."""
+        """Extracts year and quarter numbers from the 'CQnYYYY' labels in the 'Quarter' column."""
         if 'Quarter' in self.finance_data.columns:
-            self.finance_data['Year'] = self.finance_data['Quarter'].str[-4:].astype(int)
-            self.finance_data['Quarter'] = self.finance_data['Quarter'].str[1:3].astype(str)
+            self.finance_data['Year'] = self.finance_data['Quarter'].str[-4:].astype(LINKED_SCHEMA['Year'])
+            self.finance_data['Quarter'] = self.finance_data['Quarter'].str[2:-4].astype(LINKED_SCHEMA['Quarter'])
             print("Quarter and Year columns created successfully.")
 
     def __filter_and_clean_company_data(self):
-        """Filters finance data based on company aliases and cleans the 'Company' column."""
-        self.finance_data = self.finance_data[self.finance_data['Company'].isin(company_aliases.values())]
-        self.finance_data['Company'] = self.finance_data['Company'].str.strip()
+        """Filters finance data to the companies that resolved to a canonical name through the company aliases."""
+        self.finance_data = self.finance_data[self.finance_data['Company'].notna()]
         print("Finance data filtered and company names cleaned successfully.")
 
@@ -0,0 +1,114 @@
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import pandas as pd
+from .instrumentation import tracer
+from .read_util import file_fingerprint
+
+# Bump whenever the layout of a cached frame changes so stale entries are ignored
+CACHE_VERSION = 3
+
+
+class FrameCache:
+    """
+    Persists prepared DataFrames as Parquet files so unchanged inputs are not parsed again.
+
+    Entries are keyed by the fingerprints of the input files and the preparation parameters. Only the most
+    recently used entries of each kind are kept; older ones are evicted when a new entry is stored.
+
+    Attributes:
+        cache_dir (str): The directory holding the cached frames.
+        max_entries (int): The number of entries kept per kind of frame.
+        enabled (bool): False when no Parquet engine is installed, in which case every lookup misses.
+    """
+    def __init__(self, cache_dir, max_entries=4):
+        """
+        Initializes the FrameCache.
+
+        Parameters:
+            cache_dir (str): The directory holding the cached frames; created when the first entry is stored.
+            max_entries (int, optional): The number of entries kept per kind of frame; defaults to 4.
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.enabled = importlib.util.find_spec('pyarrow') is not None
+        if not self.enabled:
+            logging.warning("pyarrow is not installed; the prepared data cache is disabled.")
+
+    def make_key(self, kind, input_files, **params):
+        """
+        Builds the cache key of a frame from its input files and preparation parameters.
+
+        Parameters:
+            kind (str): The kind of frame, e.g. 'outage' or 'financial'.
+            input_files (list): Paths of the files the frame is derived from.
+            **params: Preparation parameters that affect the frame. Values must be JSON serializable.
+
+        Returns:
+            str: The cache key.
+        """
+        payload = {
+            'version': CACHE_VERSION,
+            'inputs': [file_fingerprint(path) for path in input_files],
+            'params': params,
+        }
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return f"{kind}-{digest[:32]}"
+
+    def load(self, key):
+        """
+        Returns the cached frame stored under the key, or None on a miss.
+        """
+        path = self.__entry_path(key)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        try:
+            with tracer.span('cache.load') as span:
+                data = pd.read_parquet(path)
+                span.rows_out = len(data)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        os.utime(path)
+        logging.info(f"Loaded {key} from the prepared data cache.")
+        return data
+
+    def save(self, key, data):
+        """
+        Stores a frame under the key and evicts the least recently used entries of the same kind.
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.__entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with tracer.span('cache.save', rows_in=len(data)):
+                data.to_parquet(temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logging.warning(f"Could not write cache entry {path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.__evict(key.split('-', 1)[0])
+
+    def __entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def __evict(self, kind):
+        """ Removes the least recently used entries of a kind beyond max_entries. """
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name.startswith(f"{kind}-") and name.endswith('.parquet')]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            os.remove(path)
+
+
+def hash_mapping(mapping):
+    """
+    Returns a stable hash of a dictionary such as the company aliases, for use in cache keys.
+    """
+    return hashlib.sha256(json.dumps(mapping, sort_keys=True).encode('utf-8')).hexdigest()
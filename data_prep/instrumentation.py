@@ -0,0 +1,260 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """
+    A timed stage of the data preparation.
+
+    Attributes:
+        name (str): The stage name, e.g. 'outage.parse'.
+        parent (str): The name of the enclosing stage, or None.
+        rows_in (int): The number of rows the stage read, or None if unknown.
+        rows_out (int): The number of rows the stage produced, or None if unknown.
+    """
+    __slots__ = ('name', 'parent', 'rows_in', 'rows_out', 'start_memory', 'peak_memory')
+
+    def __init__(self, name, parent, rows_in):
+        self.name = name
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.start_memory = None
+        self.peak_memory = None
+
+    def add_rows_in(self, rows):
+        """ Adds to the number of rows read, for stages that read their input in chunks. """
+        self.rows_in = (self.rows_in or 0) + rows
+
+
+class _DisabledSpan:
+    """ Stands in for a span while instrumentation is disabled; everything recorded on it is discarded. """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def add_rows_in(self, rows):
+        pass
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class StageTracer:
+    """
+    Records named spans around the stages of the data preparation: wall time, CPU time, rows in and out, and
+    optionally the peak memory allocated during the stage.
+
+    Each finished span is logged at INFO level through the 'data_prep.instrumentation' logger and, if a sink is set,
+    appended to a JSON-lines file. While the tracer is disabled, `span` hands out a shared do-nothing span, so the
+    instrumented code pays only for a function call and an attribute check.
+
+    CPU time is the process CPU time, so it includes threads running alongside the stage. Memory is measured with
+    tracemalloc, which slows the traced code down considerably, so it is only enabled on request. Its peak is kept for
+    the whole process and each span resets it, so spans open at the same time in other threads would corrupt each
+    other's peaks; `StageGraph` therefore runs its stages one after another while memory is traced. Stages run in
+    worker processes are not recorded.
+
+    Attributes:
+        enabled (bool): Whether spans are recorded.
+        records (list): The finished spans as dicts, in the order they finished.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        self.__sink_path = None
+        self.__trace_memory = False
+        self.__started_tracemalloc = False
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    def enable(self, sink_path=None, trace_memory=False):
+        """
+        Starts recording spans.
+
+        Parameters:
+            sink_path (str, optional): A JSON-lines file each finished span is appended to; defaults to None (no file).
+            trace_memory (bool, optional): Measure the peak memory of each stage with tracemalloc; defaults to False.
+        """
+        self.__sink_path = sink_path
+        self.__trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__started_tracemalloc = True
+        self.enabled = True
+
+    @property
+    def traces_memory(self):
+        """ Whether spans are being recorded with their peak memory. """
+        return self.enabled and self.__trace_memory
+
+    def disable(self):
+        """ Stops recording spans. The records collected so far are kept. """
+        self.enabled = False
+        if self.__started_tracemalloc:
+            tracemalloc.stop()
+            self.__started_tracemalloc = False
+
+    def reset(self):
+        """ Discards the records collected so far. """
+        with self.__lock:
+            self.records = []
+
+    def span(self, name, rows_in=None):
+        """
+        Returns a context manager that records a span around a block.
+
+        Parameters:
+            name (str): The stage name.
+            rows_in (int, optional): The number of rows the stage reads, if known up front.
+
+        Returns:
+            A context manager yielding the span. Set `rows_out` (and `rows_in`) on it within the block.
+        """
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return self.__record(name, rows_in)
+
+    def traced(self, name):
+        """
+        Returns a decorator that records a span around every call of a function. Within the function, the span is
+        available as `tracer.current()`.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def current(self):
+        """ Returns the innermost open span of the calling thread, or a do-nothing span if there is none. """
+        stack = getattr(self.__local, 'stack', None)
+        return stack[-1] if self.enabled and stack else _DISABLED_SPAN
+
+    @contextmanager
+    def attach(self, span):
+        """
+        Returns a context manager that makes a span opened in another thread enclose the spans the calling thread opens
+        within the block, e.g. for work handed to a thread pool.
+
+        Parameters:
+            span (Span): The enclosing span, usually `tracer.current()` of the thread handing over the work.
+
+        Returns:
+            A context manager yielding nothing. Without an open span to attach, it does nothing.
+        """
+        if not self.enabled or not isinstance(span, Span):
+            yield
+            return
+        stack = getattr(self.__local, 'stack', None)
+        if stack is None:
+            stack = self.__local.stack = []
+        stack.append(span)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def summary(self):
+        """
+        Summarizes the records by stage.
+
+        Returns:
+            list: One dict per stage name in order of first completion, with the number of calls, the total wall and
+            CPU time, the total rows in and out, and the largest peak memory.
+        """
+        stages = {}
+        with self.__lock:
+            records = list(self.records)
+        for record in records:
+            stage = stages.setdefault(record['name'], {'name': record['name'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                       'rows_in': None, 'rows_out': None, 'peak_bytes': None})
+            stage['calls'] += 1
+            stage['wall_s'] += record['wall_s']
+            stage['cpu_s'] += record['cpu_s']
+            for key in ('rows_in', 'rows_out'):
+                if record[key] is not None:
+                    stage[key] = (stage[key] or 0) + record[key]
+            if record['peak_bytes'] is not None:
+                stage['peak_bytes'] = max(stage['peak_bytes'] or 0, record['peak_bytes'])
+        return list(stages.values())
+
+    def format_summary(self):
+        """ Returns the summary as a text table. """
+        lines = [f"{'Stage':<28} {'Calls':>5} {'Wall (s)':>9} {'CPU (s)':>9} {'Rows in':>11} {'Rows out':>11} {'Peak (MB)':>10}"]
+        for stage in self.summary():
+            rows_in = '' if stage['rows_in'] is None else stage['rows_in']
+            rows_out = '' if stage['rows_out'] is None else stage['rows_out']
+            peak = '' if stage['peak_bytes'] is None else f"{stage['peak_bytes'] / 2**20:.1f}"
+            lines.append(f"{stage['name']:<28} {stage['calls']:>5} {stage['wall_s']:>9.3f} {stage['cpu_s']:>9.3f} "
+                         f"{rows_in:>11} {rows_out:>11} {peak:>10}")
+        return "\n".join(lines)
+
+    @contextmanager
+    def __record(self, name, rows_in):
+        stack = getattr(self.__local, 'stack', None)
+        if stack is None:
+            stack = self.__local.stack = []
+        span = Span(name, stack[-1].name if stack else None, rows_in)
+        tracing = self.__trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset for the new span, so the enclosing span keeps the peak seen so far itself
+            if stack and stack[-1].peak_memory is not None:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, peak)
+            tracemalloc.reset_peak()
+            span.start_memory = span.peak_memory = current
+
+        stack.append(span)
+        error = None
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield span
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+            stack.pop()
+            peak_bytes = None
+            if tracing and tracemalloc.is_tracing():
+                span.peak_memory = max(span.peak_memory, tracemalloc.get_traced_memory()[1])
+                peak_bytes = span.peak_memory - span.start_memory
+                if stack and stack[-1].peak_memory is not None:
+                    stack[-1].peak_memory = max(stack[-1].peak_memory, span.peak_memory)
+            self.__finish({'name': name, 'parent': span.parent, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+                           'rows_in': span.rows_in, 'rows_out': span.rows_out, 'peak_bytes': peak_bytes,
+                           'error': error, 'pid': os.getpid(), 'timestamp': time.time()})
+
+    def __finish(self, record):
+        with self.__lock:
+            self.records.append(record)
+            if self.__sink_path is not None:
+                try:
+                    with open(self.__sink_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record) + "\n")
+                except OSError as e:
+                    logger.warning(f"Could not write to the instrumentation sink {self.__sink_path}: {e}")
+        logger.info(f"{record['name']}: {record['wall_s']:.3f} s wall, {record['cpu_s']:.3f} s CPU, "
+                     f"rows {record['rows_in']} -> {record['rows_out']}", extra={'stage': record})
+
+
+# The tracer shared by the data preparation classes
+tracer = StageTracer()
@@ -1,29 +1,85 @@
 import pandas as pd
+import hashlib
 import logging
-from .read_util import find_encoding
-from config.config import company_aliases
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+from .read_util import (find_encoding, split_into_byte_ranges, open_byte_range, find_complete_records_end, hash_file_range,
+                        file_fingerprint, is_partitioned_input, expand_input_files)
+from .datetime_inference import get_datetime_formats, parse_datetimes
+from .frame_cache import hash_mapping
+from .watermark import IngestionWatermark
+from .partition_manifest import PartitionManifest
+from .alias_resolver import AliasResolver
+from .schema import LINKED_SCHEMA, apply_schema
+from .instrumentation import tracer
+from .stage_graph import process_pool_context
+from config.config import company_aliases, alias_fuzzy_cutoff
 
 class OutageDataProcessor:
-    def __init__(self, outage_file_name, start_year, end_year, folder="datasets"):
+    use_columns = ['u_company', 'u_incident_date_time', 'u_outage_report_status']
+    report_status = 'Final'
+
+    def __init__(self, outage_file_name, start_year, end_year, folder="datasets", workers=1, streaming=False, cache=None,
+                 incremental=False, state_dir=None):
         """
         Initializes the OutageDataProcessor with specified file, year range, and storage folder.
 
         Parameters:
-            outage_file_name (str): The name of the outage data file.
-            start_year (int): The starting year for filtering the data.
-            end_year (int): The ending year for filtering the data.
+            outage_file_name (str): The name of the outage data file. A directory or a glob pattern such as 'nors/*.csv'
+                reads every matching CSV file as one partition of the data; see `PartitionManifest`.
+            start_year (int): The starting year for filtering the data, or None for no lower bound.
+            end_year (int): The ending year for filtering the data, or None for no upper bound.
             folder (str): The directory where the outage data file is stored.
+            workers (int): The number of processes used to parse the outage file. A value of 1 reads the file serially.
+                For a partitioned input, new or changed files are parsed in parallel instead.
+            streaming (bool): If True, only running (Company, Year, Quarter) counts are kept while loading, and the
+                row-level data is read on demand by `get_outage_data`.
+            cache (FrameCache): An optional cache of filtered outage data. On a hit the file is not parsed at all.
+            incremental (bool): If True, the file is treated as append-only. A watermark of the ingested prefix is kept in
+                state_dir and each load parses only the rows appended since. Implies streaming.
+            state_dir (str): The directory holding the watermark; required in incremental mode. For a partitioned input
+                it holds the partition manifest, without which every file is parsed on each load.
 
         Initializes logging and starts the data loading and processing workflow.
         """
         self.outage_file_path = f"{folder}/{outage_file_name}"
         self.start_year = start_year
         self.end_year = end_year
+        self.workers = workers
+        self.streaming = streaming or incremental
+        self.cache = cache
+        self.incremental = incremental
+        self.watermark = None
+        self.datetime_formats = None
         self.data = None
+        self.outage_counts = None
+        self.changed_keys = None
+        self.alias_resolver = AliasResolver(company_aliases, fuzzy_cutoff=alias_fuzzy_cutoff)
+        self.partitioned = is_partitioned_input(self.outage_file_path)
+        self.partitions = None
+        self.partition_manifest = None
+
+        if self.partitioned:
+            if incremental:
+                raise ValueError("Incremental ingestion reads a single outage file; add new data to a partitioned input as new files instead.")
+            # Partitions are reduced to counts, so a partitioned input is always streamed
+            self.streaming = True
+            if state_dir is not None:
+                self.partition_manifest = PartitionManifest(state_dir, self.outage_file_path, company_aliases=hash_mapping(company_aliases),
+                                                            fuzzy_cutoff=alias_fuzzy_cutoff)
+
+        if incremental:
+            if state_dir is None:
+                raise ValueError("Incremental ingestion requires a state directory.")
+            self.watermark = IngestionWatermark(state_dir, self.outage_file_path, start_year=start_year, end_year=end_year,
+                                                company_aliases=hash_mapping(company_aliases), fuzzy_cutoff=alias_fuzzy_cutoff)
 
         logging.info(f"Initialized with year range {self.start_year} to {self.end_year}.")
         self.load_and_process_outage_data()
 
+    @tracer.traced('outage.load')
     def load_and_process_outage_data(self):
         """
         Loads and processes outage data from a specified file using defined columns and filters data based on years and status.
@@ -32,11 +88,57 @@ class OutageDataProcessor:
         - Company
         - Incident date and time
         - Outage report status
+
+        In streaming mode each filtered chunk is reduced straight to partial (Company, Year, Quarter) counts that are
+        merged into a running total, so memory use does not grow with the number of matching outages.
+
+        In incremental mode only the rows appended since the previous load are parsed. `changed_keys` then holds the
+        (Company, Year, Quarter) groups whose counts changed, or None after a full rebuild.
+
+        For a partitioned input only the files that are new or changed since the previous load are parsed, and
+        `changed_keys` holds the groups of those files and of removed files.
+        """
+        if self.partitioned:
+            self.__load_partitions()
+            return
+        if self.incremental:
+            self.__load_incrementally()
+            return
+        if self.__load_from_cache():
+            return
+
+        with tracer.span('outage.infer_formats'):
+            self.datetime_formats = get_datetime_formats(self.outage_file_path, self.__load_datetime_sample)
+        logging.info(f"Inferred incident date formats: {self.datetime_formats}")
+        with tracer.span('outage.parse') as span:
+            if self.streaming:
+                self.outage_counts = self.__accumulate_counts(self.__load_and_filter(count_only=True))
+                span.rows_out = None if self.outage_counts is None else len(self.outage_counts)
+            else:
+                self.data = self.__combine_and_process_chunks(self.__load_and_filter(count_only=False))
+                span.rows_out = len(self.data)
+        self.__save_to_cache()
+
+    def get_outage_data(self):
+        """
+        Returns the filtered row-level outage data.
+
+        In streaming mode the rows are not kept while loading, so the file is read again the first time this is called.
+        For a partitioned input every matching file is read, except those recorded with no outages in the year range,
+        in parallel and through the cache like the counts.
+
+        Returns:
+            DataFrame: The filtered outage records with 'Company', 'Year' and 'Quarter' columns.
         """
-        use_columns = ['u_company', 'u_incident_date_time', 'u_outage_report_status']
-        filtered_chunks = self.__load_csv_in_chunks_and_filter(chunk_size=10000, use_columns=use_columns)
-        self.data = self.__combine_and_process_chunks(filtered_chunks)
+        if self.data is None and self.partitioned:
+            paths = [path for path in expand_input_files(self.outage_file_path) if path not in self.partitions or self.__overlaps_years(self.partitions[path])]
+            read_partition = partial(OutageDataProcessor._read_partition, start_year=self.start_year, end_year=self.end_year, cache=self.cache)
+            self.data = pd.concat(self.__map_partitions(read_partition, paths), ignore_index=True)
+        if self.data is None:
+            self.data = self.__combine_and_process_chunks(self.__load_and_filter(count_only=False))
+        return self.data
 
+    @tracer.traced('outage.aggregate')
     def get_outage_frequency(self):
         """
         Aggregates the preprocessed data by company, year, and quarter, and counts the number of outages.
@@ -45,19 +147,188 @@ class OutageDataProcessor:
             DataFrame: A DataFrame with the count of outages grouped by company, year, and quarter.
             None: If the data is empty or not properly loaded, returns None.
         """
-        if self.data is not None and not self.data.empty:
+        if self.streaming and self.outage_counts is not None and not self.outage_counts.empty:
+            tracer.current().rows_in = len(self.outage_counts)
+            return self.__format_outage_counts()
+        if not self.streaming and self.data is not None and not self.data.empty:
+            tracer.current().rows_in = len(self.data)
             return self.__aggregate_outage_data()
         else:
             logging.warning("Data is empty or not loaded properly. Please check the data loading process.")
             return None
 
+    def __load_incrementally(self):
+        """
+        Parses only the rows appended after the watermark and adds their counts to the stored counts.
+
+        Falls back to a full rebuild when there is no watermark or the ingested prefix no longer matches its checksum.
+        """
+        self.datetime_formats = get_datetime_formats(self.outage_file_path, self.__load_datetime_sample)
+        header, _ = split_into_byte_ranges(self.outage_file_path, 1)
+        end = max(find_complete_records_end(self.outage_file_path), len(header))
+
+        resumed = self.watermark.resume(end)
+        if resumed is None:
+            offset, hasher, counts = len(header), hash_file_range(self.outage_file_path, 0, len(header), hashlib.sha256()), None
+        else:
+            offset, hasher, counts = resumed
+        logging.info(f"Ingesting bytes {offset} to {end} of {self.outage_file_path}.")
+
+        appended_counts = None
+        if end > offset:
+            encoding = find_encoding(self.outage_file_path)
+            shard = (offset, end, header, encoding, self.use_columns, 10000, True)
+            with tracer.span('outage.parse') as span:
+                appended_counts = self._filter_byte_range(self.outage_file_path, shard, self.__filter_settings(), self.alias_resolver)[0]
+                span.rows_out = None if appended_counts is None else len(appended_counts)
+
+        if resumed is None:
+            self.changed_keys = None
+        elif appended_counts is not None:
+            self.changed_keys = appended_counts.index
+        else:
+            self.changed_keys = pd.MultiIndex.from_tuples([], names=['Company', 'Year', 'Quarter'])
+        self.outage_counts = self.__accumulate_counts([counts, appended_counts])
+
+        hash_file_range(self.outage_file_path, offset, end, hasher)
+        self.watermark.save(end, hasher.hexdigest(), self.outage_counts)
+
+    def __load_partitions(self):
+        """
+        Loads the counts of a partitioned input, parsing only the files that are new or changed since they were recorded.
+
+        Each file is reduced to partial counts over all years, which are recorded in the partition manifest. Files whose
+        recorded years fall entirely outside the year range are skipped, and the counts of the others are combined and
+        restricted to the range.
+        """
+        files = expand_input_files(self.outage_file_path)
+        if not files:
+            raise FileNotFoundError(f"No outage files match {self.outage_file_path}.")
+        previous = self.partitions
+        if previous is None:
+            previous = self.partition_manifest.load() if self.partition_manifest is not None else {}
+
+        fingerprints = {path: list(file_fingerprint(path)) for path in files}
+        partitions = {path: previous[path] for path in files if path in previous and previous[path]['fingerprint'] == fingerprints[path]}
+        stale = [path for path in files if path not in partitions]
+        logging.info(f"{len(partitions)} of {len(files)} outage files are unchanged; parsing {len(stale)}.")
+        if stale:
+            with tracer.span('outage.parse') as span:
+                for path, counts in zip(stale, self.__map_partitions(OutageDataProcessor._count_partition, stale)):
+                    years = None if counts is None else counts.index.get_level_values('Year')
+                    partitions[path] = {'fingerprint': fingerprints[path], 'counts': counts,
+                                        'years': None if years is None else [int(years.min()), int(years.max())]}
+                span.rows_out = sum(0 if partitions[path]['counts'] is None else len(partitions[path]['counts']) for path in stale)
+        if self.partition_manifest is not None and (stale or partitions.keys() != previous.keys()):
+            self.partition_manifest.save(partitions)
+
+        in_range = [entry['counts'] for entry in partitions.values() if self.__overlaps_years(entry)]
+        if len(in_range) < len(partitions):
+            logging.info(f"Skipped {len(partitions) - len(in_range)} outage files with no outages from {self.start_year} to {self.end_year}.")
+        self.outage_counts = self.__restrict_to_years(self.__accumulate_counts(in_range))
+
+        if self.partitions is None:
+            self.changed_keys = None
+        else:
+            changed_paths = stale + [path for path in self.partitions if path not in partitions]
+            changed_counts = [self.partitions[path]['counts'] for path in changed_paths if path in self.partitions]
+            changed_counts += [partitions[path]['counts'] for path in changed_paths if path in partitions]
+            changed_counts = self.__restrict_to_years(self.__accumulate_counts(changed_counts))
+            self.changed_keys = pd.MultiIndex.from_tuples([], names=['Company', 'Year', 'Quarter']) if changed_counts is None else changed_counts.index
+        self.partitions = partitions
+
+    def __map_partitions(self, func, paths):
+        """
+        Calls func(path, workers) for files of a partitioned input and returns the results in order. When several
+        workers are configured, each file is handled in its own worker process; a single file is parsed with every
+        worker instead.
+        """
+        if self.workers > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(paths)), mp_context=process_pool_context()) as executor:
+                return list(executor.map(func, paths))
+        return [func(path, workers=self.workers) for path in paths]
+
+    @staticmethod
+    def _count_partition(path, workers=1):
+        """
+        Reduces one file of a partitioned input to outage counts over all years. Runs inside a worker process when several
+        files are parsed at once.
+        """
+        processor = OutageDataProcessor(os.path.basename(path), None, None, folder=os.path.dirname(path) or '.', workers=workers, streaming=True)
+        return processor.outage_counts
+
+    @staticmethod
+    def _read_partition(path, workers=1, start_year=None, end_year=None, cache=None):
+        """
+        Reads the filtered rows of one file of a partitioned input. Runs inside a worker process when several files are
+        read at once.
+        """
+        processor = OutageDataProcessor(os.path.basename(path), start_year, end_year, folder=os.path.dirname(path) or '.', workers=workers, cache=cache)
+        return processor.get_outage_data()
+
+    def __overlaps_years(self, partition):
+        """
+        Returns True if a recorded partition has outages within the year range. A bound of None is unbounded.
+        """
+        years = partition['years']
+        if years is None:
+            return False
+        return (self.end_year is None or years[0] <= self.end_year) and (self.start_year is None or years[1] >= self.start_year)
+
+    def __restrict_to_years(self, counts):
+        """
+        Keeps the outage counts within the year range, where a bound of None is unbounded. Returns None when none are left.
+        """
+        if counts is None:
+            return None
+        if self.start_year is not None:
+            counts = counts[counts.index.get_level_values('Year') >= self.start_year]
+        if self.end_year is not None:
+            counts = counts[counts.index.get_level_values('Year') <= self.end_year]
+        return None if counts.empty else counts
+
+    def __cache_key(self):
+        """
+        Builds the cache key from the outage file, the year range, the processing mode, and the company aliases.
+        """
+        return self.cache.make_key('outagecounts' if self.streaming else 'outage', [self.outage_file_path],
+                                   start_year=self.start_year, end_year=self.end_year,
+                                   company_aliases=hash_mapping(company_aliases), fuzzy_cutoff=alias_fuzzy_cutoff)
+
+    def __load_from_cache(self):
+        """
+        Restores the filtered data, or the outage counts in streaming mode, from the cache. Returns True on a hit.
+        """
+        if self.cache is None:
+            return False
+        cached = self.cache.load(self.__cache_key())
+        if cached is None:
+            return False
+        if self.streaming:
+            self.outage_counts = cached.set_index(['Company', 'Year', 'Quarter'])['Count']
+        else:
+            self.data = cached
+        return True
+
+    def __save_to_cache(self):
+        """
+        Stores the filtered data, or the outage counts in streaming mode, in the cache.
+        """
+        if self.cache is None:
+            return
+        if self.streaming:
+            if self.outage_counts is not None:
+                self.cache.save(self.__cache_key(), self.outage_counts.reset_index(name='Count'))
+        else:
+            self.cache.save(self.__cache_key(), self.data)
+
     def __combine_and_process_chunks(self, chunks):
         """
         Combines filtered data chunks into a single DataFrame and extracts year and quarter from the incident dates.
         """
         def extract_year_and_quarter(data):
-            data['Year'] = pd.to_datetime(data['u_incident_date_time']).dt.year.astype(int)
-            data['Quarter'] = 'Q' + pd.to_datetime(data['u_incident_date_time']).dt.quarter.astype(str)
+            data['Year'] = data['u_incident_date_time'].dt.year.astype(LINKED_SCHEMA['Year'])
+            data['Quarter'] = data['u_incident_date_time'].dt.quarter.astype(LINKED_SCHEMA['Quarter'])
 
         data = pd.concat(chunks, ignore_index=True)
         data.rename(columns={'u_company': 'Company'}, inplace=True)
@@ -65,38 +336,152 @@ class OutageDataProcessor:
 
         return data
 
+    def __filter_settings(self):
+        """
+        Returns the settings `_filter_byte_range` filters with, so only these and not the processor are sent to a worker process.
+        """
+        return {'datetime_formats': self.datetime_formats, 'aliases': self.alias_resolver.aliases,
+                'fuzzy_cutoff': self.alias_resolver.fuzzy_cutoff, 'report_status': self.report_status,
+                'start_year': self.start_year, 'end_year': self.end_year}
+
     def __filter_chunk_by_criteria(self, chunk):
         """
         Filters each data chunk by specified criteria including year range, report status, and company validity.
         """
-        def convert_column_to_datetime(column):
-            for fmt in ["%Y-%m-%d %H:%M:%S", "%d-%m-%Y %H:%M", "%m/%d/%Y", "%Y-%m-%d"]:
-                try:
-                    return pd.to_datetime(column, format=fmt, errors='raise')
-                except ValueError:
-                    continue
-            return pd.to_datetime(column, errors='coerce')
-        
-        chunk['u_incident_date_time'] = convert_column_to_datetime(chunk['u_incident_date_time'])
-        chunk['u_company'] = chunk['u_company'].str.strip().map(company_aliases)
-
-        valid_years = chunk['u_incident_date_time'].dt.year.between(self.start_year, self.end_year)
-        is_final = chunk['u_outage_report_status'] == 'Final'
-        company_is_valid = chunk['u_company'].isin(company_aliases.values())
+        return self.__filter_chunk(chunk, self.alias_resolver, self.datetime_formats, self.report_status, self.start_year, self.end_year)
+
+    @staticmethod
+    def __filter_chunk(chunk, alias_resolver, datetime_formats, report_status, start_year, end_year):
+        """
+        Filters a data chunk by year range, report status, and company validity.
+
+        The rows are counted towards the enclosing stage's rows in; counts made in worker processes are not reported.
+        """
+        tracer.current().add_rows_in(len(chunk))
+        chunk['u_incident_date_time'] = parse_datetimes(chunk['u_incident_date_time'], datetime_formats)
+        chunk['u_company'] = alias_resolver.resolve(chunk['u_company'])
+
+        years = chunk['u_incident_date_time'].dt.year
+        valid_years = years.notna()
+        if start_year is not None:
+            valid_years &= years >= start_year
+        if end_year is not None:
+            valid_years &= years <= end_year
+        is_final = chunk['u_outage_report_status'] == report_status
+        company_is_valid = chunk['u_company'].notna()
 
         return chunk[valid_years & is_final & company_is_valid]
 
-    def __load_csv_in_chunks_and_filter(self, chunk_size, use_columns):
+    def __load_datetime_sample(self, sample_size=10000):
+        """
+        Reads the first rows of the incident date column, used to infer the file's timestamp formats.
+        """
+        return pd.read_csv(self.outage_file_path, encoding=find_encoding(self.outage_file_path),
+                           usecols=['u_incident_date_time'], dtype=str, nrows=sample_size)['u_incident_date_time']
+
+    @staticmethod
+    def __count_chunk(chunk):
+        """
+        Reduces a filtered chunk to partial outage counts indexed by company, year, and quarter.
+        """
+        dates = chunk['u_incident_date_time']
+        year = dates.dt.year.astype(LINKED_SCHEMA['Year']).rename('Year')
+        quarter = dates.dt.quarter.astype(LINKED_SCHEMA['Quarter']).rename('Quarter')
+        return chunk.groupby([chunk['u_company'].rename('Company'), year, quarter], observed=True).size()
+
+    @staticmethod
+    def __accumulate_counts(partial_counts):
+        """
+        Merges partial outage counts into a single running total.
+        """
+        counts = None
+        for partial in partial_counts:
+            if partial is None:
+                continue
+            counts = partial if counts is None else counts.add(partial, fill_value=0)
+        return counts
+
+    def __load_and_filter(self, count_only, chunk_size=10000):
+        """
+        Reads and filters the outage data file, serially or in parallel depending on the number of workers.
+
+        Yields filtered chunks, or partial outage counts when count_only is set.
+        """
+        if self.workers > 1:
+            return self.__load_csv_in_parallel_and_filter(chunk_size, self.use_columns, count_only)
+        return self.__load_csv_in_chunks_and_filter(chunk_size, self.use_columns, count_only)
+
+    def __load_csv_in_chunks_and_filter(self, chunk_size, use_columns, count_only=False):
         """
         Reads the outage data file in chunks, applying filters to each chunk.
         """
-        chunks = []
         for chunk in pd.read_csv(self.outage_file_path, encoding=find_encoding(self.outage_file_path), usecols=use_columns, chunksize=chunk_size):
-            chunks.append(self.__filter_chunk_by_criteria(chunk))
-        return chunks
+            filtered_chunk = self.__filter_chunk_by_criteria(chunk)
+            yield self.__count_chunk(filtered_chunk) if count_only else filtered_chunk
+
+    def __load_csv_in_parallel_and_filter(self, chunk_size, use_columns, count_only=False):
+        """
+        Splits the outage data file into line-aligned byte ranges and filters each range in a separate process.
+
+        Filtered chunks are yielded in file order, so the combined result matches the serial reader. When count_only
+        is set, each worker reduces its range to a single set of partial counts instead. Falls back to the serial reader for encodings where newlines and quotes are not single bytes.
+        """
+        encoding = find_encoding(self.outage_file_path)
+        if '"\n'.encode(encoding or 'ascii') != b'"\n':
+            logging.warning(f"Parallel ingestion is not supported for {encoding} files; reading serially.")
+            yield from self.__load_csv_in_chunks_and_filter(chunk_size, use_columns, count_only)
+            return
+
+        header, byte_ranges = split_into_byte_ranges(self.outage_file_path, self.workers)
+        logging.info(f"Reading {self.outage_file_path} in {len(byte_ranges)} shards with {self.workers} workers.")
+        shards = [(start, end, header, encoding, use_columns, chunk_size, count_only) for start, end in byte_ranges]
+        if not shards:
+            yield from self.__load_csv_in_chunks_and_filter(chunk_size, use_columns, count_only)
+            return
+
+        settings = self.__filter_settings()
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=process_pool_context()) as executor:
+            for shard_results in executor.map(OutageDataProcessor._filter_byte_range, repeat(self.outage_file_path), shards, repeat(settings)):
+                yield from shard_results
+
+    @staticmethod
+    def _filter_byte_range(filepath, shard, settings, alias_resolver=None):
+        """
+        Reads and filters a single byte range of the outage data file. Runs inside a worker process.
+
+        Parameters:
+            filepath (str): The outage data file.
+            shard (tuple): The byte range and read options: (start, end, header, encoding, use_columns, chunk_size, count_only).
+            settings (dict): The filter settings, as returned by `__filter_settings`.
+            alias_resolver (AliasResolver, optional): The resolver to use; defaults to one built from the settings' aliases.
+
+        Returns:
+            list: The filtered chunks, or a single set of partial counts when count_only is set.
+        """
+        start, end, header, encoding, use_columns, chunk_size, count_only = shard
+        if alias_resolver is None:
+            alias_resolver = AliasResolver(settings['aliases'], fuzzy_cutoff=settings['fuzzy_cutoff'])
+        with open_byte_range(filepath, start, end, header) as stream:
+            reader = pd.read_csv(stream, encoding=encoding, usecols=use_columns, chunksize=chunk_size)
+            filtered_chunks = (OutageDataProcessor.__filter_chunk(chunk, alias_resolver, settings['datetime_formats'], settings['report_status'],
+                                                                  settings['start_year'], settings['end_year'])
+                               for chunk in reader)
+            if count_only:
+                return [OutageDataProcessor.__accumulate_counts(OutageDataProcessor.__count_chunk(chunk) for chunk in filtered_chunks)]
+            return list(filtered_chunks)
 
     def __aggregate_outage_data(self):
         """
         Aggregates the data by 'Company', 'Year', and 'Quarter' and computes the count of records for each group.
         """
-        return self.data.groupby(['Company', 'Year', 'Quarter']).size().reset_index(name='Count')
+        counts = self.data.groupby(['Company', 'Year', 'Quarter'], observed=True).size().reset_index(name='Count')
+        tracer.current().rows_out = len(counts)
+        return apply_schema(counts)
+
+    def __format_outage_counts(self):
+        """
+        Converts the running outage counts accumulated in streaming mode into the same layout as the aggregated data.
+        """
+        counts = self.outage_counts.astype(int).sort_index().reset_index(name='Count')
+        tracer.current().rows_out = len(counts)
+        return apply_schema(counts, company_categories=self.alias_resolver.categories)
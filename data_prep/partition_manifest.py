@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+from .schema import LINKED_SCHEMA
+
+# Bump whenever the layout of the stored state changes so old manifests trigger a full parse
+PARTITION_MANIFEST_VERSION = 1
+
+
+class PartitionManifest:
+    """
+    Records the outage counts of each file of a partitioned outage input, so only new or changed files are parsed.
+
+    An outage input given as a directory or glob pattern is read as a set of partitions, e.g. monthly NORS drops. For
+    each file the manifest holds its fingerprint (path, size and modification time), the range of incident years it
+    contains and its partial (Company, Year, Quarter) counts over all years. Counts are kept for every year so a
+    different year range needs no parsing, and files whose years fall outside the range are skipped.
+
+    Attributes:
+        pattern (str): The directory or glob pattern naming the files.
+        state_path (str): The JSON file holding the manifest.
+        params (dict): Processing parameters; a manifest recorded with different parameters is discarded.
+    """
+    def __init__(self, state_dir, pattern, **params):
+        """
+        Initializes the PartitionManifest.
+
+        Parameters:
+            state_dir (str): The directory where the manifest is stored.
+            pattern (str): The directory or glob pattern naming the files.
+            **params: Processing parameters that affect the stored counts. Values must be JSON serializable.
+        """
+        self.pattern = pattern
+        name = hashlib.sha256(os.path.abspath(pattern).encode('utf-8')).hexdigest()[:16]
+        self.state_path = os.path.join(state_dir, f"partitions-{name}.json")
+        self.params = params
+
+    def load(self):
+        """
+        Loads the recorded partitions.
+
+        Returns:
+            dict: For each recorded file path, a dict with its 'fingerprint', its 'years' as [first, last] (None if
+            it has no matching outages) and its 'counts' Series. Empty if there is no usable manifest.
+        """
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable partition manifest {self.state_path}: {e}")
+            return {}
+
+        if state.get('version') != PARTITION_MANIFEST_VERSION or state.get('params') != self.params:
+            logging.info("Partition manifest was recorded with different parameters; parsing every file.")
+            return {}
+        return {path: {'fingerprint': entry['fingerprint'], 'years': entry['years'], 'counts': rows_to_counts(entry['counts'])}
+                for path, entry in state['files'].items()}
+
+    def save(self, partitions):
+        """
+        Stores the partitions, replacing the recorded ones.
+
+        Parameters:
+            partitions (dict): As returned by `load`, for the files currently matched.
+        """
+        state = {
+            'version': PARTITION_MANIFEST_VERSION,
+            'params': self.params,
+            'files': {path: {'fingerprint': list(entry['fingerprint']), 'years': entry['years'], 'counts': counts_to_rows(entry['counts'])}
+                      for path, entry in partitions.items()},
+        }
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+
+def counts_to_rows(counts):
+    """
+    Converts outage counts indexed by company, year, and quarter into JSON-serializable rows.
+    """
+    if counts is None:
+        return []
+    return [[company, int(year), int(quarter), int(count)] for (company, year, quarter), count in counts.items()]
+
+
+def rows_to_counts(rows):
+    """
+    Converts rows stored by `counts_to_rows` back into outage counts indexed by company, year, and quarter.
+    """
+    if not rows:
+        return None
+    counts = pd.DataFrame(rows, columns=['Company', 'Year', 'Quarter', 'Count'])
+    counts = counts.astype({'Year': LINKED_SCHEMA['Year'], 'Quarter': LINKED_SCHEMA['Quarter']})
+    return counts.set_index(['Company', 'Year', 'Quarter'])['Count']
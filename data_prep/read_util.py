@@ -1,11 +1,15 @@
-import chardet
+import codecs
+import glob
+import io
 import os
+import re
+import threading
+from collections import OrderedDict
 import pandas as pd
+
 def find_encoding(fname):
     try:
-        with open(fname, 'rb') as f:
-            result = chardet.detect(f.read(100000))  # Read the first 100000 bytes to detect encoding
-            return result['encoding']
+        return _detected_encodings.get_or_compute(fname, lambda: _read_and_detect_encoding(fname))
     except FileNotFoundError:
         return "Error: File not found."
     except IOError as e:
@@ -13,6 +17,114 @@ def find_encoding(fname):
     except Exception as e:
         return f"Error: An unexpected error occurred. {e}"
     
+def _read_and_detect_encoding(fname):
+    with open(fname, 'rb') as f:
+        return _detect_encoding(f.read(100000))  # Read the first 100000 bytes to detect encoding
+
+def _detect_encoding(sample):
+    """
+    Detects the encoding of a byte sample, validating it as UTF-8 before falling back to chardet.
+
+    Most exports are UTF-8 or plain ASCII, which a strict decode confirms far faster than statistical detection.
+    Samples containing NUL bytes are left to chardet since they usually indicate UTF-16.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if b'\x00' not in sample:
+        try:
+            # Not final, so a multi-byte character cut off at the end of the sample is not an error
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+    # chardet is only needed for files that are not UTF-8, so it is imported on first use
+    import chardet
+    return chardet.detect(sample)['encoding']
+
+
+def read_raw_file(filepath):
+    """
+    Reads a CSV or Excel file once into a headerless DataFrame.
+
+    The encoding of CSV files is detected once and returned alongside the data, so callers do not need to sniff it again.
+
+    Parameters:
+        filepath (str): Path to the file to be read.
+
+    Returns:
+        tuple: The raw DataFrame (with integer column labels) and the detected encoding, or None for Excel files.
+
+    Raises:
+        ValueError: If the file format is not supported. Errors raised by pandas while reading are propagated.
+    """
+    file_extension = os.path.splitext(filepath)[1]
+    if file_extension == '.csv':
+        encoding = find_encoding(filepath)
+        return pd.read_csv(filepath, header=None, encoding=encoding), encoding
+    elif file_extension in ['.xls', '.xlsx']:
+        return pd.read_excel(filepath, header=None, engine='openpyxl'), None
+    else:
+        raise ValueError("Unsupported file format: {}".format(file_extension))
+
+def read_quarterly_workbook(filepath, id_column='SP_ENTITY_NAME', metric='PP&E', header_search_rows=50):
+    """
+    Streams a Capital IQ workbook in read-only mode and keeps only the entity name and quarterly columns.
+
+    The header row is the row containing `id_column`. Quarter labels in 'CQnYYYY' form are taken from that row or
+    from the first row below it that has any. When the header row labels the metric of each column and `metric` is
+    among them, only that metric's quarters are kept, so multi-metric exports yield one column per quarter.
+
+    Parameters:
+        filepath (str): Path to the .xlsx workbook.
+        id_column (str, optional): The label of the entity name column; defaults to 'SP_ENTITY_NAME'.
+        metric (str, optional): The metric to keep in multi-metric exports; defaults to 'PP&E'.
+        header_search_rows (int, optional): The number of leading rows searched for the header; defaults to 50.
+
+    Returns:
+        DataFrame: The entity names and quarterly values, with `id_column` and the quarter labels as columns.
+        None: If the header or the quarter labels cannot be found, so the caller can fall back to a full read.
+    """
+    import openpyxl  # Only needed for Excel files, so it is imported on first use
+    quarter_pattern = re.compile(r'^CQ[1-4]\d{4}$')
+    workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = None
+        for row_number, row in enumerate(rows):
+            if id_column in row:
+                header = row
+                break
+            if row_number >= header_search_rows:
+                return None
+        if header is None:
+            return None
+
+        name_index = header.index(id_column)
+        quarter_columns = {}
+        row = header
+        while True:
+            quarter_columns = {i: value for i, value in enumerate(row)
+                               if isinstance(value, str) and quarter_pattern.match(value)}
+            if quarter_columns:
+                break
+            row = next(rows, None)
+            if row is None:
+                return None
+
+        metric_columns = {i: label for i, label in quarter_columns.items() if i < len(header) and header[i] == metric}
+        if metric_columns:
+            quarter_columns = metric_columns
+        indices = [name_index] + list(quarter_columns)
+
+        records = []
+        for row in rows:
+            if name_index < len(row) and row[name_index] is not None:
+                records.append([row[i] if i < len(row) else None for i in indices])
+    finally:
+        workbook.close()
+
+    return pd.DataFrame.from_records(records, columns=[id_column] + list(quarter_columns.values()))
+
 def read_file( filepath):
     try:
         file_extension = os.path.splitext(filepath)[1]
@@ -29,4 +141,226 @@ def read_file( filepath):
     except pd.errors.ParserError:
         print(f"Parsing error: {filepath} is malformed")
     except Exception as e:
-        print(f"An error occurred while reading {filepath}: {e}")
\ No newline at end of file
+        print(f"An error occurred while reading {filepath}: {e}")
+
+def split_into_byte_ranges(filepath, parts, block_size=1 << 24):
+    """
+    Splits a delimited text file into line-aligned byte ranges that can be parsed independently.
+
+    Quote characters are tracked while scanning so a split never lands on a newline embedded in a
+    quoted field. The scan only counts bytes, which is far cheaper than parsing the file.
+
+    Parameters:
+        filepath (str): Path to the file to split.
+        parts (int): The desired number of ranges.
+        block_size (int, optional): Number of bytes scanned at a time; defaults to 16 MB.
+
+    Returns:
+        tuple: The header bytes and a list of (start, end) byte offsets covering every data row.
+    """
+    size = os.path.getsize(filepath)
+    header_end = _find_record_boundaries(filepath, [0], block_size)
+    header_end = header_end[0] if header_end else size
+    with open(filepath, 'rb') as f:
+        header = f.read(header_end)
+
+    targets = [header_end + (size - header_end) * i // parts for i in range(1, parts)]
+    offsets = [header_end] + _find_record_boundaries(filepath, targets, block_size) + [size]
+    ranges = [(start, end) for start, end in zip(offsets, offsets[1:]) if end > start]
+    return header, ranges
+
+
+def open_byte_range(filepath, start, end, header=b''):
+    """
+    Opens a binary stream over bytes [start, end) of a file, prefixed with the given header bytes.
+
+    The stream can be passed directly to `pd.read_csv`, which then sees a self-contained CSV file.
+    """
+    return io.BufferedReader(_ByteRangeStream(filepath, start, end, header))
+
+
+def _find_record_boundaries(filepath, targets, block_size):
+    """ Returns, for each target offset, the offset just past the first unquoted newline at or after it. """
+    offsets = []
+    pending = iter(targets)
+    target = next(pending, None)
+    in_quotes = False
+    base = 0
+    with open(filepath, 'rb') as f:
+        while target is not None:
+            block = f.read(block_size)
+            if not block:
+                break
+            cursor = 0
+            while target is not None:
+                start = max(target - base, cursor)
+                if start >= len(block):
+                    break
+                in_quotes ^= block.count(b'"', cursor, start) % 2 == 1
+                cursor = start
+                newline = block.find(b'\n', cursor)
+                while newline != -1:
+                    in_quotes ^= block.count(b'"', cursor, newline) % 2 == 1
+                    cursor = newline + 1
+                    if not in_quotes:
+                        break
+                    newline = block.find(b'\n', cursor)
+                if newline == -1:
+                    break
+                offsets.append(base + cursor)
+                target = next(pending, None)
+            in_quotes ^= block.count(b'"', cursor) % 2 == 1
+            base += len(block)
+    return offsets
+
+
+class _ByteRangeStream(io.RawIOBase):
+    """ Raw stream that yields a header followed by a slice of a file. """
+    def __init__(self, filepath, start, end, header):
+        self._file = open(filepath, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+        self._header = header
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._header:
+            n = min(len(buffer), len(self._header))
+            buffer[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        if self._remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), self._remaining))
+        n = len(data)
+        buffer[:n] = data
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def file_fingerprint(filepath):
+    """
+    Returns a cheap fingerprint identifying the current contents of a file.
+
+    The fingerprint combines the absolute path, size and modification time, so it changes whenever the file is
+    rewritten without having to hash its contents.
+    """
+    stat = os.stat(filepath)
+    return (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+
+
+class FileMemo:
+    """
+    Memoizes a value derived from a file, such as its detected encoding, until the file changes.
+
+    Each file keeps only the value for its current fingerprint, so a watched file that keeps changing does not add an
+    entry per version, and only the most recently used files are kept. Safe to use from several threads.
+
+    Attributes:
+        max_files (int): The number of files whose values are kept.
+    """
+    def __init__(self, max_files=64):
+        """
+        Parameters:
+            max_files (int, optional): The number of files whose values are kept; defaults to 64.
+        """
+        self.max_files = max_files
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get_or_compute(self, filepath, compute):
+        """
+        Returns the value memoized for the current version of a file, calling `compute()` when there is none.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
+        fingerprint = file_fingerprint(filepath)
+        path = fingerprint[0]
+        with self.__lock:
+            entry = self.__entries.get(path)
+            if entry is not None and entry[0] == fingerprint:
+                self.__entries.move_to_end(path)
+                return entry[1]
+
+        value = compute()
+        with self.__lock:
+            self.__entries[path] = (fingerprint, value)
+            self.__entries.move_to_end(path)
+            while len(self.__entries) > self.max_files:
+                self.__entries.popitem(last=False)
+        return value
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+
+# Encodings already detected, kept until each file changes
+_detected_encodings = FileMemo()
+
+
+def is_partitioned_input(path):
+    """
+    Returns True if a path names a set of files, i.e. it is a glob pattern or a directory, rather than a single file.
+    """
+    return re.search(r'[*?[]', path) is not None or os.path.isdir(path)
+
+
+def expand_input_files(path, extension='.csv'):
+    """
+    Returns the files an input path names, so data can be given as one file or as many partial files.
+
+    Parameters:
+        path (str): A file, a directory, or a glob pattern such as 'datasets/nors/*.csv'.
+        extension (str, optional): The extension of the files taken from a directory; defaults to '.csv'.
+
+    Returns:
+        list: The matching files in sorted order, or [path] when it names a single file, whether or not it exists.
+    """
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path)
+                      if name.endswith(extension) and os.path.isfile(os.path.join(path, name)))
+    if is_partitioned_input(path):
+        return sorted(name for name in glob.glob(path) if os.path.isfile(name))
+    return [path]
+
+
+def find_complete_records_end(filepath, block_size=1 << 20):
+    """
+    Returns the offset just past the last newline of a file, i.e. the end of its last fully written line.
+
+    Used by append-only readers so a line that is still being written is picked up on the next read instead.
+    """
+    with open(filepath, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def hash_file_range(filepath, start, end, hasher, block_size=1 << 24):
+    """
+    Feeds bytes [start, end) of a file into a hashlib hasher and returns the hasher.
+    """
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
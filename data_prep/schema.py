@@ -0,0 +1,69 @@
+import pandas as pd
+
+# Declared dtypes of the linked outage/PP&E dataset. 'Count' is downcast to the smallest integer type that fits.
+LINKED_SCHEMA = {
+    'Company': 'category',
+    'Year': 'int16',
+    'Quarter': 'int8',
+    'Count': 'integer',
+    'PP&E': 'float64',
+}
+
+
+def apply_schema(df, company_categories=None):
+    """
+    Converts the columns of a linked dataset to the compact dtypes declared in LINKED_SCHEMA.
+
+    Quarters may be given as integers or as 'Q1'..'Q4' labels. Columns missing from the frame are skipped.
+
+    Parameters:
+        df (DataFrame): The dataset to convert; it is modified in place.
+        company_categories (Index, optional): Fixed categories for the 'Company' column. Defaults to the
+            existing categories, or the distinct company names if the column is not categorical yet.
+
+    Returns:
+        DataFrame: The converted dataset.
+    """
+    if 'Company' in df.columns:
+        if company_categories is not None:
+            df['Company'] = pd.Categorical(df['Company'], categories=company_categories)
+        elif not isinstance(df['Company'].dtype, pd.CategoricalDtype):
+            df['Company'] = df['Company'].astype('category')
+    if 'Quarter' in df.columns:
+        df['Quarter'] = parse_quarter(df['Quarter'])
+    if 'Year' in df.columns:
+        df['Year'] = df['Year'].astype(LINKED_SCHEMA['Year'])
+    if 'Count' in df.columns:
+        df['Count'] = pd.to_numeric(df['Count'], downcast=LINKED_SCHEMA['Count'])
+    if 'PP&E' in df.columns:
+        df['PP&E'] = pd.to_numeric(df['PP&E'], errors='coerce').astype(LINKED_SCHEMA['PP&E'])
+    return df
+
+
+def parse_quarter(quarter):
+    """
+    Converts quarters given as 'Q1'..'Q4' labels or as numbers into int8 quarter numbers.
+    """
+    if quarter.dtype == object:
+        quarter = quarter.astype(str).str.lstrip('Qq')
+    return pd.to_numeric(quarter).astype(LINKED_SCHEMA['Quarter'])
+
+
+def format_quarter(quarter):
+    """
+    Converts int8 quarter numbers back into 'Q1'..'Q4' labels, the format used in exported files.
+    """
+    return 'Q' + quarter.astype(str)
+
+
+def memory_report(df):
+    """
+    Reports the dtype and memory footprint of each column of a DataFrame.
+
+    Returns:
+        DataFrame: One row per column with its dtype and size in bytes, followed by a 'Total' row.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report.loc['Total'] = ['', int(usage.sum())]
+    return report
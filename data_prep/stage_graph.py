@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .instrumentation import tracer
+
+
+def process_pool_context():
+    """
+    Returns the multiprocessing context for a process pool started by the data preparation.
+
+    Forking copies only the calling thread, so a lock held by another thread at that moment, e.g. by a logging handler
+    or within pandas, stays locked forever in the child. While other threads are running, such as the stages of a
+    `StageGraph`, the workers are therefore started with 'spawn', which starts a fresh interpreter instead.
+
+    Returns:
+        The 'spawn' context while other threads are alive, otherwise None (the platform default).
+    """
+    if threading.current_thread() is not threading.main_thread() or threading.active_count() > 1:
+        return multiprocessing.get_context('spawn')
+    return None
+
+
+class StageGraph:
+    """
+    Runs the stages of the data preparation in dependency order, running stages that do not depend on each other at
+    the same time.
+
+    Stages run in a thread pool rather than a process pool: they hand over large DataFrames, which would otherwise be
+    pickled between processes, and the outage stage may start a process pool of its own. pandas releases the GIL for
+    much of the CSV parsing and file I/O, so independent stages still overlap. Process pools started within a stage
+    use `process_pool_context`, as forking while other stages run is unsafe. The spans a stage records are nested in
+    the span open where `run` is called, as they would be if the stage ran in the calling thread.
+
+    Attributes:
+        workers (int): The number of stages run at the same time. With 1, the stages run one after another in the
+            calling thread, in the order they were added. While the tracer measures peak memory, which tracemalloc
+            only tracks for the whole process, the stages always run one after another so each span's peak is its own.
+    """
+    def __init__(self, workers=2):
+        """
+        Initializes an empty StageGraph.
+
+        Parameters:
+            workers (int, optional): The number of stages run at the same time; defaults to 2.
+        """
+        self.workers = workers
+        self.__stages = {}
+
+    def add(self, name, func, depends_on=()):
+        """
+        Adds a stage.
+
+        Parameters:
+            name (str): The stage name.
+            func (callable): Runs the stage. It is called with the results of its dependencies, in the order given.
+            depends_on (list, optional): The names of the stages whose results the stage needs. They must have been
+                added already, which keeps the graph free of cycles; defaults to no dependencies.
+
+        Raises:
+            ValueError: If the name is taken or a dependency has not been added.
+        """
+        if name in self.__stages:
+            raise ValueError(f"A stage named '{name}' already exists.")
+        unknown = [dependency for dependency in depends_on if dependency not in self.__stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {', '.join(unknown)}.")
+        self.__stages[name] = (func, list(depends_on))
+
+    def run(self):
+        """
+        Runs every stage once its dependencies have finished.
+
+        When a stage fails, no further stages are started. The stages already running are waited for, as threads
+        cannot be interrupted, and then the first exception is raised again with a note naming its stage.
+
+        Returns:
+            dict: The result of each stage, keyed by stage name.
+        """
+        results = {}
+        if self.workers <= 1 or tracer.traces_memory:
+            for name, (func, depends_on) in self.__stages.items():
+                results[name] = self.__run_stage(name, func, [results[dependency] for dependency in depends_on])
+            return results
+
+        pending = dict(self.__stages)
+        running = {}
+        error = None
+        parent = tracer.current()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prepare') as executor:
+            while pending or running:
+                if error is None:
+                    ready = [name for name, (_, depends_on) in pending.items() if all(dependency in results for dependency in depends_on)]
+                    for name in ready:
+                        func, depends_on = pending.pop(name)
+                        future = executor.submit(self.__run_attached_stage, parent, name, func, [results[dependency] for dependency in depends_on])
+                        running[future] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    @staticmethod
+    def __run_attached_stage(parent, name, func, arguments):
+        with tracer.attach(parent):
+            return StageGraph.__run_stage(name, func, arguments)
+
+    @staticmethod
+    def __run_stage(name, func, arguments):
+        try:
+            return func(*arguments)
+        except Exception as e:
+            e.add_note(f"Raised in the data preparation stage '{name}'.")
+            raise
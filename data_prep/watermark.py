@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+from .read_util import hash_file_range
+from .partition_manifest import counts_to_rows, rows_to_counts
+
+# Bump whenever the layout of the stored state changes so old watermarks trigger a rebuild
+WATERMARK_VERSION = 3
+
+
+class IngestionWatermark:
+    """
+    Records how far an append-only file has been ingested, together with the outage counts derived from that prefix.
+
+    The state holds the byte offset of the ingested prefix and a SHA-256 checksum of it. Resuming verifies the
+    checksum, so a file whose prefix has been rewritten is detected and rebuilt from scratch.
+
+    Attributes:
+        filepath (str): The append-only source file.
+        state_path (str): The JSON file holding the watermark and counts.
+        params (dict): Processing parameters; a watermark recorded with different parameters is discarded.
+    """
+    def __init__(self, state_dir, filepath, **params):
+        """
+        Initializes the IngestionWatermark.
+
+        Parameters:
+            state_dir (str): The directory where the watermark state is stored.
+            filepath (str): The append-only source file.
+            **params: Processing parameters that affect the stored counts. Values must be JSON serializable.
+        """
+        self.filepath = filepath
+        name = hashlib.sha256(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:16]
+        self.state_path = os.path.join(state_dir, f"watermark-{name}.json")
+        self.params = params
+
+    def resume(self, end):
+        """
+        Loads and verifies the stored watermark.
+
+        Parameters:
+            end (int): The current end of the ingestible part of the file.
+
+        Returns:
+            tuple: The ingested offset, a hasher primed with the ingested prefix, and the stored counts.
+            None: If there is no usable watermark and the file must be ingested from the start.
+        """
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable watermark {self.state_path}: {e}")
+            return None
+
+        if state.get('version') != WATERMARK_VERSION or state.get('params') != self.params:
+            logging.info("Watermark was recorded with different parameters; rebuilding.")
+            return None
+        offset = state['offset']
+        if offset > end:
+            logging.warning(f"{self.filepath} is shorter than its watermark; rebuilding.")
+            return None
+        hasher = hash_file_range(self.filepath, 0, offset, hashlib.sha256())
+        if hasher.hexdigest() != state['checksum']:
+            logging.warning(f"The ingested part of {self.filepath} has been rewritten; rebuilding.")
+            return None
+
+        return offset, hasher, rows_to_counts(state['counts'])
+
+    def save(self, offset, checksum, counts):
+        """
+        Stores the watermark and the counts of the ingested prefix.
+
+        Parameters:
+            offset (int): The end of the ingested prefix.
+            checksum (str): The SHA-256 hex digest of the ingested prefix.
+            counts (Series): Outage counts indexed by company, year, and quarter, or None if there are none.
+        """
+        state = {
+            'version': WATERMARK_VERSION,
+            'params': self.params,
+            'offset': offset,
+            'checksum': checksum,
+            'counts': counts_to_rows(counts),
+        }
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
@@ -1,4 +1,6 @@
 from .layout import create_layout
 from .callbacks import register_callbacks
+from .figure_cache import FigureCache
+from .metrics import CallbackMetrics
 
-__all__ = ['create_layout', 'register_callbacks']
\ No newline at end of file
+__all__ = ['create_layout', 'register_callbacks', 'FigureCache', 'CallbackMetrics']
\ No newline at end of file
@@ -1,38 +1,179 @@
-from dash.dependencies import Input, Output
+import functools
+import json
+import plotly.graph_objects as go
+from dash.dependencies import Input, Output, State
 from dash import html
 from dash import dcc
+from dash import Patch, ctx, no_update
+from dash.exceptions import PreventUpdate
+
+def register_callbacks(app, visualizer, figure_cache=None, metrics=None, background_manager=None):
+    def cached_figure(callback_id, inputs, build):
+        # Serves repeated selections from the figure cache, keyed by the dataset the visualizer currently holds and
+        # the settings that change how figures are rendered
+        if figure_cache is None:
+            return build()
+        render_settings = [visualizer.webgl_threshold, visualizer.max_points_per_series]
+        return figure_cache.get_or_build(callback_id, list(inputs) + render_settings, visualizer.data_fingerprint, build)
+
+    def overlay_base(figure, overlay, overlay_enabled):
+        # The index where the overlay traces of a full render start
+        trace_count = len(figure['data'])
+        return trace_count - visualizer.OVERLAY_TRACE_COUNTS[overlay] if overlay_enabled else trace_count
+
+    def overlay_patch(base, overlay, overlay_enabled, build_traces):
+        # Adds or removes the overlay traces of the figure already displayed, or returns None when its layout is unknown
+        if base is None:
+            return None
+        patch = Patch()
+        if overlay_enabled:
+            # Serialized by Plotly so arrays are sent in the same compact typed-array encoding as full figures
+            patch['data'].extend(json.loads(go.Figure(data=build_traces()).to_json())['data'])
+        else:
+            for index in reversed(range(base, base + visualizer.OVERLAY_TRACE_COUNTS[overlay])):
+                del patch['data'][index]
+        return patch
+
+    def on_snapshot(callback):
+        # Runs a callback on one data snapshot, so a reload in the background cannot change the data half way through
+        @functools.wraps(callback)
+        def wrapper(*args):
+            with visualizer.pinned_snapshot():
+                return callback(*args)
+        return wrapper
+
+    def timed(name, background=False):
+        # Records the callback's latency by phase and its response size when metrics are collected. Background
+        # callbacks run in a job process, which hands its timing back to the server through the metrics' job queue
+        return metrics.timed(name, background=background) if metrics is not None else (lambda callback: callback)
+
+    # With a background manager, tab 1 runs its regressions in a job process instead of holding a server thread. When
+    # its inputs change before the job finishes, Dash terminates the job and starts a new one
+    tab1_background = {} if background_manager is None else dict(
+        background=True, manager=background_manager, interval=500,
+        running=[(Output('graph-tab1-status', 'children'), 'Updating the regression...', ''),
+                 (Output('graph-tab1', 'style'), {'opacity': 0.5}, {'opacity': 1})])
 
-def register_callbacks(app, visualizer):
     @app.callback(
-        Output('graph-tab1', 'figure'),
+        Output('data-version', 'data'),
+        [Input('data-version-poll', 'n_intervals')],
+        [State('data-version', 'data')])
+    @timed('refresh_data_version')
+    def refresh_data_version(_, version):
+        # Publishes a new data version to the browser, which makes every graph render again from the new data. The
+        # version is the content fingerprint rather than the per-process reload counter, so server workers that
+        # reloaded at different times or a different number of times still agree on it
+        if visualizer.data_fingerprint == version:
+            raise PreventUpdate
+        return visualizer.data_fingerprint
+
+    def only_triggered_by(prop_id):
+        # True when the callback fired only because of this input, i.e. every filter is unchanged
+        return set(ctx.triggered_prop_ids) == {prop_id}
+
+    @app.callback(
+        [Output('graph-tab1', 'figure'),
+         Output('graph-tab1-rendered', 'data')],
         [Input('company-dropdown-tab1', 'value'),
         Input('checklist', 'value'),
         Input('view-toggle', 'value'),
         Input('date-picker-range1', 'start_date'),
-        Input('date-picker-range1', 'end_date')])
-    def update_graph_tab1(selected_companies, interval_values, view_mode, start_date, end_date):
+        Input('date-picker-range1', 'end_date'),
+        Input('data-version', 'data')],
+        [State('graph-tab1-rendered', 'data')],
+        **tab1_background)
+    @timed('update_graph_tab1', background=background_manager is not None)
+    @on_snapshot
+    def update_graph_tab1(selected_companies, interval_values, view_mode, start_date, end_date, _data_version, rendered):
         enable_interval = 'Interval' in interval_values
+        overlay = 'granular' if view_mode == 'Granular' else 'average'
+        # Where the overlay traces of the displayed figure start is kept in the browser rather than on the server, as
+        # a background job cannot pass it back to the server process
+        render_key = [overlay, visualizer.data_fingerprint, str(selected_companies), start_date, end_date]
 
-        if view_mode == 'Granular':
-            return visualizer.plot_granular_outage_vs_ppe(selected_companies=selected_companies, enable_interval=enable_interval, start_date=start_date, end_date=end_date, dashboard=True)
-        else:
-            return visualizer.plot_average_outage_vs_ppe(selected_companies=selected_companies, enable_interval=enable_interval, start_date=start_date, end_date=end_date, dashboard=True)
+        # Toggling the interval only adds or removes the overlay traces instead of resending every point
+        if only_triggered_by('checklist.value'):
+            base = rendered['base'] if rendered and rendered['key'] == render_key else None
+            if view_mode == 'Granular':
+                build_traces = lambda: visualizer.granular_interval_traces(selected_companies, start_date, end_date)
+            else:
+                build_traces = lambda: visualizer.average_interval_traces(selected_companies=selected_companies, start_date=start_date, end_date=end_date)
+            patch = overlay_patch(base, overlay, enable_interval, build_traces)
+            if patch is not None:
+                patch['layout']['title']['text'] = visualizer.scatter_title(enable_interval)
+                return patch, no_update
+
+        def build():
+            if view_mode == 'Granular':
+                return visualizer.plot_granular_outage_vs_ppe(selected_companies=selected_companies, enable_interval=enable_interval, start_date=start_date, end_date=end_date, dashboard=True)
+            else:
+                return visualizer.plot_average_outage_vs_ppe(selected_companies=selected_companies, enable_interval=enable_interval, start_date=start_date, end_date=end_date, dashboard=True)
+
+        figure = cached_figure('graph-tab1', [selected_companies, enable_interval, view_mode, start_date, end_date], build)
+        return figure, {'key': render_key, 'base': overlay_base(figure, overlay, enable_interval)}
+
+    def zoomed_x_range(relayout_data):
+        # The visible x range from a graph's relayoutData, None when zoomed out, or False when the x axis is unchanged
+        if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+            return [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+        if 'xaxis.range' in relayout_data:
+            return relayout_data['xaxis.range']
+        if relayout_data.get('xaxis.autorange'):
+            return None
+        return False
 
     @app.callback(
         Output('graph-tab2', 'figure'),
         [Input('company-dropdown-tab2', 'value'),
          Input('date-picker-range2', 'start_date'),
-         Input('date-picker-range2', 'end_date')])
-    def update_graph_tab2(selected_companies, start_date, end_date):
-        return visualizer.plot_outage_per_ppe_over_time(selected_companies=selected_companies, start_date=start_date, end_date=end_date, dashboard=True)
+         Input('date-picker-range2', 'end_date'),
+         Input('graph-tab2', 'relayoutData'),
+         Input('data-version', 'data')])
+    @timed('update_graph_tab2')
+    @on_snapshot
+    def update_graph_tab2(selected_companies, start_date, end_date, relayout_data, _data_version):
+        # Zooming re-runs the downsampling on the visible range; it only matters when a series is downsampled
+        if only_triggered_by('graph-tab2.relayoutData'):
+            x_range = zoomed_x_range(relayout_data or {})
+            if x_range is False or not visualizer.is_downsampled(selected_companies, start_date, end_date):
+                raise PreventUpdate
+            if x_range is not None:
+                return visualizer.plot_outage_per_ppe_over_time(selected_companies=selected_companies, start_date=start_date, end_date=end_date, x_range=x_range, dashboard=True)
+
+        return cached_figure('graph-tab2', [selected_companies, start_date, end_date],
+                             lambda: visualizer.plot_outage_per_ppe_over_time(selected_companies=selected_companies, start_date=start_date, end_date=end_date, dashboard=True))
 
     @app.callback(
-        Output('graph-tab3', 'figure'),
+        [Output('graph-tab3', 'figure'),
+         Output('graph-tab3-rendered', 'data')],
         [Input('company-dropdown-tab3', 'value'),
          Input('grand-total-checklist', 'value'),     
          Input('date-picker-range3', 'start_date'),
-         Input('date-picker-range3', 'end_date')])
-    def update_graph_tab3(selected_companies, gt_values, start_date, end_date):
+         Input('date-picker-range3', 'end_date'),
+         Input('data-version', 'data')],
+        [State('graph-tab3-rendered', 'data')])
+    @timed('update_graph_tab3')
+    @on_snapshot
+    def update_graph_tab3(selected_companies, gt_values, start_date, end_date, _data_version, rendered):
         include_grand_total = 'GT' in gt_values
-        return visualizer.plot_outage_per_ppe_boxplot(selected_companies=selected_companies, include_grand_total=include_grand_total, start_date=start_date, end_date=end_date, dashboard=True)
+        # Kept in the browser like tab 1's record, so it costs the server nothing and any worker process can patch
+        render_key = [visualizer.data_fingerprint, str(selected_companies), start_date, end_date]
+
+        # Toggling the grand total only adds or removes its box instead of resending every company's points
+        if only_triggered_by('grand-total-checklist.value'):
+            base, has_categories = (rendered['base'], rendered['has_categories']) if rendered and rendered['key'] == render_key else (None, False)
+            patch = overlay_patch(base, 'grand_total', include_grand_total,
+                                  lambda: visualizer.grand_total_traces(selected_companies, start_date, end_date, trace_offset=base))
+            if patch is not None and has_categories:
+                if include_grand_total:
+                    patch['layout']['xaxis']['categoryarray'].append(visualizer.GRAND_TOTAL_LABEL)
+                else:
+                    patch['layout']['xaxis']['categoryarray'].remove(visualizer.GRAND_TOTAL_LABEL)
+            if patch is not None:
+                return patch, no_update
+
+        figure = cached_figure('graph-tab3', [selected_companies, include_grand_total, start_date, end_date],
+                               lambda: visualizer.plot_outage_per_ppe_boxplot(selected_companies=selected_companies, include_grand_total=include_grand_total, start_date=start_date, end_date=end_date, dashboard=True))
+        has_categories = 'categoryarray' in figure['layout']['xaxis']
+        return figure, {'key': render_key, 'base': overlay_base(figure, 'grand_total', include_grand_total), 'has_categories': has_categories}
     
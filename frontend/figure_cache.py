@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+# Bump whenever the figures built by the visualizer change so stale entries on disk are ignored
+FIGURE_CACHE_VERSION = 2
+
+
+class FigureCache:
+    """
+    Caches serialized callback figures so repeated selections skip building them.
+
+    Figures are stored as Plotly JSON keyed by the callback ID, the callback's input values and the dataset version.
+    Recently used figures are kept in memory; when a cache directory is given they are also written to disk, so the
+    cache survives restarts of the dashboard.
+
+    Attributes:
+        max_entries (int): The number of figures kept in memory.
+        cache_dir (str): The directory of the on-disk tier, or None to keep figures in memory only.
+        max_disk_entries (int): The number of figures kept on disk.
+        hits (int): The number of figures served from the cache.
+        misses (int): The number of figures that had to be built.
+    """
+    def __init__(self, max_entries=64, cache_dir=None, max_disk_entries=512):
+        """
+        Initializes the FigureCache.
+
+        Parameters:
+            max_entries (int, optional): The number of figures kept in memory; defaults to 64.
+            cache_dir (str, optional): The directory of the on-disk tier; created when the first figure is stored.
+            max_disk_entries (int, optional): The number of figures kept on disk; defaults to 512.
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def make_key(self, callback_id, inputs, dataset_version):
+        """
+        Builds the key of a figure from the callback ID, its input values and the dataset version.
+
+        Returns:
+            str: The cache key.
+        """
+        payload = [FIGURE_CACHE_VERSION, callback_id, list(inputs), dataset_version]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get_or_build(self, callback_id, inputs, dataset_version, build):
+        """
+        Returns the figure for a callback and its inputs, building and caching it with `build()` on a miss.
+
+        Parameters:
+            callback_id (str): Identifies the callback, e.g. its output component ID.
+            inputs (list): The callback's input values.
+            dataset_version: Identifies the data the figure is built from.
+            build (callable): Builds the Plotly figure.
+
+        Returns:
+            dict: The figure as a Plotly JSON dictionary, which Dash accepts as a callback output.
+        """
+        key = self.make_key(callback_id, inputs, dataset_version)
+        figure_json = self.__load(key)
+        if figure_json is not None:
+            with self.__lock:
+                self.hits += 1
+            return json.loads(figure_json)
+
+        with self.__lock:
+            self.misses += 1
+        figure_json = build().to_json()
+        self.__store(key, figure_json)
+        return json.loads(figure_json)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: 'hits', 'misses' and 'entries' (the number of figures in memory).
+        """
+        with self.__lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.__entries)}
+
+    def __load(self, key):
+        """ Returns the figure JSON stored under the key in memory or on disk, or None on a miss. """
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                return self.__entries[key]
+        if self.cache_dir is None:
+            return None
+
+        path = self.__entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                figure_json = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Ignoring unreadable figure cache entry {path}: {e}")
+            return None
+        self.__remember(key, figure_json)
+        return figure_json
+
+    def __store(self, key, figure_json):
+        """ Stores figure JSON in memory and, when enabled, on disk. """
+        self.__remember(key, figure_json)
+        if self.cache_dir is None:
+            return
+        path = self.__entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(figure_json)
+            os.replace(temp_path, path)
+            self.__evict()
+        except OSError as e:
+            logging.warning(f"Could not write figure cache entry {path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def __remember(self, key, figure_json):
+        with self.__lock:
+            self.__entries[key] = figure_json
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def __entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def __evict(self):
+        """ Removes the least recently used figures on disk beyond max_disk_entries. """
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.json')]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_disk_entries:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
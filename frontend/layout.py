@@ -1,6 +1,8 @@
 from dash import html, dcc
 from .tabs.outage_per_ppe_tabs import boxplot_tab, line_chart_tab, regression_tab
-def create_layout(visualizer):
+def create_layout(visualizer, refresh_interval=None):
+    # The data version, the fingerprint of the loaded data, is polled every `refresh_interval` seconds; the graphs
+    # re-render when it changes
     layout = html.Div([
         dcc.Tabs(id="tabs", value='tab-1', children=[
             regression_tab(visualizer=visualizer),
@@ -9,7 +11,9 @@ def create_layout(visualizer):
         ]),
         html.Div(id='tabs-content'),
         dcc.Store(id='stored-filenames', data={'outage': 'outage_data.csv', 'ppe': 'ppe.csv'}),  # Adding dcc.Store here
-        dcc.Download(id="download")
+        dcc.Download(id="download"),
+        dcc.Store(id='data-version', data=visualizer.data_fingerprint),
+        dcc.Interval(id='data-version-poll', interval=(refresh_interval or 60) * 1000, disabled=refresh_interval is None)
     ], style={'background-color': '#eaeaea'})
     
     return layout
@@ -0,0 +1,250 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from flask import g, has_request_context
+from dash import ctx
+from visualization.vishelp.phase_timer import collect_phases
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the payload size histogram buckets, in bytes
+PAYLOAD_BUCKETS = (1000, 10000, 50000, 100000, 500000, 1000000, 5000000, 10000000)
+# The latency phases of a callback, in the order they happen
+PHASES = ('filter', 'fit', 'build', 'serialize', 'total')
+# Key prefix of the timings background jobs push to the job queue
+JOB_TIMING_PREFIX = 'callback-metrics'
+
+
+class CallbackMetrics:
+    """
+    Collects latency and payload size metrics of the dashboard callbacks and renders them in the Prometheus text format.
+
+    Each callback's latency is split into phases: 'filter' (selecting and aggregating the data), 'fit' (regressions and
+    intervals), 'build' (the rest of the callback, mostly building the figure) and 'serialize' (Dash encoding and sending
+    the response). 'total' covers the whole request. The phases of a callback are only known once its response is ready,
+    so they are recorded in a Flask `after_request` hook; see `init_app`.
+
+    Callbacks slower than `slow_threshold` can be logged with their inputs to a JSON-lines file, so slow filter
+    combinations can be reproduced. The metrics are kept per process, so with several server workers each worker
+    reports its own, and every series carries a 'pid' label telling the workers apart. Prometheus sums them with
+    `sum without (pid)`.
+
+    Background callbacks run in job processes, which have no request to time and whose memory is discarded when the job
+    ends. Their timings are pushed to `job_queue`, a store shared with the server processes such as the `diskcache.Cache`
+    of the background callback manager, and recorded by the worker that next renders the metrics.
+
+    The hit, miss and entry counts of the dashboard's caches are rendered too, once the caches are added with
+    `add_cache`, so cache sizes can be tuned from the hit rate.
+
+    Attributes:
+        slow_threshold (float): Seconds above which a callback is logged as slow, or None to log nothing.
+        slow_log_path (str): The JSON-lines file slow callbacks are appended to, or None.
+        job_queue (diskcache.Cache): The store background jobs push their timings to, or None.
+    """
+    def __init__(self, slow_threshold=None, slow_log_path=None, job_queue=None):
+        """
+        Parameters:
+            slow_threshold (float, optional): Seconds above which a callback is logged as slow; defaults to None.
+            slow_log_path (str, optional): The JSON-lines file for slow callbacks; defaults to None. Slow callbacks are
+                also logged as warnings.
+            job_queue (diskcache.Cache, optional): A queue shared with background job processes; defaults to None.
+                Required to time background callbacks.
+        """
+        self.slow_threshold = slow_threshold
+        self.slow_log_path = slow_log_path
+        self.job_queue = job_queue
+        self.__latencies = {}
+        self.__payloads = {}
+        self.__slow_counts = {}
+        self.__caches = {}
+        self.__lock = threading.Lock()
+
+    def init_app(self, server):
+        """
+        Installs the request hooks that time the serialization of callback responses and measure their size.
+
+        Parameters:
+            server (Flask): The Flask server of the Dash app.
+        """
+        server.before_request(self.__start_request)
+        server.after_request(self.__finish_request)
+
+    def add_cache(self, name, stats):
+        """
+        Adds a cache whose counters are rendered with the metrics.
+
+        Parameters:
+            name (str): The cache name used as the 'cache' label, e.g. 'figure'.
+            stats (callable): Returns the current counters as a dict with 'hits', 'misses' and 'entries', such as the
+                `stats` method of `FigureCache` or `FitCache`.
+        """
+        with self.__lock:
+            self.__caches[name] = stats
+
+    def timed(self, name, background=False):
+        """
+        Returns a decorator that times a callback and its phases.
+
+        Parameters:
+            name (str): The callback name used as the 'callback' label.
+            background (bool, optional): The callback runs as a background job. Its timing is pushed to `job_queue`
+                rather than recorded in the job process, and has no serialize phase or payload size; defaults to False.
+
+        Raises:
+            ValueError: If a background callback is timed without a job queue.
+        """
+        if background and self.job_queue is None:
+            raise ValueError("Timing background callbacks requires a job queue shared with the job processes.")
+
+        def decorator(callback):
+            @functools.wraps(callback)
+            def wrapper(*args):
+                start = time.perf_counter()
+                with collect_phases() as phases:
+                    try:
+                        return callback(*args)
+                    finally:
+                        timing = (name, time.perf_counter() - start, dict(phases), self.__callback_inputs(args))
+                        if background:
+                            self.job_queue.push(timing, prefix=JOB_TIMING_PREFIX)
+                        elif has_request_context():
+                            g.callback_timing = timing
+                        else:
+                            self.__record(*timing)
+            return wrapper
+        return decorator
+
+    def observe(self, callback, phase, seconds):
+        """ Records the latency of a phase of a callback. """
+        with self.__lock:
+            _observe(self.__latencies, (callback, phase), LATENCY_BUCKETS, seconds)
+
+    def observe_payload(self, callback, size):
+        """ Records the size in bytes of a callback response. """
+        with self.__lock:
+            _observe(self.__payloads, (callback,), PAYLOAD_BUCKETS, size)
+
+    def render(self):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, ready to be served at '/metrics'.
+        """
+        self.__record_job_timings()
+        process = {'pid': os.getpid()}
+        with self.__lock:
+            latencies = {key: (list(buckets), total, count) for key, (buckets, total, count) in self.__latencies.items()}
+            payloads = {key: (list(buckets), total, count) for key, (buckets, total, count) in self.__payloads.items()}
+            slow_counts = dict(self.__slow_counts)
+            caches = dict(self.__caches)
+
+        lines = ["# HELP dashboard_callback_duration_seconds Latency of dashboard callbacks by phase.",
+                 "# TYPE dashboard_callback_duration_seconds histogram"]
+        for (callback, phase), histogram in sorted(latencies.items(), key=lambda item: (item[0][0], PHASES.index(item[0][1]))):
+            lines += _histogram_lines('dashboard_callback_duration_seconds', {'callback': callback, 'phase': phase, **process}, LATENCY_BUCKETS, histogram)
+        lines += ["# HELP dashboard_callback_payload_bytes Size of dashboard callback responses.",
+                  "# TYPE dashboard_callback_payload_bytes histogram"]
+        for (callback,), histogram in sorted(payloads.items()):
+            lines += _histogram_lines('dashboard_callback_payload_bytes', {'callback': callback, **process}, PAYLOAD_BUCKETS, histogram)
+        lines += ["# HELP dashboard_callback_slow_total Dashboard callbacks slower than the slow callback threshold.",
+                  "# TYPE dashboard_callback_slow_total counter"]
+        for callback, count in sorted(slow_counts.items()):
+            lines.append(f"dashboard_callback_slow_total{_labels({'callback': callback, **process})} {count}")
+        if caches:
+            lines += self.__cache_lines(caches, process)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __cache_lines(caches, process):
+        """ Renders the hit, miss and entry counts of the added caches. """
+        stats = {name: caches[name]() for name in sorted(caches)}
+        lines = []
+        for field, metric, kind, description in (('hits', 'dashboard_cache_hits_total', 'counter', 'Lookups served from a dashboard cache.'),
+                                                 ('misses', 'dashboard_cache_misses_total', 'counter', 'Lookups a dashboard cache could not serve.'),
+                                                 ('entries', 'dashboard_cache_entries', 'gauge', 'Entries held in memory by a dashboard cache.')):
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}"]
+            lines += [f"{metric}{_labels({'cache': name, **process})} {counters[field]}" for name, counters in stats.items()]
+        return lines
+
+    def __record(self, callback, seconds, phases, inputs, serialize=None, total=None, payload=None):
+        """ Records the phases of a finished callback and logs it if it was slow. """
+        filter_time, fit_time = phases.get('filter', 0.0), phases.get('fit', 0.0)
+        measured = {'filter': filter_time, 'fit': fit_time, 'build': max(seconds - filter_time - fit_time, 0.0),
+                    'serialize': serialize, 'total': seconds if total is None else total}
+        for phase, value in measured.items():
+            if value is not None:
+                self.observe(callback, phase, value)
+        if payload is not None:
+            self.observe_payload(callback, payload)
+
+        if self.slow_threshold is not None and measured['total'] > self.slow_threshold:
+            with self.__lock:
+                self.__slow_counts[callback] = self.__slow_counts.get(callback, 0) + 1
+            self.__log_slow({'timestamp': time.time(), 'callback': callback, 'inputs': inputs, 'payload_bytes': payload,
+                             **{f"{phase}_s": value for phase, value in measured.items()}})
+
+    def __record_job_timings(self):
+        """ Records the timings background jobs have pushed to the job queue since the last call. """
+        if self.job_queue is None:
+            return
+        while True:
+            key, timing = self.job_queue.pull(prefix=JOB_TIMING_PREFIX)
+            if key is None:
+                return
+            self.__record(*timing)
+
+    def __log_slow(self, entry):
+        logging.warning(f"Slow callback {entry['callback']}: {entry['total_s']:.3f} s")
+        if self.slow_log_path is None:
+            return
+        try:
+            with self.__lock, open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write to the slow callback log {self.slow_log_path}: {e}")
+
+    @staticmethod
+    def __callback_inputs(args):
+        # The inputs by component property when called by Dash, so a logged callback can be reproduced
+        try:
+            return {prop_id: value for prop_id, value in ctx.inputs.items()}
+        except Exception:
+            return list(args)
+
+    def __start_request(self):
+        g.request_start = time.perf_counter()
+
+    def __finish_request(self, response):
+        timing = g.pop('callback_timing', None)
+        if timing is not None:
+            total = time.perf_counter() - g.request_start
+            name, seconds, phases, inputs = timing
+            payload = response.calculate_content_length() if response.status_code == 200 else None
+            self.__record(name, seconds, phases, inputs, serialize=max(total - seconds, 0.0), total=total, payload=payload)
+        return response
+
+
+def _observe(histograms, key, buckets, value):
+    counts, total, count = histograms.get(key, ([0] * len(buckets), 0.0, 0))
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            counts[i] += 1
+    histograms[key] = (counts, total + value, count + 1)
+
+
+def _labels(labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _histogram_lines(metric, labels, buckets, histogram):
+    counts, total, count = histogram
+    lines = [f"{metric}_bucket{_labels({**labels, 'le': bound})} {bucket_count}" for bound, bucket_count in zip(buckets, counts)]
+    lines.append(f"{metric}_bucket{_labels({**labels, 'le': '+Inf'})} {count}")
+    lines.append(f"{metric}_sum{_labels(labels)} {total}")
+    lines.append(f"{metric}_count{_labels(labels)} {count}")
+    return lines
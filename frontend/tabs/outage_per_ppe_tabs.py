@@ -8,7 +8,9 @@ def regression_tab(visualizer):
             __toggle_switch(id='view-toggle', label1='Aggregated', label2='Granular', default='Aggregated')
         ]),
         html.Div([__dropdown(visualizer=visualizer, number=1)]),
-        dcc.Graph(id='graph-tab1')
+        html.Div(id='graph-tab1-status'),
+        dcc.Graph(id='graph-tab1'),
+        dcc.Store(id='graph-tab1-rendered')
     ])
 
 def line_chart_tab(visualizer):
@@ -23,7 +25,8 @@ def boxplot_tab(visualizer):
                 html.Div([__datepicker(visualizer=visualizer, number=3)]),
                 html.Div([__dropdown(visualizer=visualizer, number=3)]),
                 html.Div([__singular_checkbox(id='grand-total-checklist',label='Grand Total', value='GT',default_options=['GT'])]),
-                dcc.Graph(id='graph-tab3')
+                dcc.Graph(id='graph-tab3'),
+                dcc.Store(id='graph-tab3-rendered')
             ])
 
 def __datepicker(visualizer, number):
@@ -0,0 +1,22 @@
+# gunicorn configuration for serving the dashboard in production: gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:server'
+bind = os.environ.get('DASHBOARD_BIND', '0.0.0.0:8050')
+
+# Load the data once in the master before forking, so the workers share it copy-on-write
+preload_app = True
+workers = int(os.environ.get('DASHBOARD_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('DASHBOARD_THREADS', 2))
+
+# Model fits can take a few seconds on large selections
+timeout = 120
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so each worker starts its own watcher when --watch is given. With '--watch inputs'
+    # the workers take turns on the build lock: the first prepares the data and the others reload the saved file
+    import wsgi
+    if wsgi.app.data_watcher is not None:
+        wsgi.app.data_watcher.start()
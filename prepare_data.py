@@ -1,21 +1,65 @@
 import argparse
 import os
-from data_prep import DataPreparer
+from data_prep import DataPreparer, BuildManifest, tracer, expand_input_files
 
 def parse_args():
     """Parse command line arguments for data preparation."""
     parser = argparse.ArgumentParser(description="Prepare data files for visualization.")
     parser.add_argument('--directory', type=str, default='datasets', help='Directory where all the data files are stored')
-    parser.add_argument('--outage_file', type=str, required=True, help='Filename of the outage data file')
+    parser.add_argument('--outage_file', type=str, required=True, help="Filename of the outage data file, or a directory or glob pattern such as 'nors/*.csv' to read many partial files")
     parser.add_argument('--ppe_file', type=str, required=True, help='Filename of the property, plant, and equipment data file')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes used to parse the outage data file')
+    parser.add_argument('--stage_workers', type=int, default=2, help='Number of preparation branches (outage and financial data) run at the same time; 1 runs them one after the other')
+    parser.add_argument('--streaming', action='store_true', help='Aggregate outage counts chunk by chunk to keep memory use flat on large outage files')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory for caching the filtered outage and financial data between runs; defaults to <directory>/.cache')
+    parser.add_argument('--no_cache', action='store_true', help='Always parse the raw data files instead of using the cache')
+    parser.add_argument('--incremental', action='store_true', help='Treat the outage file as append-only and parse only the rows added since the last run')
+    parser.add_argument('--force', action='store_true', help='Prepare the data even if prepared_data.csv is up to date with the input files')
+    parser.add_argument('--profile', action='store_true', help='Time each preparation stage and print a summary at the end')
+    parser.add_argument('--profile_log', type=str, default=None, help='Append a JSON line per preparation stage to this file; implies --profile')
+    parser.add_argument('--trace_memory', action='store_true', help='Also measure the peak memory of each stage with tracemalloc; slows preparation down and prepares the outage and financial data one after the other')
     return parser.parse_args()
 
-def prepare_data(directory, outage_file, ppe_file):
+def build_prepared_data(directory, outage_file, ppe_file, workers=1, streaming=False, cache_dir=None, incremental=False, force=False, dataprep=None, stage_workers=2):
+    """
+    Prepares the data and saves it to prepared_data.csv, unless its build manifest shows it is up to date.
+
+    The manifest next to prepared_data.csv records the fingerprints of the input files and the preparation
+    parameters, like a make target, so an unchanged build is skipped. The check and the build hold the manifest's lock,
+    so processes preparing the same directory at the same time, such as dashboard workers noticing the same input
+    change, prepare the data once: the others wait and then find it up to date.
+
+    Parameters:
+        force (bool): Prepare the data even if the manifest shows it is up to date.
+        dataprep (DataPreparer, optional): A preparer from an earlier build. Only its outage data is refreshed,
+            so pass it only when the PP&E file is unchanged.
+        stage_workers (int): The number of preparation branches run at the same time.
+
+    Returns:
+        DataPreparer: The preparer holding the freshly linked data, or None if the preparation was skipped.
+    """
+    normalize = True
+    manifest = BuildManifest(os.path.join(directory, 'prepared_data.csv'))
+    input_files = expand_input_files(os.path.join(directory, outage_file)) + [os.path.join(directory, ppe_file)]
+    params = DataPreparer.build_params(normalize=normalize)
+    with manifest.lock():
+        if not force and manifest.is_current(input_files, **params):
+            print(f"Prepared data in {directory} is up to date; skipping preparation.")
+            return None
+
+        if dataprep is None:
+            dataprep = DataPreparer(folder=directory, outage_file_name=outage_file, financial_file_name=ppe_file,normalize=normalize, workers=workers, streaming=streaming, cache_dir=cache_dir, incremental=incremental, stage_workers=stage_workers)
+        else:
+            dataprep.refresh()
+        dataprep.save_to_csv(folder=directory)
+        manifest.record(input_files, **params)
+    return dataprep
+
+def prepare_data(directory, outage_file, ppe_file, workers=1, streaming=False, cache_dir=None, incremental=False, force=False, stage_workers=2):
     """Prepare the data using the DataPreparer module and save it to CSV."""
     try:
-        dataprep = DataPreparer(folder=directory, outage_file_name=outage_file, financial_file_name=ppe_file,normalize=True)
-        dataprep.save_to_csv(folder=directory)
-        print(f"Data has been prepared and saved in {directory}.")
+        if build_prepared_data(directory, outage_file, ppe_file, workers=workers, streaming=streaming, cache_dir=cache_dir, incremental=incremental, force=force, stage_workers=stage_workers) is not None:
+            print(f"Data has been prepared and saved in {directory}.")
     except FileNotFoundError as e:
         print(f"Error: {e}")
         print("Failed to find one or more specified files. Please check the file paths and names.")
@@ -24,7 +68,14 @@ def prepare_data(directory, outage_file, ppe_file):
 
 def main():
     args = parse_args()
-    prepare_data(args.directory, args.outage_file, args.ppe_file)
+    cache_dir = None if args.no_cache else args.cache_dir or os.path.join(args.directory, '.cache')
+    profile = args.profile or args.profile_log is not None or args.trace_memory
+    if profile:
+        tracer.enable(sink_path=args.profile_log, trace_memory=args.trace_memory)
+    prepare_data(args.directory, args.outage_file, args.ppe_file, workers=args.workers, streaming=args.streaming, cache_dir=cache_dir, incremental=args.incremental, force=args.force, stage_workers=args.stage_workers)
+    if profile:
+        tracer.disable()
+        print(tracer.format_summary())
 
 if __name__ == '__main__':
     main()
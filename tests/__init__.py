@@ -1,3 +1,3 @@
-from .testutil import find_project_root, change_to_root
+from .testutil import find_project_root, change_to_root, make_linked_data, make_outage_data
 
-__all__ = ['find_project_root', 'change_to_root']
\ No newline at end of file
+__all__ = ['find_project_root', 'change_to_root', 'make_linked_data', 'make_outage_data']
\ No newline at end of file
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from data_prep import AliasResolver
+
+ALIASES = {
+    'AT&T Mobility (NYSE: T)': 'AT&T',
+    'AT&T Corp.': 'AT&T',
+    'Verizon Wireless': 'Verizon',
+    'T-Mobile USA, Inc.': 'T-Mobile',
+}
+
+
+def test_names_are_normalized_before_lookup():
+    assert AliasResolver.normalize('  at&t   Mobility (NYSE: T) ') == 'AT&T MOBILITY'
+    assert AliasResolver.normalize('Verizon\tWireless (VZ) (old)') == 'VERIZON WIRELESS'
+
+    resolver = AliasResolver(ALIASES)
+    assert resolver.resolve_name('at&t mobility') == 'AT&T'
+    assert resolver.resolve_name('VERIZON  wireless (VZ)') == 'Verizon'
+    assert resolver.resolve_name('Verizon') is None
+    assert AliasResolver(ALIASES, include_canonical=True).resolve_name('verizon') == 'Verizon'
+
+
+def test_a_column_resolves_to_a_categorical_with_missing_values_as_code_minus_one():
+    values = pd.Series(['Verizon Wireless', None, 'Unknown Carrier', np.nan, 'at&t corp.'], index=[5, 6, 7, 8, 9], name='u_company')
+    resolved = AliasResolver(ALIASES).resolve(values)
+
+    assert list(resolved.cat.categories) == ['AT&T', 'T-Mobile', 'Verizon']
+    assert resolved.cat.codes.tolist() == [2, -1, -1, -1, 0]
+    assert resolved.index.equals(values.index) and resolved.name == 'u_company'
+
+
+def test_codes_are_the_same_across_resolvers_and_chunks():
+    first = AliasResolver(ALIASES).resolve(pd.Series(['T-Mobile USA, Inc.', 'Verizon Wireless']))
+    second = AliasResolver(dict(reversed(list(ALIASES.items())))).resolve(pd.Series(['Verizon Wireless', 'AT&T Corp.']))
+    assert first.cat.categories.equals(second.cat.categories)
+    assert pd.concat([first, second]).dtype == 'category'
+
+
+def test_each_distinct_raw_name_is_resolved_once():
+    resolver = AliasResolver(ALIASES, fuzzy_cutoff=0.8)
+    normalized = []
+    normalize = AliasResolver.normalize
+    resolver.normalize = lambda name: normalized.append(name) or normalize(name)
+
+    resolver.resolve(pd.Series(['Verizon Wireless', 'AT&T Corp.'] * 1000 + ['Unknown']))
+    resolver.resolve(pd.Series(['AT&T Corp.', 'Unknown', 'Verizon Wireless']))
+    assert resolver.resolve_name('Unknown') is None
+    assert sorted(normalized) == ['AT&T Corp.', 'Unknown', 'Verizon Wireless']
+
+
+def test_fuzzy_matching_resolves_near_misses_above_the_cutoff():
+    exact = AliasResolver(ALIASES)
+    fuzzy = AliasResolver(ALIASES, fuzzy_cutoff=0.85)
+    assert exact.resolve_name('Verizon Wirless') is None
+    assert fuzzy.resolve_name('Verizon Wirless') == 'Verizon'
+    assert fuzzy.resolve_name('T-Mobile USA Inc') == 'T-Mobile'
+    assert fuzzy.resolve_name('Sprint') is None
+    # A name that normalizes to nothing is never matched
+    assert fuzzy.resolve_name('(NYSE: T)') is None
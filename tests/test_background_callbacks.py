@@ -0,0 +1,86 @@
+import json
+import time
+import pytest
+from dash import Dash
+from dashboard import create_background_manager
+from frontend import create_layout, register_callbacks, CallbackMetrics
+from visualization import PlotlyVisualizer
+from tests.testutil import make_linked_data, apply_patch, is_patch, parse_metrics, metrics_sample
+
+COMPANIES = ['AT&T', 'Comcast', 'Lumen']
+TAB1_OUTPUT = '..graph-tab1.figure...graph-tab1-rendered.data..'
+
+
+@pytest.fixture(scope='module')
+def visualizer():
+    return PlotlyVisualizer(data=make_linked_data(5000, seed=4))
+
+
+@pytest.fixture
+def app(visualizer, tmp_path):
+    manager = create_background_manager(str(tmp_path / 'jobs'))
+    app = Dash(__name__)
+    app.layout = lambda: create_layout(visualizer)
+    app.metrics = CallbackMetrics(job_queue=manager.handle)
+    register_callbacks(app, visualizer, metrics=app.metrics, background_manager=manager)
+    return app
+
+
+def update_tab1(client, interval, rendered, changed, timeout=60):
+    """
+    Posts a tab 1 update like the browser does, polls its background job until it finishes, and returns the figure or
+    patch and the new rendered record.
+    """
+    body = {
+        'output': TAB1_OUTPUT,
+        'outputs': [{'id': 'graph-tab1', 'property': 'figure'}, {'id': 'graph-tab1-rendered', 'property': 'data'}],
+        'inputs': [{'id': 'company-dropdown-tab1', 'property': 'value', 'value': COMPANIES},
+                   {'id': 'checklist', 'property': 'value', 'value': ['Interval'] if interval else []},
+                   {'id': 'view-toggle', 'property': 'value', 'value': 'Aggregated'},
+                   {'id': 'date-picker-range1', 'property': 'start_date', 'value': '2016-01-01'},
+                   {'id': 'date-picker-range1', 'property': 'end_date', 'value': '2022-12-31'},
+                   {'id': 'data-version', 'property': 'data', 'value': 1}],
+        'changedPropIds': changed,
+        'state': [{'id': 'graph-tab1-rendered', 'property': 'data', 'value': rendered}],
+    }
+    response = client.post('/_dash-update-component', json=body)
+    assert response.status_code == 200, response.data[:500]
+    # The request only starts the job and returns its handles, which the browser polls with
+    job = response.get_json()
+    assert set(job) >= {'cacheKey', 'job'}
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.post('/_dash-update-component', json=body, query_string={'cacheKey': job['cacheKey'], 'job': job['job']})
+        assert response.status_code in (200, 204), response.data[:500]
+        if response.status_code == 200 and 'response' in (payload := response.get_json()) and payload['response']:
+            outputs = payload['response']
+            return outputs['graph-tab1']['figure'], outputs.get('graph-tab1-rendered', {}).get('data', rendered)
+        time.sleep(0.1)
+    raise AssertionError("The background job did not finish in time")
+
+
+def test_tab1_dims_the_graph_and_shows_a_status_while_the_job_runs(app):
+    callbacks = app.server.test_client().get('/_dash-dependencies').get_json()
+    tab1 = next(callback for callback in callbacks if callback['output'] == TAB1_OUTPUT)
+    assert tab1['background']
+    assert tab1['running'] == {'running': {'graph-tab1-status.children': 'Updating the regression...', 'graph-tab1.style': {'opacity': 0.5}},
+                               'runningOff': {'graph-tab1-status.children': '', 'graph-tab1.style': {'opacity': 1}}}
+
+
+def test_tab1_jobs_render_the_figure_and_patch_the_interval_toggle(app):
+    client = app.server.test_client()
+    without_interval, rendered = update_tab1(client, False, None, [])
+    assert not is_patch(without_interval)
+    assert rendered['base'] == len(without_interval['data'])
+
+    with_interval, _ = update_tab1(client, True, None, [])
+    # The record of the displayed figure travels through the browser, so the job can patch the figure
+    patch, patched_rendered = update_tab1(client, True, rendered, ['checklist.value'])
+    assert is_patch(patch)
+    assert patched_rendered == rendered
+    assert apply_patch(without_interval, patch)['data'] == with_interval['data']
+
+    # Each job reported its timing back to the server process
+    samples = parse_metrics(app.metrics.render())
+    assert metrics_sample(samples, 'dashboard_callback_duration_seconds_count', callback='update_graph_tab1', phase='total') == 3
@@ -0,0 +1,47 @@
+import os
+import pytest
+from data_prep import BuildManifest
+
+START_YEAR, END_YEAR = 2017, 2022
+
+
+@pytest.fixture
+def build(tmp_path):
+    """ Returns the inputs, output and manifest of a recorded build. """
+    inputs = [tmp_path / 'outages.csv', tmp_path / 'ppe.xlsx']
+    for path in inputs:
+        path.write_text(path.name)
+    output = tmp_path / 'prepared_data.csv'
+    output.write_text('Company,Year,Quarter,Count,PP&E\n')
+    manifest = BuildManifest(str(output))
+    manifest.record([str(path) for path in inputs], start_year=START_YEAR, end_year=END_YEAR)
+    return inputs, output, manifest
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_build_manifest_is_current_for_an_unchanged_build(build):
+    inputs, _, manifest = build
+    assert manifest.is_current([str(path) for path in inputs], start_year=START_YEAR, end_year=END_YEAR)
+
+
+def test_build_manifest_detects_a_changed_input(build):
+    inputs, _, manifest = build
+    touch(inputs[1])
+    assert not manifest.is_current([str(path) for path in inputs], start_year=START_YEAR, end_year=END_YEAR)
+
+
+def test_build_manifest_detects_changed_parameters(build):
+    inputs, _, manifest = build
+    assert not manifest.is_current([str(path) for path in inputs], start_year=START_YEAR, end_year=END_YEAR + 1)
+
+
+def test_build_manifest_detects_a_changed_or_missing_output(build):
+    inputs, output, manifest = build
+    output.write_text('edited by hand\n')
+    assert not manifest.is_current([str(path) for path in inputs], start_year=START_YEAR, end_year=END_YEAR)
+    output.unlink()
+    assert not manifest.is_current([str(path) for path in inputs], start_year=START_YEAR, end_year=END_YEAR)
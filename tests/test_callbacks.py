@@ -0,0 +1,70 @@
+import json
+import pytest
+from dash import Dash
+from frontend import create_layout, register_callbacks
+from visualization import PlotlyVisualizer
+from tests.testutil import make_linked_data, apply_patch, is_patch
+
+COMPANIES = ['AT&T', 'Comcast', 'Lumen']
+
+
+@pytest.fixture(scope='module')
+def visualizer():
+    return PlotlyVisualizer(data=make_linked_data(5000, seed=4))
+
+
+def make_client(visualizer):
+    """ Returns a test client of a separately registered app, standing in for one server worker process. """
+    app = Dash(__name__)
+    app.layout = lambda: create_layout(visualizer)
+    register_callbacks(app, visualizer)
+    return app.server.test_client()
+
+
+def update_tab3(client, grand_total, rendered, changed, companies=COMPANIES):
+    """ Posts a tab 3 update like the browser does and returns the figure or patch and the new rendered record. """
+    body = {
+        'output': '..graph-tab3.figure...graph-tab3-rendered.data..',
+        'outputs': [{'id': 'graph-tab3', 'property': 'figure'}, {'id': 'graph-tab3-rendered', 'property': 'data'}],
+        'inputs': [{'id': 'company-dropdown-tab3', 'property': 'value', 'value': companies},
+                   {'id': 'grand-total-checklist', 'property': 'value', 'value': ['GT'] if grand_total else []},
+                   {'id': 'date-picker-range3', 'property': 'start_date', 'value': '2016-01-01'},
+                   {'id': 'date-picker-range3', 'property': 'end_date', 'value': '2022-12-31'},
+                   {'id': 'data-version', 'property': 'data', 'value': 1}],
+        'changedPropIds': changed,
+        'state': [{'id': 'graph-tab3-rendered', 'property': 'data', 'value': rendered}],
+    }
+    response = client.post('/_dash-update-component', json=body)
+    assert response.status_code == 200, response.data[:500]
+    outputs = json.loads(response.data)['response']
+    return outputs['graph-tab3']['figure'], outputs.get('graph-tab3-rendered', {}).get('data', rendered)
+
+
+def test_grand_total_toggle_patches_a_figure_rendered_by_another_worker(visualizer):
+    worker_a, worker_b = make_client(visualizer), make_client(visualizer)
+    with_total, rendered = update_tab3(worker_a, True, None, [])
+    without_total, _ = update_tab3(worker_a, False, None, [])
+
+    patch, patched_rendered = update_tab3(worker_b, False, rendered, ['grand-total-checklist.value'])
+    assert is_patch(patch)
+    assert patched_rendered == rendered
+    assert apply_patch(with_total, patch) == without_total
+
+    _, rendered = update_tab3(worker_a, False, None, [])
+    patch, _ = update_tab3(worker_b, True, rendered, ['grand-total-checklist.value'])
+    assert is_patch(patch)
+    assert apply_patch(without_total, patch) == with_total
+
+
+def test_grand_total_toggle_renders_in_full_without_a_matching_record(visualizer):
+    client = make_client(visualizer)
+    _, rendered = update_tab3(client, True, None, [])
+    expected, _ = update_tab3(client, False, None, [])
+
+    figure, _ = update_tab3(client, False, None, ['grand-total-checklist.value'])
+    assert not is_patch(figure) and figure == expected
+
+    # A record of other companies, e.g. from before the dropdown changed, does not describe the displayed figure
+    other, _ = update_tab3(client, False, dict(rendered, key=rendered['key'][:1] + ["['AT&T']"] + rendered['key'][2:]),
+                           ['grand-total-checklist.value'])
+    assert not is_patch(other) and other == expected
@@ -0,0 +1,44 @@
+import pytest
+from dashboard import create_app, parse_args
+from benchmarks.synthetic_data import write_ppe_workbook
+from tests.testutil import make_outage_data, parse_metrics, metrics_sample
+
+
+@pytest.fixture
+def directory(tmp_path):
+    make_outage_data(3000, seed=1, start_year=2020, end_year=2023).to_csv(tmp_path / 'outages.csv', index=False)
+    write_ppe_workbook(str(tmp_path / 'ppe.xlsx'), 10)
+    return tmp_path
+
+
+def start(directory):
+    args = parse_args(['--directory', str(directory), '--outage_file', 'outages.csv', '--ppe_file', 'ppe.xlsx',
+                       '--stage_workers', '1', '--watch', 'inputs', '--watch_interval', '0.01'])
+    return create_app(args)
+
+
+def test_health_reports_the_worker_data_version_and_the_shared_fingerprint(directory):
+    app = start(directory)
+    client = app.server.test_client()
+    before = client.get('/health').get_json()
+    assert before['status'] == 'ok' and before['rows'] > 0
+    assert before['data_version'] == 1
+    assert len(before['data_fingerprint']) == 64
+    assert set(before['fit_cache']) >= {'hits', 'misses', 'entries'}
+
+    make_outage_data(500, seed=2, start_year=2020, end_year=2023).to_csv(directory / 'outages.csv', mode='a', header=False, index=False)
+    assert app.data_watcher.poll() == [str(directory / 'outages.csv')]
+    after = client.get('/health').get_json()
+    assert after['data_version'] == 2
+    assert after['data_fingerprint'] != before['data_fingerprint']
+
+    # A worker started on the same data has loaded it once, but has the same fingerprint
+    other = start(directory).server.test_client().get('/health').get_json()
+    assert other['data_version'] == 1
+    assert other['data_fingerprint'] == after['data_fingerprint']
+
+
+def test_metrics_report_the_figure_and_fit_caches(directory):
+    samples = parse_metrics(start(directory).server.test_client().get('/metrics').get_data(as_text=True))
+    for cache in ('figure', 'fit'):
+        assert metrics_sample(samples, 'dashboard_cache_misses_total', cache=cache) == 0
@@ -0,0 +1,129 @@
+import threading
+import pytest
+from dash import Dash
+from data_prep import FileWatcher
+from frontend import create_layout, register_callbacks
+from visualization import PlotlyVisualizer
+from tests.testutil import make_linked_data
+
+
+def make_client(visualizer):
+    """ Returns a test client of a separately registered app, standing in for one server worker process. """
+    app = Dash(__name__)
+    app.layout = lambda: create_layout(visualizer, refresh_interval=5)
+    register_callbacks(app, visualizer)
+    return app.server.test_client()
+
+
+def poll_data_version(client, version):
+    """ Posts a data version poll like the browser does and returns the published version, or None if unchanged. """
+    body = {
+        'output': 'data-version.data',
+        'outputs': {'id': 'data-version', 'property': 'data'},
+        'inputs': [{'id': 'data-version-poll', 'property': 'n_intervals', 'value': 1}],
+        'changedPropIds': ['data-version-poll.n_intervals'],
+        'state': [{'id': 'data-version', 'property': 'data', 'value': version}],
+    }
+    response = client.post('/_dash-update-component', json=body)
+    if response.status_code == 204:
+        return None
+    assert response.status_code == 200, response.data[:500]
+    return response.get_json()['response']['data-version']['data']
+
+
+def test_workers_that_reloaded_differently_publish_the_same_version():
+    data = make_linked_data(2000, seed=1)
+    worker_a = PlotlyVisualizer(data=data)
+    worker_b = PlotlyVisualizer(data=make_linked_data(2000, seed=2))
+    worker_b.update_data(data)
+    assert worker_a.data_version != worker_b.data_version
+
+    client_a, client_b = make_client(worker_a), make_client(worker_b)
+    version = worker_a.data_fingerprint
+    for client in (client_a, client_b, client_a, client_b):
+        assert poll_data_version(client, version) is None
+
+    worker_a.update_data(make_linked_data(2000, seed=3))
+    new_version = poll_data_version(client_a, version)
+    assert new_version == worker_a.data_fingerprint
+    # A worker that has not reloaded yet publishes its own data again, and stops once it catches up
+    assert poll_data_version(client_b, new_version) == version
+    worker_b.update_data(make_linked_data(2000, seed=3))
+    assert poll_data_version(client_b, new_version) is None
+
+
+def test_data_in_memory_and_read_back_from_the_csv_file_have_the_same_fingerprint(tmp_path):
+    # The worker that prepared the data gets it in memory, while the others read prepared_data.csv
+    data = make_linked_data(2000, seed=1)
+    data = data.sample(frac=1, random_state=0).reset_index(drop=True).iloc[::-1]
+    data.to_csv(tmp_path / 'prepared_data.csv', index=False)
+    in_memory = PlotlyVisualizer(data=data)
+    from_file = PlotlyVisualizer(directory=str(tmp_path))
+    assert in_memory.data_fingerprint == from_file.data_fingerprint
+
+
+def test_a_pinned_callback_keeps_its_snapshot_while_a_reload_swaps_in_another():
+    old_data, new_data = make_linked_data(2000, seed=1), make_linked_data(2000, seed=2)
+    visualizer = PlotlyVisualizer(data=old_data)
+    expected_old = visualizer.plot_outage_per_ppe_boxplot(dashboard=True).to_json()
+    old_fingerprint = visualizer.data_fingerprint
+    pinned, swapped = threading.Event(), threading.Event()
+    seen = {}
+
+    def callback():
+        with visualizer.pinned_snapshot():
+            pinned.set()
+            swapped.wait()
+            seen['fingerprint'] = visualizer.data_fingerprint
+            seen['figure'] = visualizer.plot_outage_per_ppe_boxplot(dashboard=True).to_json()
+
+    thread = threading.Thread(target=callback)
+    thread.start()
+    pinned.wait()
+    assert visualizer.update_data(new_data)
+    swapped.set()
+    thread.join()
+
+    assert seen['fingerprint'] == old_fingerprint
+    assert seen['figure'] == expected_old
+    assert visualizer.data_fingerprint != old_fingerprint
+    assert visualizer.plot_outage_per_ppe_boxplot(dashboard=True).to_json() != expected_old
+
+
+@pytest.fixture
+def watched(tmp_path):
+    path = tmp_path / 'prepared_data.csv'
+    path.write_text('v1\n')
+    changes = []
+    return str(path), changes, FileWatcher([str(path)], changes.append, interval=0.2)
+
+
+def test_watcher_waits_for_a_file_to_stop_changing(watched):
+    path, changes, watcher = watched
+    with open(path, 'a') as f:
+        f.write('partial')
+    # The writer is still busy during the stability wait, so the change is not reported yet
+    writer = threading.Timer(0.1, lambda: open(path, 'a').write(' rows\n'))
+    writer.start()
+    assert watcher.poll() == []
+    writer.join()
+    assert changes == []
+
+    assert watcher.poll() == [path]
+    assert changes == [[path]]
+    assert watcher.poll() == []
+
+
+def test_watcher_ignores_changes_made_by_its_handler(tmp_path):
+    path = tmp_path / 'prepared_data.csv'
+    changes = []
+
+    def rebuild(changed):
+        changes.append(changed)
+        path.write_text('rebuilt\n')
+
+    watcher = FileWatcher([str(path)], rebuild, interval=0.05)
+    path.write_text('created\n')
+    assert watcher.poll() == [str(path)]
+    assert watcher.poll() == []
+    assert changes == [[str(path)]]
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from visualization.vishelp.vis_preprocess import VisualizationPreprocessor
+from tests.testutil import make_linked_data
+
+QUERIES = [
+    (None, None, None),
+    (['AT&T', 'Lumen'], None, None),
+    (['Comcast'], '2017-01-01', '2020-12-31'),
+    (['Lumen', 'AT&T', 'Charter'], '2018-04-01', None),
+    (None, None, '2016-06-30'),
+    (['Comcast'], '2030-01-01', None),
+    (['Not A Company'], None, None),
+]
+
+
+@pytest.fixture(scope='module')
+def indexed():
+    df = make_linked_data(20000, seed=1)
+    preprocessor = VisualizationPreprocessor(df)
+    df = preprocessor.preprocess_data(df)
+    # Missing measures must be skipped by the prefix sums like they are by a groupby mean
+    df.loc[df.sample(frac=0.01, random_state=1).index, 'Outage per PP&E'] = np.nan
+    return preprocessor, df, preprocessor.build_index(df)
+
+
+@pytest.mark.parametrize('companies, start_date, end_date', QUERIES)
+def test_index_slice_matches_a_scan(indexed, companies, start_date, end_date):
+    preprocessor, df, indexed_df = indexed
+    expected = preprocessor.filter_dataframe(df, companies, start_date, end_date)
+    result = preprocessor.filter_dataframe(indexed_df, companies, start_date, end_date)
+    pd.testing.assert_frame_equal(result.sort_index(), expected.sort_index())
+
+
+@pytest.mark.parametrize('companies, start_date, end_date', QUERIES)
+def test_index_aggregate_matches_a_groupby(indexed, companies, start_date, end_date):
+    preprocessor, df, indexed_df = indexed
+    expected = preprocessor.aggregate_between(df, companies, start_date, end_date)
+    result = preprocessor.aggregate_between(indexed_df, companies, start_date, end_date)
+    # Prefix sums and a groupby mean add up the values in a different order
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False, rtol=1e-9)
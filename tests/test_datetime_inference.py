@@ -0,0 +1,53 @@
+import pandas as pd
+from data_prep import datetime_inference
+from data_prep.datetime_inference import infer_datetime_formats, parse_datetimes, get_datetime_formats
+
+
+def test_infers_only_the_formats_that_occur_in_order_of_preference():
+    sample = pd.Series(['03/15/2021', '2021-03-15 10:30:00', None, '15-03-2021 10:30', '2021-03-16 08:00:00'])
+    assert infer_datetime_formats(sample) == ["%Y-%m-%d %H:%M:%S", "%d-%m-%Y %H:%M", "%m/%d/%Y"]
+    assert infer_datetime_formats(pd.Series(['2021-03-15', None])) == ["%Y-%m-%d"]
+    assert infer_datetime_formats(pd.Series([None, 'not a date'])) == []
+
+
+def test_parses_each_inferred_format():
+    column = pd.Series(['2021-03-15 10:30:00', '15-03-2021 10:30', None])
+    expected = pd.Series([pd.Timestamp('2021-03-15 10:30')] * 2 + [pd.NaT], dtype='datetime64[ns]')
+    pd.testing.assert_series_equal(parse_datetimes(column, ["%Y-%m-%d %H:%M:%S", "%d-%m-%Y %H:%M"]), expected)
+
+
+def test_values_missed_by_the_sample_fall_back_to_other_formats_and_then_one_by_one():
+    # The sample only showed the first format; a chunk also holds other candidate formats and free-form values
+    column = pd.Series(['2021-03-15 10:30:00', '03/16/2021', '2021-03-17', 'March 18, 2021 7:45 PM', 'garbage', None],
+                       index=[10, 11, 12, 13, 14, 15])
+    result = parse_datetimes(column, ["%Y-%m-%d %H:%M:%S"])
+    expected = pd.Series([pd.Timestamp('2021-03-15 10:30'), pd.Timestamp('2021-03-16'), pd.Timestamp('2021-03-17'),
+                          pd.Timestamp('2021-03-18 19:45'), pd.NaT, pd.NaT], index=column.index, dtype='datetime64[ns]')
+    pd.testing.assert_series_equal(result, expected)
+
+
+def test_formats_are_inferred_once_per_version_of_a_file(tmp_path):
+    path = tmp_path / 'outages.csv'
+    path.write_text('2021-03-15\n')
+    samples = []
+
+    def load_sample(values):
+        samples.append(values)
+        return pd.Series(values)
+
+    assert get_datetime_formats(str(path), lambda: load_sample(['2021-03-15'])) == ["%Y-%m-%d"]
+    assert get_datetime_formats(str(path), lambda: load_sample(['unused'])) == ["%Y-%m-%d"]
+    assert len(samples) == 1
+
+    path.write_text('03/15/2021 and more\n')
+    assert get_datetime_formats(str(path), lambda: load_sample(['03/15/2021'])) == ["%m/%d/%Y"]
+    assert len(samples) == 2
+
+
+def test_the_format_memo_is_bounded(tmp_path):
+    memo = datetime_inference._inferred_formats
+    for i in range(memo.max_files + 10):
+        path = tmp_path / f'part-{i}.csv'
+        path.write_text(str(i))
+        get_datetime_formats(str(path), lambda: pd.Series(['2021-03-15']))
+    assert len(memo) == memo.max_files
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+from visualization.plotly_visualizer import PlotlyVisualizer
+from visualization.vishelp.downsample import lttb_indices, downsample_series
+from tests.testutil import make_linked_data
+
+
+@pytest.fixture(scope='module')
+def data():
+    return make_linked_data(5000, seed=4)
+
+
+def test_lttb_keeps_the_endpoints_and_exactly_max_points():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000)
+    y = rng.normal(size=1000)
+    kept = lttb_indices(x, y, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_keeps_peaks():
+    y = np.zeros(1000)
+    y[[137, 612]] = [10, -10]
+    kept = lttb_indices(np.arange(1000), y, 20)
+    assert {137, 612} <= set(kept)
+
+
+@pytest.mark.parametrize('max_points', [100, 101, 2])
+def test_lttb_passes_short_series_through(max_points):
+    assert lttb_indices(np.arange(100), np.arange(100), max_points).tolist() == list(range(100))
+
+
+def test_each_series_is_downsampled_on_its_own():
+    df = pd.DataFrame({
+        'Company': ['A'] * 300 + ['B'] * 20,
+        'Date': list(pd.date_range('2015-01-01', periods=300)) + list(pd.date_range('2015-01-01', periods=20)),
+        'Value': np.arange(320, dtype=float),
+    })
+    result = downsample_series(df, 'Date', 'Value', 'Company', 50)
+    assert result.groupby('Company').size().to_dict() == {'A': 50, 'B': 20}
+    assert result.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(result[result['Company'] == 'B'], df[df['Company'] == 'B'])
+
+
+def test_an_x_range_keeps_one_point_beyond_each_edge():
+    df = pd.DataFrame({'Company': 'A', 'Date': pd.date_range('2015-01-01', periods=300), 'Value': np.arange(300, dtype=float)})
+    result = downsample_series(df, 'Date', 'Value', 'Company', 1000, x_range=['2015-02-01 12:00', '2015-03-01'])
+    assert result['Date'].min() == pd.Timestamp('2015-02-01')
+    assert result['Date'].max() == pd.Timestamp('2015-03-02')
+    assert len(result) == 30
+
+
+def company_traces(fig, companies):
+    return [trace for trace in fig.data if trace.name in companies]
+
+
+def test_long_series_are_downsampled_to_max_points(data):
+    visualizer = PlotlyVisualizer(data=data, max_points_per_series=100)
+    sizes = visualizer.df.groupby('Company', observed=True).size()
+    fig = visualizer.plot_outage_per_ppe_over_time(dashboard=True)
+    lines = company_traces(fig, set(sizes.index))
+    assert len(lines) == len(sizes)
+    assert all(len(trace.x) == 100 for trace in lines)
+
+    # The first and last dates of each company survive
+    for trace in lines:
+        dates = visualizer.df.loc[visualizer.df['Company'] == trace.name, 'Date']
+        assert pd.Timestamp(trace.x[0]) == dates.min() and pd.Timestamp(trace.x[-1]) == dates.max()
+
+
+def test_series_below_max_points_are_drawn_in_full(data):
+    visualizer = PlotlyVisualizer(data=data, max_points_per_series=10000)
+    sizes = visualizer.df.groupby('Company', observed=True).size()
+    fig = visualizer.plot_outage_per_ppe_over_time(dashboard=True)
+    assert {trace.name: len(trace.x) for trace in company_traces(fig, set(sizes.index))} == sizes.to_dict()
+    assert not visualizer.is_downsampled()
+
+
+def test_zooming_in_downsamples_only_the_visible_range(data):
+    visualizer = PlotlyVisualizer(data=data, max_points_per_series=100)
+    x_range = ['2018-01-01', '2019-12-31']
+    full = visualizer.plot_outage_per_ppe_over_time(dashboard=True)
+    zoomed = visualizer.plot_outage_per_ppe_over_time(dashboard=True, x_range=x_range)
+
+    assert list(zoomed.layout.xaxis.range) == x_range
+    for before, after in zip(company_traces(full, visualizer.df['Company'].unique()), company_traces(zoomed, visualizer.df['Company'].unique())):
+        dates = pd.to_datetime(pd.Series(after.x))
+        inside = dates[(dates >= x_range[0]) & (dates <= x_range[1])]
+        # Nearly all of the points fall in the visible range, with at most one on each side
+        assert len(dates) <= 100 and len(dates) - len(inside) <= 2
+        full_dates = pd.to_datetime(pd.Series(before.x))
+        assert len(inside) > ((full_dates >= x_range[0]) & (full_dates <= x_range[1])).sum()
+
+
+@pytest.mark.parametrize('webgl_threshold, trace_type', [(899, 'scattergl'), (900, 'scatter')])
+def test_webgl_is_used_above_the_threshold_of_drawn_points(data, webgl_threshold, trace_type):
+    # Nine companies downsampled to 100 points each draw 900 points
+    visualizer = PlotlyVisualizer(data=data, max_points_per_series=100, webgl_threshold=webgl_threshold)
+    assert visualizer.df['Company'].nunique() == 9
+    fig = visualizer.plot_outage_per_ppe_over_time(dashboard=True, show_percentiles=False)
+    assert {trace.type for trace in fig.data} == {trace_type}
@@ -0,0 +1,105 @@
+import json
+import os
+import plotly.graph_objects as go
+import pytest
+from frontend import figure_cache
+from frontend.figure_cache import FigureCache
+
+
+def figure(title):
+    return go.Figure(layout={'title': {'text': title}})
+
+
+def title(figure_json):
+    return figure_json['layout']['title']['text']
+
+
+def builds():
+    built = []
+
+    def build(name):
+        def build_figure():
+            built.append(name)
+            return figure(name)
+        return build_figure
+    return built, build
+
+
+def disk_entries(cache):
+    return sorted(name for name in os.listdir(cache.cache_dir) if name.endswith('.json'))
+
+
+def test_figures_are_built_once_per_callback_inputs_and_data_version():
+    cache = FigureCache()
+    built, build = builds()
+    assert title(cache.get_or_build('graph-tab1', [['AT&T'], None], 'v1', build('a'))) == 'a'
+    assert title(cache.get_or_build('graph-tab1', [['AT&T'], None], 'v1', build('b'))) == 'a'
+    assert title(cache.get_or_build('graph-tab1', [['Lumen'], None], 'v1', build('c'))) == 'c'
+    assert title(cache.get_or_build('graph-tab2', [['AT&T'], None], 'v1', build('d'))) == 'd'
+    assert title(cache.get_or_build('graph-tab1', [['AT&T'], None], 'v2', build('e'))) == 'e'
+    assert built == ['a', 'c', 'd', 'e']
+    assert cache.stats() == {'hits': 1, 'misses': 4, 'entries': 4}
+
+
+def test_the_least_recently_used_figures_are_dropped_from_memory():
+    cache = FigureCache(max_entries=2)
+    built, build = builds()
+    cache.get_or_build('graph', ['a'], 'v1', build('a'))
+    cache.get_or_build('graph', ['b'], 'v1', build('b'))
+    cache.get_or_build('graph', ['a'], 'v1', build('a'))
+    cache.get_or_build('graph', ['c'], 'v1', build('c'))
+    cache.get_or_build('graph', ['a'], 'v1', build('a'))
+    cache.get_or_build('graph', ['b'], 'v1', build('b'))
+    assert built == ['a', 'b', 'c', 'b']
+    assert cache.stats()['entries'] == 2
+
+
+def test_the_disk_tier_survives_a_restart_and_refills_memory(tmp_path):
+    built, build = builds()
+    FigureCache(cache_dir=str(tmp_path)).get_or_build('graph', ['a'], 'v1', build('a'))
+
+    restarted = FigureCache(max_entries=1, cache_dir=str(tmp_path))
+    assert title(restarted.get_or_build('graph', ['a'], 'v1', build('rebuilt'))) == 'a'
+    assert built == ['a']
+    assert restarted.stats() == {'hits': 1, 'misses': 0, 'entries': 1}
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
+
+
+def test_the_disk_tier_keeps_the_most_recently_used_figures(tmp_path):
+    cache = FigureCache(max_entries=1, cache_dir=str(tmp_path), max_disk_entries=2)
+    built, build = builds()
+    cache.get_or_build('graph', ['a'], 'v1', build('a'))
+    cache.get_or_build('graph', ['b'], 'v1', build('b'))
+    # Reading 'a' back from disk marks it used, so 'b' is the one evicted
+    os.utime(tmp_path / f"{cache.make_key('graph', ['a'], 'v1')}.json", (0, 0))
+    cache.get_or_build('graph', ['a'], 'v1', build('a'))
+    cache.get_or_build('graph', ['c'], 'v1', build('c'))
+
+    assert disk_entries(cache) == sorted(f"{cache.make_key('graph', [name], 'v1')}.json" for name in 'ac')
+    assert built == ['a', 'b', 'c']
+
+
+def test_bumping_the_version_ignores_figures_on_disk(tmp_path, monkeypatch):
+    built, build = builds()
+    FigureCache(cache_dir=str(tmp_path)).get_or_build('graph', ['a'], 'v1', build('old'))
+
+    monkeypatch.setattr(figure_cache, 'FIGURE_CACHE_VERSION', figure_cache.FIGURE_CACHE_VERSION + 1)
+    restarted = FigureCache(cache_dir=str(tmp_path))
+    assert title(restarted.get_or_build('graph', ['a'], 'v1', build('new'))) == 'new'
+    assert built == ['old', 'new']
+
+
+def test_an_unreadable_disk_entry_is_rebuilt(tmp_path):
+    cache = FigureCache(cache_dir=str(tmp_path))
+    os.mkdir(tmp_path / f"{cache.make_key('graph', ['a'], 'v1')}.json")
+    built, build = builds()
+    assert title(cache.get_or_build('graph', ['a'], 'v1', build('a'))) == 'a'
+    assert built == ['a']
+
+
+@pytest.mark.parametrize('inputs', [[['AT&T', 'Lumen'], '2020-01-01', None], [{'a': 1, 'b': [1, 2]}]])
+def test_keys_are_stable_across_processes(inputs):
+    # Keys are hashes of JSON, not of Python objects, so every worker and a restarted dashboard agree on them
+    key = FigureCache().make_key('graph', inputs, 'fingerprint')
+    assert key == FigureCache().make_key('graph', json.loads(json.dumps(inputs)), 'fingerprint')
+    assert key != FigureCache().make_key('graph', inputs, 'other fingerprint')
@@ -0,0 +1,91 @@
+import pytest
+from frontend.figure_cache import FigureCache
+from frontend.metrics import CallbackMetrics
+from visualization.plotly_visualizer import PlotlyVisualizer
+from visualization.vishelp.fit_cache import FitCache, canonical_filter_state
+from tests.testutil import make_linked_data, parse_metrics, metrics_sample
+
+COMPANIES = ['AT&T', 'Comcast', 'Lumen']
+
+
+@pytest.fixture
+def visualizer():
+    return PlotlyVisualizer(data=make_linked_data(5000, seed=2))
+
+
+def test_equivalent_filter_states_share_a_key():
+    assert canonical_filter_state(['Lumen', 'AT&T', 'Lumen'], '2020-01-01', None) == \
+        canonical_filter_state(['AT&T', 'Lumen'], '2020-01-01T00:00:00', None)
+    assert canonical_filter_state(['AT&T'], '2020-01-01') != canonical_filter_state(['AT&T'], '2020-04-01')
+
+
+def test_fit_cache_evicts_the_least_recently_used_fit():
+    cache = FitCache(max_entries=2, ttl=None)
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    cache.get_or_compute('a', lambda: None)
+    cache.get_or_compute('c', lambda: 3)
+    assert cache.get_or_compute('a', lambda: None) == 1
+    assert cache.get_or_compute('b', lambda: 'refit') == 'refit'
+    assert cache.stats()['entries'] == 2
+
+
+def test_fits_are_reused_for_the_same_data(visualizer):
+    visualizer.plot_average_outage_vs_ppe(dashboard=True, selected_companies=COMPANIES)
+    misses = visualizer.fit_cache.misses
+    visualizer.plot_average_outage_vs_ppe(dashboard=True, selected_companies=list(reversed(COMPANIES)))
+    assert visualizer.fit_cache.misses == misses
+    assert visualizer.fit_cache.hits >= 1
+
+
+def test_reloading_unchanged_data_keeps_the_fingerprint(visualizer):
+    fingerprint = visualizer.data_fingerprint
+    assert not visualizer.update_data(make_linked_data(5000, seed=2))
+    assert visualizer.data_fingerprint == fingerprint
+
+
+def test_fits_are_not_reused_after_the_data_changes(visualizer):
+    before = visualizer.plot_average_outage_vs_ppe(dashboard=True, selected_companies=COMPANIES)
+    fingerprint = visualizer.data_fingerprint
+
+    assert visualizer.update_data(make_linked_data(5000, seed=3))
+    assert visualizer.data_fingerprint != fingerprint
+    misses = visualizer.fit_cache.misses
+    after = visualizer.plot_average_outage_vs_ppe(dashboard=True, selected_companies=COMPANIES)
+    assert visualizer.fit_cache.misses == misses + 1
+    assert after.data[-1].y.tolist() != before.data[-1].y.tolist()
+
+
+def test_figure_cache_is_keyed_by_the_data_fingerprint(visualizer, tmp_path):
+    inputs = [COMPANIES, None, None]
+    build = lambda: visualizer.plot_average_outage_vs_ppe(dashboard=True, selected_companies=COMPANIES)
+    cache = FigureCache(cache_dir=str(tmp_path))
+    first = cache.get_or_build('graph-tab1', inputs, visualizer.data_fingerprint, build)
+    assert cache.get_or_build('graph-tab1', inputs, visualizer.data_fingerprint, build) == first
+    assert cache.stats()['misses'] == 1
+
+    old_fingerprint = visualizer.data_fingerprint
+    visualizer.update_data(make_linked_data(5000, seed=3))
+    second = cache.get_or_build('graph-tab1', inputs, visualizer.data_fingerprint, build)
+    assert cache.stats()['misses'] == 2
+    assert second != first
+
+    # The on-disk tier serves a restarted dashboard the figure of the data it has loaded, not a stale one
+    restarted = FigureCache(cache_dir=str(tmp_path))
+    assert restarted.get_or_build('graph-tab1', inputs, visualizer.data_fingerprint, build) == second
+    assert restarted.get_or_build('graph-tab1', inputs, old_fingerprint, build) == first
+    assert restarted.stats()['misses'] == 0
+
+
+def test_fit_cache_counters_are_reported_with_the_metrics(visualizer):
+    metrics = CallbackMetrics()
+    metrics.add_cache('fit', visualizer.fit_cache.stats)
+    visualizer.plot_average_outage_vs_ppe(dashboard=True, selected_companies=COMPANIES)
+    visualizer.plot_average_outage_vs_ppe(dashboard=True, selected_companies=COMPANIES)
+    stats = visualizer.fit_cache.stats()
+    assert stats['hits'] >= 1
+
+    samples = parse_metrics(metrics.render())
+    assert metrics_sample(samples, 'dashboard_cache_hits_total', cache='fit') == stats['hits']
+    assert metrics_sample(samples, 'dashboard_cache_misses_total', cache='fit') == stats['misses']
+    assert metrics_sample(samples, 'dashboard_cache_entries', cache='fit') == stats['entries']
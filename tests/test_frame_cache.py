@@ -0,0 +1,89 @@
+import os
+import pandas as pd
+import pytest
+from data_prep import OutageDataProcessor, FrameCache, frame_cache
+from tests.testutil import make_outage_data
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FrameCache(str(tmp_path / 'cache'), max_entries=2)
+    if not cache.enabled:
+        pytest.skip("pyarrow is not installed")
+    return cache
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / 'outages.csv'
+    path.write_text('a,b\n1,2\n')
+    return str(path)
+
+
+def entries(cache):
+    return sorted(name for name in os.listdir(cache.cache_dir) if name.endswith('.parquet'))
+
+
+def test_a_stored_frame_is_loaded_back_and_unknown_keys_miss(cache, input_file):
+    key = cache.make_key('outage', [input_file], start_year=2017)
+    assert cache.load(key) is None
+
+    data = pd.DataFrame({'Company': ['A', 'B'], 'Count': [1, 2]})
+    cache.save(key, data)
+    pd.testing.assert_frame_equal(cache.load(key), data)
+    assert cache.load(cache.make_key('outage', [input_file], start_year=2018)) is None
+
+
+def test_keys_change_with_the_inputs_the_settings_and_the_cache_version(cache, input_file, monkeypatch):
+    key = cache.make_key('outage', [input_file], start_year=2017, end_year=2022)
+    assert cache.make_key('outage', [input_file], end_year=2022, start_year=2017) == key
+    assert cache.make_key('outage', [input_file], start_year=2017, end_year=2023) != key
+    assert cache.make_key('outagecounts', [input_file], start_year=2017, end_year=2022) != key
+
+    monkeypatch.setattr(frame_cache, 'CACHE_VERSION', frame_cache.CACHE_VERSION + 1)
+    assert cache.make_key('outage', [input_file], start_year=2017, end_year=2022) != key
+    monkeypatch.undo()
+
+    with open(input_file, 'a') as f:
+        f.write('3,4\n')
+    assert cache.make_key('outage', [input_file], start_year=2017, end_year=2022) != key
+
+
+def test_the_least_recently_used_entries_of_a_kind_are_evicted(cache, input_file):
+    data = pd.DataFrame({'Count': [1]})
+    keys = [cache.make_key('outage', [input_file], start_year=year) for year in (2016, 2017, 2018)]
+    financial = cache.make_key('financial', [input_file])
+    cache.save(financial, data)
+
+    cache.save(keys[0], data)
+    cache.save(keys[1], data)
+    # Loading the older entry makes it the most recently used, so the other one is evicted next
+    os.utime(os.path.join(cache.cache_dir, f"{keys[0]}.parquet"), (0, 0))
+    assert cache.load(keys[0]) is not None
+    cache.save(keys[2], data)
+
+    assert entries(cache) == sorted(f"{key}.parquet" for key in (financial, keys[0], keys[2]))
+    assert cache.load(keys[1]) is None
+
+
+def test_an_unreadable_entry_is_a_miss(cache, input_file):
+    key = cache.make_key('outage', [input_file])
+    os.makedirs(cache.cache_dir)
+    with open(os.path.join(cache.cache_dir, f"{key}.parquet"), 'w') as f:
+        f.write('not parquet')
+    assert cache.load(key) is None
+
+
+def test_the_outage_processor_skips_parsing_on_a_hit_and_reparses_when_the_settings_change(tmp_path, cache, monkeypatch):
+    make_outage_data(500, seed=2).to_csv(tmp_path / 'outages.csv', index=False)
+    load = lambda start_year: OutageDataProcessor('outages.csv', start_year, 2022, folder=str(tmp_path), cache=cache).get_outage_data()
+    expected = load(2017)
+
+    parses = []
+    parse = pd.read_csv
+    monkeypatch.setattr(pd, 'read_csv', lambda *args, **kwargs: parses.append(args) or parse(*args, **kwargs))
+    pd.testing.assert_frame_equal(load(2017), expected)
+    assert parses == []
+
+    load(2018)
+    assert parses != []
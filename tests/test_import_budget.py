@@ -0,0 +1,17 @@
+import pytest
+from benchmarks import import_budget
+
+# The time budgets are doubled here, as the tests may share the machine with other work; the deferred modules are
+# checked as strictly as in the benchmark
+SCALE = 2.0
+
+
+@pytest.mark.parametrize('package', list(import_budget.BUDGETS_MS))
+def test_package_imports_stay_within_budget(package):
+    assert import_budget.check(package, repeat=2, scale=SCALE) == []
+
+
+def test_import_time_reports_the_loaded_modules():
+    times, loaded = import_budget.import_time('import json')
+    assert 'json' in times and times['json'] > 0
+    assert {'json', 'json.decoder'} <= loaded
@@ -0,0 +1,105 @@
+import json
+import multiprocessing
+import os
+import re
+import plotly.graph_objects as go
+import pytest
+from flask import Flask
+from frontend.figure_cache import FigureCache
+from frontend.metrics import CallbackMetrics, LATENCY_BUCKETS
+from tests.testutil import parse_metrics, metrics_sample
+
+
+def test_latency_histogram_buckets_are_cumulative():
+    metrics = CallbackMetrics()
+    for seconds in (0.003, 0.02, 0.02, 0.7, 30.0):
+        metrics.observe('update_graph_tab2', 'total', seconds)
+    samples = parse_metrics(metrics.render())
+
+    bucket = lambda bound: metrics_sample(samples, 'dashboard_callback_duration_seconds_bucket', callback='update_graph_tab2', phase='total', le=bound)
+    assert [bucket(bound) for bound in LATENCY_BUCKETS] == [1, 1, 3, 3, 3, 3, 3, 4, 4, 4, 4]
+    assert bucket('+Inf') == 5
+    assert metrics_sample(samples, 'dashboard_callback_duration_seconds_count', callback='update_graph_tab2', phase='total') == 5
+    assert metrics_sample(samples, 'dashboard_callback_duration_seconds_sum', callback='update_graph_tab2', phase='total') == pytest.approx(30.743)
+
+
+def test_output_is_valid_exposition_text():
+    metrics = CallbackMetrics(slow_threshold=0.0)
+    metrics.timed('update "tab"\n3')(lambda: None)()
+    metrics.observe_payload('update_graph_tab3', 12345)
+    text = metrics.render()
+
+    assert text.endswith("\n")
+    families = re.findall(r'# TYPE (\w+) (\w+)', text)
+    assert families == [('dashboard_callback_duration_seconds', 'histogram'), ('dashboard_callback_payload_bytes', 'histogram'),
+                        ('dashboard_callback_slow_total', 'counter')]
+    samples = parse_metrics(text)
+    assert metrics_sample(samples, 'dashboard_callback_slow_total', callback='update \\"tab\\"\\n3') == 1
+    assert metrics_sample(samples, 'dashboard_callback_payload_bytes_bucket', callback='update_graph_tab3', le=50000) == 1
+    assert all(dict(labels)['pid'] == str(os.getpid()) for _, labels in samples)
+
+
+def test_requests_record_every_phase_and_the_payload(tmp_path):
+    metrics = CallbackMetrics(slow_threshold=0.0, slow_log_path=str(tmp_path / 'slow.jsonl'))
+    server = Flask(__name__)
+    metrics.init_app(server)
+
+    @server.route('/callback')
+    @metrics.timed('update_graph_tab1')
+    def callback():
+        return 'x' * 2000
+
+    assert server.test_client().get('/callback').status_code == 200
+    samples = parse_metrics(metrics.render())
+    for phase in ('filter', 'fit', 'build', 'serialize', 'total'):
+        assert metrics_sample(samples, 'dashboard_callback_duration_seconds_count', callback='update_graph_tab1', phase=phase) == 1
+    assert metrics_sample(samples, 'dashboard_callback_payload_bytes_sum', callback='update_graph_tab1') == 2000
+
+    with open(tmp_path / 'slow.jsonl') as f:
+        entry = json.loads(f.readline())
+    assert entry['callback'] == 'update_graph_tab1' and entry['payload_bytes'] == 2000
+
+
+def run_job(callback):
+    callback()
+
+
+def test_background_jobs_report_their_timing_through_the_job_queue(tmp_path):
+    diskcache = pytest.importorskip('diskcache')
+    metrics = CallbackMetrics(job_queue=diskcache.Cache(str(tmp_path / 'jobs')))
+    callback = metrics.timed('update_graph_tab1', background=True)(lambda: sum(range(1000)))
+
+    # Background jobs are forked from the server like Dash's DiskcacheManager does
+    job = multiprocessing.get_context('fork').Process(target=run_job, args=(callback,))
+    job.start()
+    job.join()
+    assert job.exitcode == 0
+
+    samples = parse_metrics(metrics.render())
+    assert metrics_sample(samples, 'dashboard_callback_duration_seconds_count', callback='update_graph_tab1', phase='total') == 1
+    assert ('dashboard_callback_duration_seconds_count', tuple(sorted({'callback': 'update_graph_tab1', 'phase': 'serialize',
+                                                                      'pid': str(os.getpid())}.items()))) not in samples
+    # Each job timing is recorded once
+    assert metrics_sample(parse_metrics(metrics.render()), 'dashboard_callback_duration_seconds_count', callback='update_graph_tab1', phase='total') == 1
+
+
+def test_background_callbacks_cannot_be_timed_without_a_job_queue():
+    with pytest.raises(ValueError):
+        CallbackMetrics().timed('update_graph_tab1', background=True)
+
+
+def test_cache_counters_are_rendered_per_cache():
+    metrics = CallbackMetrics()
+    figure_cache = FigureCache()
+    metrics.add_cache('figure', figure_cache.stats)
+    figure_cache.get_or_build('graph-tab2', ['AT&T'], 'v1', go.Figure)
+    figure_cache.get_or_build('graph-tab2', ['AT&T'], 'v1', go.Figure)
+    figure_cache.get_or_build('graph-tab3', ['AT&T'], 'v1', go.Figure)
+    text = metrics.render()
+
+    assert re.findall(r'# TYPE (dashboard_cache_\w+) (\w+)', text) == [('dashboard_cache_hits_total', 'counter'), ('dashboard_cache_misses_total', 'counter'),
+                                                                         ('dashboard_cache_entries', 'gauge')]
+    samples = parse_metrics(text)
+    assert metrics_sample(samples, 'dashboard_cache_hits_total', cache='figure') == 1
+    assert metrics_sample(samples, 'dashboard_cache_misses_total', cache='figure') == 2
+    assert metrics_sample(samples, 'dashboard_cache_entries', cache='figure') == 2
@@ -0,0 +1,118 @@
+import os
+import pandas as pd
+import pytest
+from data_prep import OutageDataProcessor, tracer
+from tests.testutil import make_outage_data
+
+KEYS = ['Company', 'Year', 'Quarter']
+FILE_YEARS = {'2016.csv': (2016, 2017), '2018.csv': (2018, 2019), '2020.csv': (2020, 2022)}
+ROWS_PER_FILE = 2000
+
+
+@pytest.fixture
+def traced():
+    tracer.reset()
+    tracer.enable()
+    try:
+        yield tracer
+    finally:
+        tracer.disable()
+        tracer.reset()
+
+
+@pytest.fixture
+def partitions(tmp_path):
+    """ Writes an outage partition per range of years and returns its directory. """
+    folder = tmp_path / 'nors'
+    folder.mkdir()
+    for seed, (name, (start_year, end_year)) in enumerate(FILE_YEARS.items()):
+        make_outage_data(ROWS_PER_FILE, seed=seed, start_year=start_year, end_year=end_year).to_csv(folder / name, index=False)
+    return folder
+
+
+def parsed_rows(tracer):
+    return sum(record['rows_in'] or 0 for record in tracer.records if record['name'] == 'outage.parse')
+
+
+def fresh_counts(folder, start_year, end_year):
+    """ Returns the counts of a load that does not use a partition manifest. """
+    return OutageDataProcessor(folder.name, start_year, end_year, folder=str(folder.parent)).get_outage_frequency()
+
+
+def file_counts(path, start_year, end_year):
+    return OutageDataProcessor(path.name, start_year, end_year, folder=str(path.parent)).get_outage_frequency()
+
+
+def load(folder, state_dir, start_year=2017, end_year=2021, workers=1):
+    return OutageDataProcessor(folder.name, start_year, end_year, folder=str(folder.parent), workers=workers, state_dir=str(state_dir))
+
+
+def sorted_keys(keys):
+    return keys.to_frame(index=False).sort_values(KEYS).reset_index(drop=True)
+
+
+def test_a_restart_parses_no_unchanged_file(partitions, tmp_path, traced):
+    load(partitions, tmp_path / 'state')
+    tracer.reset()
+    processor = load(partitions, tmp_path / 'state')
+    assert parsed_rows(traced) == 0
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), fresh_counts(partitions, 2017, 2021))
+
+
+def test_a_changed_file_is_parsed_alone(partitions, tmp_path, traced):
+    processor = load(partitions, tmp_path / 'state')
+    changed = partitions / '2018.csv'
+    old_counts = file_counts(changed, 2017, 2021)
+    make_outage_data(ROWS_PER_FILE + 300, seed=10, start_year=2018, end_year=2019).to_csv(changed, index=False)
+    stat = os.stat(changed)
+    os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    tracer.reset()
+    processor.load_and_process_outage_data()
+    assert parsed_rows(traced) == ROWS_PER_FILE + 300
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), fresh_counts(partitions, 2017, 2021))
+    new_counts = file_counts(changed, 2017, 2021)
+    expected_keys = pd.concat([old_counts, new_counts])[KEYS].drop_duplicates()
+    pd.testing.assert_frame_equal(sorted_keys(processor.changed_keys), expected_keys.sort_values(KEYS).reset_index(drop=True), check_dtype=False)
+
+
+def test_a_removed_file_is_taken_out_of_the_counts(partitions, tmp_path, traced):
+    processor = load(partitions, tmp_path / 'state')
+    removed = partitions / '2020.csv'
+    removed_keys = file_counts(removed, 2017, 2021)[KEYS]
+    removed.unlink()
+
+    tracer.reset()
+    processor.load_and_process_outage_data()
+    assert parsed_rows(traced) == 0
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), fresh_counts(partitions, 2017, 2021))
+    pd.testing.assert_frame_equal(sorted_keys(processor.changed_keys), removed_keys.sort_values(KEYS).reset_index(drop=True), check_dtype=False)
+
+    # A restarted processor reads the manifest saved without the removed file
+    tracer.reset()
+    restarted = load(partitions, tmp_path / 'state')
+    assert parsed_rows(traced) == 0
+    pd.testing.assert_frame_equal(restarted.get_outage_frequency(), fresh_counts(partitions, 2017, 2021))
+
+
+@pytest.mark.parametrize('start_year, end_year', [(2019, None), (None, 2018), (None, None)])
+def test_a_missing_year_bound_is_unbounded(partitions, tmp_path, start_year, end_year):
+    all_years = fresh_counts(partitions, None, None)
+    in_range = all_years['Year'].between(start_year or 0, end_year or 9999)
+    expected = all_years[in_range].reset_index(drop=True)
+
+    result = load(partitions, tmp_path / 'state', start_year, end_year).get_outage_frequency()
+    pd.testing.assert_frame_equal(result, expected)
+    single_file = file_counts(partitions / '2018.csv', start_year, end_year)
+    expected = expected[expected['Year'].between(2018, 2019)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(single_file, expected)
+
+
+def test_rows_of_partitions_are_read_in_parallel_like_serially(partitions, tmp_path):
+    serial = load(partitions, tmp_path / 'serial', workers=1).get_outage_data()
+    parallel = load(partitions, tmp_path / 'parallel', workers=2).get_outage_data()
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert serial['Year'].between(2017, 2021).all()
+    expected = pd.concat([OutageDataProcessor(name, 2017, 2021, folder=str(partitions)).get_outage_data() for name in ('2016.csv', '2018.csv', '2020.csv')],
+                         ignore_index=True)
+    pd.testing.assert_frame_equal(serial, expected)
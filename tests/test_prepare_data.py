@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+import pandas as pd
+from data_prep import BuildManifest
+from data_prep.file_lock import file_lock
+from prepare_data import build_prepared_data
+from benchmarks.synthetic_data import write_ppe_workbook
+from tests.testutil import make_outage_data
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    lock_path = str(tmp_path / 'build.lock')
+    events = []
+    first_holds = threading.Event()
+
+    def first():
+        with file_lock(lock_path):
+            first_holds.set()
+            time.sleep(0.3)
+            events.append('first released')
+
+    def second():
+        first_holds.wait()
+        with file_lock(lock_path):
+            events.append('second acquired')
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert events == ['first released', 'second acquired']
+
+
+def test_concurrent_builds_prepare_the_data_once(tmp_path):
+    make_outage_data(3000, seed=1, start_year=2020, end_year=2023).to_csv(tmp_path / 'outages.csv', index=False)
+    write_ppe_workbook(str(tmp_path / 'ppe.xlsx'), 10)
+    results = []
+    build = lambda: results.append(build_prepared_data(str(tmp_path), 'outages.csv', 'ppe.xlsx', stage_workers=1))
+
+    threads = [threading.Thread(target=build) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    built = [dataprep for dataprep in results if dataprep is not None]
+    assert len(results) == 3 and len(built) == 1
+    prepared = pd.read_csv(tmp_path / 'prepared_data.csv')
+    assert len(prepared) == len(built[0].get_data()) > 0
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+    assert BuildManifest(str(tmp_path / 'prepared_data.csv')).is_current(
+        [str(tmp_path / 'outages.csv'), str(tmp_path / 'ppe.xlsx')], **built[0].build_params(normalize=True))
@@ -0,0 +1,95 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from visualization.vishelp.quantile_regression import fit_quantile_lines
+
+smf = pytest.importorskip('statsmodels.formula.api')
+
+QUANTILE_SETS = [(0.05, 0.5, 0.95), (0.25, 0.75), (0.1, 0.25, 0.5, 0.75, 0.9)]
+
+# statsmodels stops once its parameters move less than 1e-6 in an iteration. The check loss is nearly flat around the
+# optimum, so a fit within 1e-8 of the optimal loss can still be 1e-3 relative from it in the parameters. Where
+# statsmodels converges, the intercepts and slopes must agree to this tolerance.
+PARAMS_RTOL = 2e-3
+
+# Where statsmodels stops at its iteration limit the parameters can differ widely, since the check loss is flat near
+# the optimum. The batched fit must always reach a check loss no more than this much above statsmodels' (relative).
+LOSS_RTOL = 1e-6
+
+STATSMODELS_MAX_ITER = 1000
+
+
+def make_granular_data(n_rows, seed, ppe_unit=1.0, counts=False):
+    """
+    Builds granular outage counts that grow with PP&E, in the given unit of PP&E (1 for dollars, 1e6 for millions).
+    """
+    rng = np.random.default_rng(seed)
+    ppe = rng.uniform(1e3, 1e6, n_rows)
+    outages = 20 + 2e-4 * ppe + rng.normal(0, 40, n_rows)
+    if counts:
+        outages = np.round(np.maximum(outages, 0))
+    return pd.DataFrame({'PP&E': ppe / ppe_unit, 'Count': outages})
+
+
+def statsmodels_fit(df, quantile):
+    """ Returns the intercept and slope fitted by statsmodels, and whether it converged within its iteration limit. """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results = smf.quantreg('Count ~ Q("PP&E")', df).fit(q=quantile, max_iter=STATSMODELS_MAX_ITER)
+    return results.params['Intercept'], results.params['Q("PP&E")'], results.iterations < STATSMODELS_MAX_ITER
+
+
+def check_loss(df, intercept, slope, quantile):
+    resid = df['Count'] - (intercept + slope * df['PP&E'])
+    return np.sum(np.where(resid < 0, (quantile - 1) * resid, quantile * resid))
+
+
+@pytest.mark.parametrize('quantiles', QUANTILE_SETS)
+@pytest.mark.parametrize('n_rows, seed', [(200, 0), (1600, 1), (3000, 2)])
+def test_matches_statsmodels_where_it_converges(quantiles, n_rows, seed):
+    # PP&E in millions keeps statsmodels' X'X well-conditioned, so its iterations reach the optimum
+    df = make_granular_data(n_rows, seed, ppe_unit=1e6)
+    intercepts, slopes = fit_quantile_lines(df['PP&E'], df['Count'], quantiles)
+    expected = [statsmodels_fit(df, quantile) for quantile in quantiles]
+    converged = [i for i, (_, _, is_converged) in enumerate(expected) if is_converged]
+    assert converged, "statsmodels converged for none of the quantiles"
+    np.testing.assert_allclose(intercepts[converged], [expected[i][0] for i in converged], rtol=PARAMS_RTOL)
+    np.testing.assert_allclose(slopes[converged], [expected[i][1] for i in converged], rtol=PARAMS_RTOL)
+
+
+@pytest.mark.parametrize('quantiles', QUANTILE_SETS)
+@pytest.mark.parametrize('n_rows, seed', [(200, 0), (800, 1), (1600, 1), (3000, 2)])
+def test_fits_at_least_as_well_as_statsmodels(quantiles, n_rows, seed):
+    # PP&E in dollars with integer counts, as in the dashboard
+    df = make_granular_data(n_rows, seed, counts=True)
+    intercepts, slopes = fit_quantile_lines(df['PP&E'], df['Count'], quantiles)
+    expected = [statsmodels_fit(df, quantile) for quantile in quantiles]
+    for quantile, intercept, slope, (expected_intercept, expected_slope, _) in zip(quantiles, intercepts, slopes, expected):
+        loss = check_loss(df, intercept, slope, quantile)
+        expected_loss = check_loss(df, expected_intercept, expected_slope, quantile)
+        assert loss <= expected_loss * (1 + LOSS_RTOL), f"q={quantile}: check loss {loss} vs {expected_loss} from statsmodels"
+
+
+def test_results_follow_the_order_of_the_quantiles():
+    df = make_granular_data(500, 3, ppe_unit=1e6)
+    intercepts, slopes = fit_quantile_lines(df['PP&E'], df['Count'], (0.75, 0.25))
+    reversed_intercepts, reversed_slopes = fit_quantile_lines(df['PP&E'], df['Count'], (0.25, 0.75))
+    np.testing.assert_allclose(intercepts, reversed_intercepts[::-1])
+    np.testing.assert_allclose(slopes, reversed_slopes[::-1])
+
+
+def test_missing_values_are_dropped():
+    df = make_granular_data(500, 4, ppe_unit=1e6)
+    with_missing = df.copy()
+    with_missing.loc[[3, 10], 'PP&E'] = np.nan
+    with_missing.loc[20, 'Count'] = np.nan
+    expected = fit_quantile_lines(df.drop(index=[3, 10, 20])['PP&E'], df.drop(index=[3, 10, 20])['Count'], (0.5,))
+    np.testing.assert_allclose(fit_quantile_lines(with_missing['PP&E'], with_missing['Count'], (0.5,)), expected)
+
+
+@pytest.mark.parametrize('quantiles', [(0.0, 0.5), (0.5, 1.0), (1.5,)])
+def test_rejects_quantiles_outside_the_unit_interval(quantiles):
+    df = make_granular_data(50, 5)
+    with pytest.raises(ValueError):
+        fit_quantile_lines(df['PP&E'], df['Count'], quantiles)
@@ -0,0 +1,66 @@
+import codecs
+import os
+from unittest import mock
+from data_prep import read_util
+from data_prep.read_util import find_encoding, file_fingerprint, _detect_encoding
+
+
+def test_utf8_and_ascii_are_detected_without_chardet():
+    with mock.patch.dict('sys.modules', {'chardet': None}):
+        # chardet cannot be imported here, so these must take the fast path
+        assert _detect_encoding(b'Plant,Outage\nRiverside,Planned\n') == 'utf-8'
+        assert _detect_encoding('Centrale,Arrêt\nMünchen,Geplant\n'.encode('utf-8')) == 'utf-8'
+        assert _detect_encoding(codecs.BOM_UTF8 + b'Plant\n') == 'utf-8-sig'
+
+
+def test_a_multibyte_character_cut_off_by_the_sample_is_still_utf8():
+    assert _detect_encoding('Arrêt'.encode('utf-8')[:-1]) == 'utf-8'
+
+
+def test_other_encodings_fall_back_to_chardet():
+    assert _detect_encoding(('Plant,Outage\n' * 50).encode('utf-16')).lower().startswith('utf-16')
+    latin1 = ('Centrale,Arrêt,Équipe,Réseau\n' * 50).encode('latin-1')
+    assert _detect_encoding(latin1).lower() not in ('utf-8', 'ascii')
+
+
+def test_the_fingerprint_changes_with_the_file(tmp_path):
+    path = tmp_path / 'outages.csv'
+    path.write_text('a\n')
+    first = file_fingerprint(str(path))
+    assert first == file_fingerprint(str(path))
+    assert first[0] == os.path.abspath(path)
+
+    path.write_text('a,b\n')
+    second = file_fingerprint(str(path))
+    assert second != first
+
+    # A rewrite of the same size is told apart by its modification time
+    path.write_text('a,c\n')
+    os.utime(path, ns=(second[2] + 10**9, second[2] + 10**9))
+    assert file_fingerprint(str(path)) == (second[0], second[1], second[2] + 10**9)
+
+
+def test_encodings_are_detected_once_per_version_of_a_file(tmp_path):
+    path = tmp_path / 'outages.csv'
+    path.write_text('Plant\n', encoding='utf-8')
+    with mock.patch.object(read_util, '_detect_encoding', wraps=_detect_encoding) as detect:
+        assert find_encoding(str(path)) == 'utf-8'
+        assert find_encoding(str(path)) == 'utf-8'
+        assert detect.call_count == 1
+
+        path.write_bytes(codecs.BOM_UTF8 + b'Plant, again\n')
+        assert find_encoding(str(path)) == 'utf-8-sig'
+        assert detect.call_count == 2
+
+
+def test_the_encoding_memo_is_bounded(tmp_path):
+    memo = read_util._detected_encodings
+    for i in range(memo.max_files + 10):
+        path = tmp_path / f'part-{i}.csv'
+        path.write_text(str(i))
+        find_encoding(str(path))
+    assert len(memo) == memo.max_files
+
+
+def test_a_missing_file_is_reported():
+    assert find_encoding('does/not/exist.csv') == "Error: File not found."
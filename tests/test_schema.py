@@ -0,0 +1,73 @@
+import time
+import pandas as pd
+from config.config import company_aliases_2
+from data_prep import apply_schema, memory_report
+from visualization.vishelp.vis_preprocess import VisualizationPreprocessor
+from tests.testutil import make_linked_data
+
+
+def filter_and_aggregate(df):
+    """ Preprocesses a linked dataset and runs the range filter and per-company aggregation of the dashboard. """
+    preprocessor = VisualizationPreprocessor(df)
+    df = preprocessor.preprocess_data(df)
+    companies = ['AT&T', 'Comcast', 'Lumen']
+    filtered = preprocessor.filter_dataframe(df, companies, '2017-01-01', '2021-12-31')
+    return preprocessor, df, preprocessor.group_and_aggregate(filtered)
+
+
+def best_time(func, repeat=5):
+    """ Returns the fastest of several timed calls. """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def test_apply_schema_declares_compact_dtypes():
+    df = apply_schema(make_linked_data(1000))
+    assert isinstance(df['Company'].dtype, pd.CategoricalDtype)
+    assert df['Year'].dtype == 'int16'
+    assert df['Quarter'].dtype == 'int8'
+    assert df['Quarter'].between(1, 4).all()
+    assert df['Count'].dtype == 'int16'
+    assert df['PP&E'].dtype == 'float64'
+
+
+def test_schema_keeps_the_linked_values():
+    raw = make_linked_data(1000)
+    df = apply_schema(raw.copy())
+    pd.testing.assert_series_equal(df['Company'].astype(object), raw['Company'])
+    assert (df['Year'] == raw['Year']).all()
+    assert ('Q' + df['Quarter'].astype(str) == raw['Quarter']).all()
+    assert (df['Count'] == raw['Count']).all()
+
+
+def test_schema_shrinks_the_footprint_and_speeds_up_filtering():
+    # Object dtypes as before the schema, with the dashboard's aliases still to resolve
+    raw = make_linked_data()
+    legacy = raw.copy()
+    legacy['Company'] = legacy['Company'].map(company_aliases_2)
+    legacy['Date'] = pd.to_datetime(legacy['Year'].astype(str) + '-' + legacy['Quarter'].str[1:].astype(int).mul(3).sub(2).astype(str) + '-01')
+    legacy['Outage per PP&E'] = legacy['Count'] / legacy['PP&E']
+
+    preprocessor, compact, _ = filter_and_aggregate(apply_schema(raw.copy()))
+
+    legacy_bytes = memory_report(legacy).loc['Total', 'bytes']
+    compact_bytes = memory_report(compact).loc['Total', 'bytes']
+    assert compact_bytes < legacy_bytes / 2, f"{compact_bytes} bytes with the schema, {legacy_bytes} without"
+
+    companies = ['AT&T', 'Comcast', 'Lumen']
+
+    def run(df):
+        return lambda: preprocessor.group_and_aggregate(preprocessor.filter_dataframe(df, companies, '2017-01-01', '2021-12-31'))
+
+    legacy_time, compact_time = best_time(run(legacy)), best_time(run(compact))
+    assert compact_time < legacy_time, f"{compact_time:.4f} s with the schema, {legacy_time:.4f} s without"
+
+    expected = run(legacy)()
+    result = run(compact)()
+    result['Company'] = result['Company'].astype(object)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
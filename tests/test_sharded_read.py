@@ -0,0 +1,67 @@
+import io
+import logging
+import pandas as pd
+import pytest
+from data_prep import OutageDataProcessor
+from data_prep.read_util import split_into_byte_ranges, open_byte_range
+from tests.testutil import make_outage_data
+
+
+def make_multiline_outage_data(n_rows, seed=0):
+    """ Outage records whose descriptions span several lines and contain quotes, as free-text fields often do. """
+    data = make_outage_data(n_rows, seed=seed, start_year=2017, end_year=2022)
+    data['u_incident_description'] = [f'Fiber cut "near"\nsite {i},\r\nrestored' if i % 3 else 'Power loss' for i in range(n_rows)]
+    return data
+
+
+@pytest.fixture
+def outage_file(tmp_path):
+    path = tmp_path / 'outages.csv'
+    make_multiline_outage_data(4000, seed=3).to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize('parts, block_size', [(2, 1 << 24), (7, 4096), (50, 97)])
+def test_byte_ranges_split_only_between_records(outage_file, parts, block_size):
+    header, ranges = split_into_byte_ranges(str(outage_file), parts, block_size=block_size)
+    content = outage_file.read_bytes()
+    assert content.startswith(header) and header.count(b'\n') == 1
+    # The ranges cover every data byte exactly once
+    assert ranges[0][0] == len(header) and ranges[-1][1] == len(content)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+    expected = pd.read_csv(io.BytesIO(content))
+    shards = []
+    for start, end in ranges:
+        with open_byte_range(str(outage_file), start, end, header) as stream:
+            shards.append(pd.read_csv(stream))
+    pd.testing.assert_frame_equal(pd.concat(shards, ignore_index=True), expected)
+
+
+def load(path, workers, streaming=False):
+    return OutageDataProcessor(path.name, 2018, 2021, folder=str(path.parent), workers=workers, streaming=streaming)
+
+
+def test_a_sharded_read_matches_the_serial_read(outage_file, caplog):
+    serial = load(outage_file, 1)
+    with caplog.at_level(logging.INFO):
+        sharded = load(outage_file, 3)
+    assert 'in 3 shards' in caplog.text
+    pd.testing.assert_frame_equal(sharded.get_outage_data().reset_index(drop=True), serial.get_outage_data().reset_index(drop=True))
+    pd.testing.assert_frame_equal(sharded.get_outage_frequency(), serial.get_outage_frequency())
+
+
+def test_sharded_counts_match_the_serial_counts(outage_file):
+    pd.testing.assert_frame_equal(load(outage_file, 3, streaming=True).get_outage_frequency(),
+                                  load(outage_file, 1, streaming=True).get_outage_frequency())
+
+
+def test_files_with_multibyte_newlines_are_read_serially(tmp_path, outage_file, caplog):
+    # In UTF-16 a newline is two bytes, so byte ranges cannot be found by scanning for single newline bytes
+    utf16_file = tmp_path / 'outages_utf16.csv'
+    utf16_file.write_bytes(outage_file.read_text().encode('utf-16'))
+
+    with caplog.at_level(logging.WARNING):
+        sharded = load(utf16_file, 3)
+    assert 'reading serially' in caplog.text
+    pd.testing.assert_frame_equal(sharded.get_outage_frequency(), load(outage_file, 1).get_outage_frequency())
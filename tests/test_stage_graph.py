@@ -0,0 +1,93 @@
+import threading
+import pandas as pd
+import pytest
+from data_prep import OutageDataProcessor, tracer
+from data_prep.stage_graph import StageGraph, process_pool_context
+from tests.testutil import make_outage_data
+
+
+@pytest.fixture
+def traced():
+    tracer.reset()
+    tracer.enable()
+    try:
+        yield tracer
+    finally:
+        tracer.disable()
+        tracer.reset()
+
+
+def run_in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_process_pools_are_spawned_while_other_threads_run():
+    assert run_in_thread(process_pool_context).get_start_method() == 'spawn'
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_stage_spans_are_nested_in_the_calling_span(traced, workers):
+    def stage(name):
+        with tracer.span(name):
+            return name
+
+    with tracer.span('prepare'):
+        stages = StageGraph(workers=workers)
+        stages.add('outage', lambda: stage('outage.load'))
+        stages.add('financial', lambda: stage('financial.prepare'))
+        stages.add('link', lambda outage, financial: stage('link'), depends_on=['outage', 'financial'])
+        stages.run()
+
+    parents = {record['name']: record['parent'] for record in traced.records}
+    assert parents == {'outage.load': 'prepare', 'financial.prepare': 'prepare', 'link': 'prepare', 'prepare': None}
+
+
+def test_parallel_parse_within_concurrent_stages_matches_a_serial_parse(tmp_path):
+    make_outage_data(6000, seed=5).to_csv(tmp_path / 'outages.csv', index=False)
+    load = lambda workers: OutageDataProcessor('outages.csv', 2017, 2022, folder=str(tmp_path), workers=workers).get_outage_frequency()
+    expected = load(1)
+
+    stages = StageGraph(workers=2)
+    stages.add('outage', lambda: load(2))
+    stages.add('other', lambda: threading.Event().wait(0.5))
+    pd.testing.assert_frame_equal(stages.run()['outage'], expected)
+
+
+def test_stages_run_one_after_another_while_memory_is_traced():
+    tracer.reset()
+    tracer.enable(trace_memory=True)
+    threads = []
+    try:
+        stages = StageGraph(workers=2)
+        stages.add('outage', lambda: threads.append(threading.current_thread()))
+        stages.add('financial', lambda: threads.append(threading.current_thread()))
+        stages.run()
+    finally:
+        tracer.disable()
+        tracer.reset()
+    assert threads == [threading.current_thread()] * 2
+
+
+def test_stage_peaks_are_their_own_while_memory_is_traced(traced):
+    tracer.disable()
+    tracer.enable(trace_memory=True)
+
+    def allocate(name, size):
+        with tracer.span(name):
+            block = bytearray(size)
+            del block
+
+    with tracer.span('prepare'):
+        stages = StageGraph(workers=2)
+        stages.add('outage', lambda: allocate('outage.load', 8 * 2**20))
+        stages.add('financial', lambda: allocate('financial.prepare', 2**20))
+        stages.run()
+
+    peaks = {record['name']: record['peak_bytes'] for record in traced.records}
+    assert 8 * 2**20 <= peaks['outage.load'] < 9 * 2**20
+    assert 2**20 <= peaks['financial.prepare'] < 2 * 2**20
+    assert peaks['prepare'] >= peaks['outage.load']
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import pandas as pd
+import pytest
+from data_prep import OutageDataProcessor, tracer
+from data_prep.watermark import IngestionWatermark
+from tests.testutil import make_outage_data
+
+START_YEAR, END_YEAR = 2017, 2022
+
+
+@pytest.fixture
+def traced():
+    """ Records the preparation spans of the test, so the number of parsed rows can be checked. """
+    tracer.reset()
+    tracer.enable()
+    try:
+        yield tracer
+    finally:
+        tracer.disable()
+        tracer.reset()
+
+
+def write_outage_file(path, data, append=False):
+    data.to_csv(path, mode='a' if append else 'w', header=not append, index=False)
+
+
+def parsed_rows(tracer):
+    """ Returns the number of rows parsed since the tracer was last reset. """
+    return sum(record['rows_in'] or 0 for record in tracer.records if record['name'] == 'outage.parse')
+
+
+def full_counts(folder, file_name, start_year=START_YEAR, end_year=END_YEAR):
+    """ Returns the counts of a fresh, non-incremental load of the whole file. """
+    return OutageDataProcessor(file_name, start_year, end_year, folder=folder, streaming=True).get_outage_frequency()
+
+
+def incremental_processor(folder, file_name, state_dir, start_year=START_YEAR, end_year=END_YEAR):
+    return OutageDataProcessor(file_name, start_year, end_year, folder=folder, incremental=True, state_dir=state_dir)
+
+
+def test_appended_rows_are_parsed_alone(tmp_path, traced):
+    outage_file = tmp_path / 'outages.csv'
+    write_outage_file(outage_file, make_outage_data(3000, seed=1))
+    processor = incremental_processor(str(tmp_path), 'outages.csv', str(tmp_path / 'state'))
+    assert processor.changed_keys is None
+
+    appended = make_outage_data(500, seed=2)
+    write_outage_file(outage_file, appended, append=True)
+    tracer.reset()
+    processor.load_and_process_outage_data()
+
+    assert parsed_rows(traced) == len(appended)
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), full_counts(str(tmp_path), 'outages.csv'))
+    write_outage_file(tmp_path / 'appended.csv', appended)
+    appended_keys = full_counts(str(tmp_path), 'appended.csv').set_index(['Company', 'Year', 'Quarter']).index
+    assert processor.changed_keys.sort_values().equals(appended_keys.sort_values())
+
+
+def test_a_restarted_processor_resumes_from_the_watermark(tmp_path, traced):
+    outage_file = tmp_path / 'outages.csv'
+    write_outage_file(outage_file, make_outage_data(3000, seed=1))
+    incremental_processor(str(tmp_path), 'outages.csv', str(tmp_path / 'state'))
+    write_outage_file(outage_file, make_outage_data(200, seed=3), append=True)
+
+    tracer.reset()
+    processor = incremental_processor(str(tmp_path), 'outages.csv', str(tmp_path / 'state'))
+    assert parsed_rows(traced) == 200
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), full_counts(str(tmp_path), 'outages.csv'))
+
+
+def rewrite_first_final_report(path):
+    """ Rewrites the status of the first final report in place, keeping the file size, so only the checksum can tell. """
+    with open(path, 'rb') as f:
+        contents = f.read()
+    header_end = contents.index(b'\n') + 1
+    position = contents.index(b',Final,', header_end)
+    with open(path, 'wb') as f:
+        f.write(contents[:position] + b',Fixed,' + contents[position + len(b',Final,'):])
+
+
+@pytest.mark.parametrize('append_after_rewrite', [False, True])
+def test_a_rewritten_prefix_falls_back_to_a_full_rebuild(tmp_path, traced, append_after_rewrite):
+    outage_file = tmp_path / 'outages.csv'
+    write_outage_file(outage_file, make_outage_data(3000, seed=1))
+    processor = incremental_processor(str(tmp_path), 'outages.csv', str(tmp_path / 'state'))
+    size = os.path.getsize(outage_file)
+
+    rewrite_first_final_report(outage_file)
+    assert os.path.getsize(outage_file) == size
+    if append_after_rewrite:
+        write_outage_file(outage_file, make_outage_data(100, seed=4), append=True)
+    tracer.reset()
+    processor.load_and_process_outage_data()
+
+    assert processor.changed_keys is None
+    assert parsed_rows(traced) == 3000 + (100 if append_after_rewrite else 0)
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), full_counts(str(tmp_path), 'outages.csv'))
+
+
+def test_a_truncated_file_falls_back_to_a_full_rebuild(tmp_path, traced):
+    outage_file = tmp_path / 'outages.csv'
+    data = make_outage_data(3000, seed=1)
+    write_outage_file(outage_file, data)
+    processor = incremental_processor(str(tmp_path), 'outages.csv', str(tmp_path / 'state'))
+
+    write_outage_file(outage_file, data.head(1000))
+    tracer.reset()
+    processor.load_and_process_outage_data()
+
+    assert processor.changed_keys is None
+    assert parsed_rows(traced) == 1000
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), full_counts(str(tmp_path), 'outages.csv'))
+
+
+def test_a_different_year_range_does_not_reuse_the_watermark(tmp_path, traced):
+    write_outage_file(tmp_path / 'outages.csv', make_outage_data(3000, seed=1))
+    incremental_processor(str(tmp_path), 'outages.csv', str(tmp_path / 'state'))
+
+    tracer.reset()
+    processor = incremental_processor(str(tmp_path), 'outages.csv', str(tmp_path / 'state'), start_year=2019, end_year=2020)
+    assert parsed_rows(traced) == 3000
+    pd.testing.assert_frame_equal(processor.get_outage_frequency(), full_counts(str(tmp_path), 'outages.csv', 2019, 2020))
+
+
+def test_watermark_resumes_only_a_verified_prefix(tmp_path):
+    source = tmp_path / 'outages.csv'
+    source.write_bytes(b'header\nrow 1\nrow 2\n')
+    watermark = IngestionWatermark(str(tmp_path / 'state'), str(source), start_year=START_YEAR)
+    assert watermark.resume(source.stat().st_size) is None
+
+    prefix = len(b'header\nrow 1\n')
+    watermark.save(prefix, hashlib.sha256(b'header\nrow 1\n').hexdigest(), None)
+    offset, hasher, counts = watermark.resume(source.stat().st_size)
+    assert offset == prefix and counts is None
+    assert hasher.hexdigest() == hashlib.sha256(b'header\nrow 1\n').hexdigest()
+
+    # A shorter file, other parameters or a rewritten prefix each discard the watermark
+    assert watermark.resume(prefix - 1) is None
+    assert IngestionWatermark(str(tmp_path / 'state'), str(source), start_year=START_YEAR + 1).resume(source.stat().st_size) is None
+    source.write_bytes(b'header\nrow X\nrow 2\n')
+    assert watermark.resume(source.stat().st_size) is None
@@ -1,4 +1,6 @@
+import copy
 import os
+import re
 import pandas as pd
 import numpy as np
 
@@ -51,3 +53,92 @@ def transform_ppe_data(ppe_data, save_to_excel=False, folder='.', excel_filename
         new_df.to_csv(f'{folder}/{csv_filename}', index=False)
 
     return new_df
+
+
+def make_linked_data(n_rows=200000, seed=0, companies=None):
+    """
+    Builds a synthetic linked outage/PP&E dataset with the object and int64 dtypes of the prepared CSV file.
+
+    Parameters:
+        n_rows (int, optional): The number of rows; defaults to 200000.
+        seed (int, optional): The random seed; defaults to 0.
+        companies (list, optional): The company names; defaults to the names the dashboard resolves (`company_aliases_2`).
+    """
+    from config.config import company_aliases_2
+    rng = np.random.default_rng(seed)
+    companies = np.array(sorted(company_aliases_2) if companies is None else companies)
+    return pd.DataFrame({
+        'Company': companies[rng.integers(0, len(companies), n_rows)].astype(object),
+        'Year': rng.integers(2015, 2024, n_rows),
+        'Quarter': np.array(['Q1', 'Q2', 'Q3', 'Q4'], dtype=object)[rng.integers(0, 4, n_rows)],
+        'Count': rng.integers(0, 500, n_rows),
+        'PP&E': rng.uniform(1e3, 1e6, n_rows),
+    })
+
+
+def make_outage_data(n_rows, seed=0, start_year=2016, end_year=2023):
+    """
+    Builds synthetic NORS outage records with the columns the outage processor reads.
+
+    Most company names are aliases from `company_aliases`; some are unknown, and some reports are not final, so the
+    filters drop rows as they do on real exports.
+    """
+    from config.config import company_aliases
+    rng = np.random.default_rng(seed)
+    companies = np.array(list(company_aliases) + ['UNKNOWN CARRIER'])
+    days = rng.integers(0, (pd.Timestamp(f'{end_year}-12-31') - pd.Timestamp(f'{start_year}-01-01')).days + 1, n_rows)
+    dates = pd.Timestamp(f'{start_year}-01-01') + pd.to_timedelta(days, unit='D') + pd.to_timedelta(rng.integers(0, 86400, n_rows), unit='s')
+    return pd.DataFrame({
+        'u_legacy_smartcode_outage_id': rng.integers(100000, 999999, n_rows),
+        'u_outage_report_status': np.where(rng.random(n_rows) < 0.8, 'Final', 'Pending'),
+        'u_company': companies[rng.integers(0, len(companies), n_rows)],
+        'u_incident_date_time': dates.strftime('%Y-%m-%d %H:%M:%S'),
+        'u_incident_description': 'Random incident, "quoted" description',
+    })
+
+
+def parse_metrics(text):
+    """ Returns the samples of a Prometheus text exposition as {(name, labels): value}. """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = re.fullmatch(r'(\w+)\{(.*)\} (\S+)', line)
+        assert match, line
+        labels = tuple(sorted(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2))))
+        samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def metrics_sample(samples, name, **labels):
+    """ Returns the value of a sample of this process, as labelled by `CallbackMetrics`. """
+    labels = tuple(sorted({'pid': str(os.getpid()), **{key: str(value) for key, value in labels.items()}}.items()))
+    return samples[(name, labels)]
+
+
+def apply_patch(figure, patch):
+    """ Applies the operations of a serialized dash.Patch the way the browser does. """
+    figure = copy.deepcopy(figure)
+    for operation in patch['operations']:
+        *path, last = operation['location']
+        target = figure
+        for key in path:
+            target = target[key]
+        value = operation['params'].get('value')
+        if operation['operation'] == 'Assign':
+            target[last] = value
+        elif operation['operation'] == 'Extend':
+            target[last].extend(value)
+        elif operation['operation'] == 'Append':
+            target[last].append(value)
+        elif operation['operation'] == 'Remove':
+            target[last].remove(value)
+        elif operation['operation'] == 'Delete':
+            del target[last]
+        else:
+            raise ValueError(f"Unexpected patch operation {operation['operation']}")
+    return figure
+
+
+def is_patch(figure):
+    return 'operations' in figure
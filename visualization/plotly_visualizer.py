@@ -1,43 +1,158 @@
+import functools
+import hashlib
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 import pandas as pd
-import plotly.express as px
+import plotly.colors
 import plotly.graph_objects as go
 import numpy as np
 from data_prep import find_encoding
 from .vishelp.vis_preprocess import VisualizationPreprocessor
 from .vishelp.stats_helper import StatsHelper
+from .vishelp.fit_cache import FitCache, canonical_filter_state
+from .vishelp.downsample import downsample_series
+
+# Everything derived from one load of the data. A snapshot is never modified after it is published, so readers holding
+# one always see a consistent state while a reload builds the next one.
+DataSnapshot = namedtuple('DataSnapshot', ['df', 'vp', 'sh', 'version', 'fingerprint'])
+
+
+def _on_snapshot(method):
+    """ Runs a method on a single data snapshot, even if a reload swaps in a new one while it runs. """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.pinned_snapshot():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class PlotlyVisualizer:
-    def __init__(self, filename='prepared_data.csv', directory='datasets'):
+    # Company label of the box plot combining all selected companies
+    GRAND_TOTAL_LABEL = 'All Companies'
+
+    # Number of traces each overlay adds; overlays are always drawn after the traces of the underlying plot
+    OVERLAY_TRACE_COUNTS = {'average': 2, 'granular': 3, 'grand_total': 1}
+
+    def __init__(self, filename='prepared_data.csv', directory='datasets', fit_cache_size=128, fit_cache_ttl=600,
+                 webgl_threshold=1000, max_points_per_series=1000, data=None):
         """
         Initializes the PlotlyVisualizer with a specific data file and directory.
 
         Parameters:
             filename (str): The name of the CSV file containing the data. Default is 'prepared_data.csv'.
             directory (str): The directory where the data file is located. Default is 'datasets'.
+            fit_cache_size (int): The number of model fits memoized across callbacks. Default is 128; 0 disables it.
+            fit_cache_ttl (float): Seconds a memoized fit stays valid. Default is 600; None never expires.
+            webgl_threshold (int): Point count above which scatter and line plots are drawn with WebGL. Default is 1000.
+            max_points_per_series (int): Points per company above which time series are downsampled with LTTB. Default is 1000.
+            data (DataFrame): Linked data already in memory, e.g. from `DataPreparer.get_data()`. When given, it is
+                used instead of reading the CSV file.
 
         Loads the data and sets default colors for plotting.
         """
         self.directory = directory
         self.filename = filename
-        self.load_data()
+        self.fit_cache = FitCache(fit_cache_size, fit_cache_ttl)
+        self.webgl_threshold = webgl_threshold
+        self.max_points_per_series = max_points_per_series
+        self.__snapshot = None
+        self.__pinned = threading.local()
+        self.__reload_lock = threading.Lock()
+        self.load_data(data)
         self.colors = ['#636EFA', '#EF553B', '#00CC96', '#AB63FA', '#FFA15A', '#19D3F3', '#FF6692', '#B6E880', '#FF97FF', '#FECB52']
         
-    def load_data(self):
+    def load_data(self, data=None):
         """
-        Loads data from a CSV file located at the specified directory and filename.
+        Loads data from a CSV file located at the specified directory and filename, or from linked data in memory.
+
+        The data is preprocessed and indexed into a new snapshot, which then replaces the current one in a single
+        assignment, so callbacks running meanwhile keep using the snapshot they started with. If the contents are
+        unchanged, the current snapshot is kept.
+
+        Each new snapshot bumps the dataset version, and its content fingerprint keys memoized model fits and figures
+        cached across restarts. Linked data in memory and the same data read back from the CSV file get the same
+        fingerprint, so server workers that loaded it either way agree on it.
+
+        Parameters:
+            data (DataFrame, optional): Linked data to load instead of the CSV file. It is copied, not modified.
+
+        Returns:
+            bool: True if a new snapshot was swapped in.
+        """
+        with self.__reload_lock:
+            if data is not None:
+                # Indexed like data read back from the CSV file, so both get the same fingerprint
+                df = data.reset_index(drop=True)
+            else:
+                csv_path = f'{self.directory}/{self.filename}'
+                # Floats are parsed exactly, so the data matches what was saved and gets the same fingerprint
+                df = pd.read_csv(csv_path, encoding=find_encoding(csv_path), float_precision='round_trip')
+            vp = VisualizationPreprocessor(df)
+            df = vp.preprocess_data(df)
+            df = vp.build_index(df)
+            fingerprint = hashlib.sha256(pd.util.hash_pandas_object(df).to_numpy().tobytes()).hexdigest()
+
+            current = self.__snapshot
+            if current is not None and current.fingerprint == fingerprint:
+                return False
+            sh = StatsHelper(df, cache=self.fit_cache, version=fingerprint)
+            version = current.version + 1 if current is not None else 1
+            self.__snapshot = DataSnapshot(df, vp, sh, version, fingerprint)
+            return True
+
+    def update_data(self, data=None):
         """
-        csv_path = f'{self.directory}/{self.filename}'
-        self.df = pd.read_csv(csv_path, encoding=find_encoding(csv_path))
-        self.vp = VisualizationPreprocessor(self.df)
-        self.df = self.vp.preprocess_data(self.df)
-        self.sh = StatsHelper(self.df)
+        Reloads the data from the source file, or from linked data in memory, to reflect any updates or changes.
 
-    def update_data(self):
+        Returns:
+            bool: True if the data changed and a new snapshot was swapped in.
         """
-        Reloads the data from the source file to reflect any updates or changes to the file.
+        return self.load_data(data)
+
+    @property
+    def snapshot(self):
+        """ The data snapshot pinned by the current thread, or else the latest one. """
+        return getattr(self.__pinned, 'snapshot', None) or self.__snapshot
+
+    @contextmanager
+    def pinned_snapshot(self):
         """
-        self.load_data() 
+        Pins the current data snapshot for the calling thread, so every access in the block sees the same data.
 
+        Yields:
+            DataSnapshot: The pinned snapshot.
+        """
+        previous = getattr(self.__pinned, 'snapshot', None)
+        self.__pinned.snapshot = previous or self.__snapshot
+        try:
+            yield self.__pinned.snapshot
+        finally:
+            self.__pinned.snapshot = previous
+
+    @property
+    def df(self):
+        return self.snapshot.df
+
+    @property
+    def vp(self):
+        return self.snapshot.vp
+
+    @property
+    def sh(self):
+        return self.snapshot.sh
+
+    @property
+    def data_version(self):
+        """ Increases by one every time different data is loaded. """
+        return self.snapshot.version
+
+    @property
+    def data_fingerprint(self):
+        """ A hash of the loaded data's contents. """
+        return self.snapshot.fingerprint
+
+    @_on_snapshot
     def plot_average_outage_vs_ppe(self, interval_percent=95, enable_interval=False, dashboard=False, selected_companies=None, start_date=None, end_date=None):
         """
         Plots average outage vs. PP&E with optional confidence intervals.
@@ -53,12 +168,10 @@ class PlotlyVisualizer:
         Returns:
             plotly.graph_objs.Figure: The figure object with the plotted data, if dashboard is True.
         """
-        # Filters the data by company, start date, and end date
-        df_filtered = self.vp.filter_dataframe(self.df, selected_companies, start_date, end_date)
-
-        # Aggregates the data by Company and gives average PP&E and average outage count
-        grouped_df = self.vp.group_and_aggregate(df_filtered)
-        slope, intercept, r_value, _, std_err, line_x, line_y = self.sh.perform_regression(grouped_df)
+        # Aggregates the data of the selected companies and date range by Company, giving average PP&E and average outage count
+        grouped_df = self.vp.aggregate_between(self.df, selected_companies, start_date, end_date)
+        fit_key = ('average',) + canonical_filter_state(selected_companies, start_date, end_date)
+        slope, intercept, r_value, _, std_err, line_x, line_y = self.sh.perform_regression(grouped_df, key=fit_key)
 
         # Creates a scatter plot and then adds in regression line
         fig = self.__create_scatter_plot(grouped_df, interval=enable_interval)
@@ -66,14 +179,15 @@ class PlotlyVisualizer:
 
         # Draws confidence intervals if enable_ci is True
         if enable_interval:
-            ci_upper, ci_lower = self.sh.calculate_confidence_interval(grouped_df, interval_percent, std_err, line_x, line_y)
-            self.__add_confidence_intervals(fig, line_x, ci_upper, ci_lower)
+            ci_upper, ci_lower = self.sh.calculate_confidence_interval(grouped_df, interval_percent, std_err, line_x, line_y, key=fit_key)
+            fig.add_traces(self.__confidence_interval_traces(line_x, ci_upper, ci_lower))
 
         if dashboard:
             return fig
         fig.show()
 
 
+    @_on_snapshot
     def plot_granular_outage_vs_ppe(self, enable_interval=False, dashboard=False, selected_companies=None, start_date=None, end_date=None):
         """
         Plots granular outage vs. PP&E with options for prediction intervals.
@@ -96,21 +210,18 @@ class PlotlyVisualizer:
         line_x = np.linspace(df_filtered['PP&E'].min(), df_filtered['PP&E'].max(), 100)
         x = pd.DataFrame(line_x, columns=["PP&E"])
 
-        # Using quantile regression for the median and the quantile intervals
-        line_y_50, slope, intercept = self.sh.perform_quantile_regression(df_filtered, 0.50, x)
-        line_y_95,slope95, intercept95  = self.sh.perform_quantile_regression(df_filtered, 0.95, x)
-        line_y_05, slope5, intercept5= self.sh.perform_quantile_regression(df_filtered, 0.05, x)
+        # Using quantile regression for the median and the quantile intervals, fitted together in one batch
+        fit_key = ('granular',) + canonical_filter_state(selected_companies, start_date, end_date)
+        fits = self.sh.perform_quantile_regressions(df_filtered, (0.05, 0.50, 0.95), x, key=fit_key)
+        line_y_50, slope, intercept = fits[0.50]
         
         # Creates a scatter plot and plots data points
         fig = self.__create_scatter_plot(df_filtered, interval=enable_interval)
         self.__create_regression_line(fig=fig, intercept=intercept, line_x=line_x,line_y=line_y_50,slope=slope, r_value=None)
 
-        # If the interval box is checked, add in the 95th and 5th quantile lines.
+        # If the interval box is checked, add in the 95th and 5th quantile lines and mark the points above the 95th as outliers.
         if enable_interval:
-            self.__add_quantile_lines(fig, line_x, line_y_95, line_y_05, slope95, intercept95, slope5, intercept5)
-
-            # This marks any point above the 95th as outliers
-            self.__mark_outliers(df=df_filtered,fig=fig,line_x=line_x,line_y_95=line_y_95)
+            fig.add_traces(self.__granular_interval_traces(df_filtered, line_x, fits))
 
         # Updates company colors
         fig.update_layout(colorway=self.colors)
@@ -122,15 +233,20 @@ class PlotlyVisualizer:
 
 
 
-    def plot_outage_per_ppe_over_time(self, show_percentiles=True, dashboard=False, selected_companies=None, start_date=None, end_date=None):
+    @_on_snapshot
+    def plot_outage_per_ppe_over_time(self, show_percentiles=True, dashboard=False, selected_companies=None, start_date=None, end_date=None, x_range=None):
         """
         Plots outage per PP&E over time, optionally showing percentiles.
 
+        Series longer than `max_points_per_series` are downsampled with LTTB. When `x_range` is given, only the
+        visible part of each series is downsampled, so zooming in shows more detail.
+
         Parameters:
             show_percentiles (bool): Whether to display percentiles on the plot.
             dashboard (bool): Controls whether to return the plot or show it.
             selected_companies (list): Filter data by these companies.
             start_date (str), end_date (str): Date range for filtering data.
+            x_range (list): The visible [start, end] dates when zoomed in; the x axis is set to it.
 
         Returns:
             plotly.graph_objs.Figure: The generated figure, if dashboard is True.
@@ -139,13 +255,19 @@ class PlotlyVisualizer:
         # Filters the data by company, start date, and end date
         df_filtered = self.vp.filter_dataframe(self.df, selected_companies, start_date, end_date)
 
-        # Creates a line chart of Outages per PP&E over time
-        fig = self.__create_outage_time_plot(df_filtered)
+        # Creates a line chart of Outages per PP&E over time, downsampling long series to the visible range
+        df_plot = df_filtered
+        if x_range is not None or self.__has_long_series(df_filtered):
+            df_plot = downsample_series(df_filtered, 'Date', 'Outage per PP&E', 'Company', self.max_points_per_series, x_range)
+        fig = self.__create_outage_time_plot(df_plot)
 
-        # Adds in median, quartile, 95th percentile, and 5th percentile lines
+        # Adds in median, quartile, 95th percentile, and 5th percentile lines, computed from all the data
         if show_percentiles:
             self.__plot_percentiles(df_filtered, fig)
 
+        if x_range is not None:
+            fig.update_xaxes(range=x_range)
+
         fig.update_layout(colorway=self.colors)
 
         if dashboard:
@@ -154,6 +276,7 @@ class PlotlyVisualizer:
         fig.show()
 
 
+    @_on_snapshot
     def plot_outage_per_ppe_boxplot(self, include_grand_total=False, dashboard=False, selected_companies = None,start_date=None,end_date=None):
         """
         Creates a box plot for outage per PP&E across selected companies.
@@ -170,18 +293,15 @@ class PlotlyVisualizer:
         # Filters the data by company, start date, and end date
         df_filtered = self.vp.filter_dataframe(self.df, selected_companies, start_date, end_date)
 
-        # Controls whether to include a boxplot that is an aggreagate of all company data
-        data = self.vp.grand_total(include_grand_total=include_grand_total, df=df_filtered)
+        # Generate boxplots to visualize 'Outage per PP&E' data, with each boxplot grouped and labeled by company.
+        fig = self.__create_boxplot(df_filtered)
 
-        # Rounds Outage Per PP&E
-        data['Outage per PP&E Rounded'] = data['Outage per PP&E'].round(1)
+        # Controls whether to include a boxplot that is an aggreagate of all company data
+        if include_grand_total:
+            fig.add_traces(self.grand_total_traces(selected_companies, start_date, end_date, trace_offset=len(fig.data)))
+            if fig.layout.xaxis.categoryarray is not None:
+                fig.update_xaxes(categoryarray=list(fig.layout.xaxis.categoryarray) + [self.GRAND_TOTAL_LABEL])
 
-        # Generate boxplots to visualize 'Outage per PP&E' data, with each boxplot grouped and labeled by company.
-        fig = px.box(data, x='Company', y='Outage per PP&E', color='Company', points="all",
-                    title='Outage per PP&E by Company',
-                    hover_data={'Outage per PP&E': ':.2f',  
-                                'Outage per PP&E Rounded': True})  
- 
         fig.update_layout(colorway=self.colors)
 
         if dashboard:
@@ -189,7 +309,98 @@ class PlotlyVisualizer:
         
         fig.show()
 
-    def __add_quantile_lines(self, fig, line_x, upper, lower, slope95, intercept95, slope5, intercept5):
+    @_on_snapshot
+    def average_interval_traces(self, interval_percent=95, selected_companies=None, start_date=None, end_date=None):
+        """
+        Builds the confidence interval traces drawn over the aggregated view when intervals are enabled.
+
+        The traces are appended after the scatter and regression line traces, so they can also be sent on their own
+        to add the intervals to a figure already displayed.
+
+        Returns:
+            list: The upper and lower confidence interval traces.
+        """
+        grouped_df = self.vp.aggregate_between(self.df, selected_companies, start_date, end_date)
+        fit_key = ('average',) + canonical_filter_state(selected_companies, start_date, end_date)
+        _, _, _, _, std_err, line_x, line_y = self.sh.perform_regression(grouped_df, key=fit_key)
+        ci_upper, ci_lower = self.sh.calculate_confidence_interval(grouped_df, interval_percent, std_err, line_x, line_y, key=fit_key)
+        return self.__confidence_interval_traces(line_x, ci_upper, ci_lower)
+
+    @_on_snapshot
+    def granular_interval_traces(self, selected_companies=None, start_date=None, end_date=None):
+        """
+        Builds the 95th and 5th quantile lines and the outlier markers drawn over the granular view when intervals are enabled.
+
+        Returns:
+            list: The upper and lower quantile line traces and the outlier trace.
+        """
+        df_filtered = self.vp.filter_dataframe(self.df, selected_companies, start_date, end_date)
+        line_x = np.linspace(df_filtered['PP&E'].min(), df_filtered['PP&E'].max(), 100)
+        x = pd.DataFrame(line_x, columns=["PP&E"])
+        fit_key = ('granular',) + canonical_filter_state(selected_companies, start_date, end_date)
+        fits = self.sh.perform_quantile_regressions(df_filtered, (0.05, 0.50, 0.95), x, key=fit_key)
+        return self.__granular_interval_traces(df_filtered, line_x, fits)
+
+    @_on_snapshot
+    def grand_total_traces(self, selected_companies=None, start_date=None, end_date=None, trace_offset=0):
+        """
+        Builds the box plot trace of all selected companies combined.
+
+        It is appended after the company traces and placed last on the x axis, labeled `GRAND_TOTAL_LABEL`.
+
+        Parameters:
+            trace_offset (int): The number of company traces before it, which determines its color.
+
+        Returns:
+            list: The grand total box plot trace.
+        """
+        df_filtered = self.vp.filter_dataframe(self.df, selected_companies, start_date, end_date)
+        traces = list(self.__create_boxplot(df_filtered.assign(Company=self.GRAND_TOTAL_LABEL)).data)
+        colors = plotly.colors.qualitative.Plotly
+        for trace in traces:
+            trace.marker.color = colors[trace_offset % len(colors)]
+        return traces
+
+    @_on_snapshot
+    def is_downsampled(self, selected_companies=None, start_date=None, end_date=None):
+        """
+        Returns whether any selected company has more points than `max_points_per_series` in the date range, i.e.
+        whether its time series is downsampled and zooming in would reveal more detail.
+        """
+        return self.__has_long_series(self.vp.filter_dataframe(self.df, selected_companies, start_date, end_date))
+
+    def __has_long_series(self, df):
+        return bool((df.groupby('Company', observed=True).size() > self.max_points_per_series).any())
+
+    @staticmethod
+    def scatter_title(interval):
+        """
+        Returns the title of the outage vs. PP&E scatter plots, which depends on whether intervals are shown.
+        """
+        if interval:
+            return 'Outage Frequency vs. PP&E by Company'
+        return 'Average Outage Frequency vs. Average PP&E by Company'
+
+    def __granular_interval_traces(self, df, line_x, fits):
+        line_y_95, slope95, intercept95 = fits[0.95]
+        line_y_05, slope5, intercept5 = fits[0.05]
+        traces = self.__quantile_line_traces(line_x, line_y_95, line_y_05, slope95, intercept95, slope5, intercept5)
+        traces.append(self.__outlier_trace(df, line_x, line_y_95))
+        return traces
+
+    # plotly.express is imported on first use: it loads a large set of templates and data modules that
+    # scripts importing the visualizer without plotting never need
+    def __create_boxplot(self, df):
+        import plotly.express as px
+        # Rounds Outage Per PP&E
+        data = df.assign(**{'Outage per PP&E Rounded': df['Outage per PP&E'].round(1)})
+
+        return px.box(data, x='Company', y='Outage per PP&E', color='Company', points="all",
+                    title='Outage per PP&E by Company',
+                    hover_data={'Outage per PP&E': ':.2f',
+                                'Outage per PP&E Rounded': True})
+
+    def __quantile_line_traces(self, line_x, upper, lower, slope95, intercept95, slope5, intercept5):
         # Creates Hover Info
         equation_text95 = f'Equation:<br>{slope95:.2f} * PP&E + {intercept95:.2f}'
         hover_text95 = [f"{equation_text95}<br>Predicted Outage Freq (Upper Bound):<br>{y:.1f}" for y in upper]
@@ -197,7 +408,7 @@ class PlotlyVisualizer:
         hover_text5 = [f"{equation_text5}<br>Predicted Outage Freq (Lower Bound):<br>{y:.1f}" for y in lower]
 
         # Draws the upper and lower quantile regression lines
-        fig.add_trace(go.Scatter(
+        return [go.Scatter(
             x=line_x,
             y=upper,
             mode='lines',
@@ -206,8 +417,7 @@ class PlotlyVisualizer:
             text=hover_text95,
             hoverinfo='text',
             showlegend=True
-        ))
-        fig.add_trace(go.Scatter(
+        ), go.Scatter(
             x=line_x,
             y=lower,
             mode='lines',
@@ -218,15 +428,13 @@ class PlotlyVisualizer:
             text=hover_text5,
             hoverinfo='text',
             showlegend=True
-        ))
+        )]
 
 
     def __create_scatter_plot(self, df, interval=False):
+        import plotly.express as px
         # Sets title depending on whether or not data is aggregated
-        if interval:
-            title = 'Outage Frequency vs. PP&E by Company'
-        else:
-            title = 'Average Outage Frequency vs. Average PP&E by Company'
+        title = self.scatter_title(interval)
         
         # Creates a scatterplot and plots the data
         fig = px.scatter(
@@ -237,6 +445,7 @@ class PlotlyVisualizer:
             size='Outage per PP&E', 
             title=title,
             opacity=.8,
+            render_mode=self.__render_mode(df),
             hover_data={
                 'PP&E': ':.2f',
                 'Count': ':.2f',
@@ -267,9 +476,9 @@ class PlotlyVisualizer:
                 hoverinfo='text'
             ))
 
-    def __add_confidence_intervals(self, fig, line_x, upper, lower):
-        # Add upper confidence interval line
-        fig.add_trace(go.Scatter(
+    def __confidence_interval_traces(self, line_x, upper, lower):
+        # Upper confidence interval line
+        upper_trace = go.Scatter(
             x=line_x,
             y=upper,
             mode='lines',
@@ -278,10 +487,10 @@ class PlotlyVisualizer:
             line=dict(color='rgba(255, 0, 0, 0.5)', dash='dash'),  # Red dashed line
             hovertemplate='Upper Confidence Interval<br>PP&E: %{x:.2f}<br>Outage Count: %{y:.2f}<extra></extra>',  # Custom hover template
             showlegend=True
-        ))
+        )
 
-        # Add lower confidence interval line
-        fig.add_trace(go.Scatter(
+        # Lower confidence interval line
+        lower_trace = go.Scatter(
             x=line_x,
             y=lower,
             mode='lines',
@@ -292,10 +501,17 @@ class PlotlyVisualizer:
             fillcolor='rgba(0, 255, 0, 0.1)',  # Light green fill
             hovertemplate='Lower Confidence Interval<br>PP&E: %{x:.2f}<br>Outage Count: %{y:.2f}<extra></extra>',  # Custom hover template
             showlegend=True
-        ))
+        )
+        return [upper_trace, lower_trace]
 
     def __create_outage_time_plot(self, df):
-        return px.line(df, x='Date', y='Outage per PP&E', color='Company', markers=True, title='Outage per PP&E by Company Over Time')
+        import plotly.express as px
+        return px.line(df, x='Date', y='Outage per PP&E', color='Company', markers=True, title='Outage per PP&E by Company Over Time',
+                       render_mode=self.__render_mode(df))
+
+    def __render_mode(self, df):
+        # WebGL keeps large plots responsive; small ones stay SVG for crisp, fully vectorized output
+        return 'webgl' if len(df) > self.webgl_threshold else 'svg'
 
     def __plot_percentiles(self, df, fig):
         # Percentiles
@@ -324,7 +540,7 @@ class PlotlyVisualizer:
                 text=hover_text
             ))
 
-    def __mark_outliers(self, fig, df, line_x, line_y_95):
+    def __outlier_trace(self, df, line_x, line_y_95):
             # Identify points above the upper prediction interval line
             points_above_upper = df[df['Count'] > np.interp(df['PP&E'], line_x, line_y_95)]
             hover_text_outliers = [
@@ -337,8 +553,8 @@ class PlotlyVisualizer:
                     )
             ]
 
-            # Add these points as a separate trace
-            fig.add_trace(go.Scatter(
+            # These points are drawn as a separate trace
+            return go.Scatter(
                 x=points_above_upper['PP&E'],
                 y=points_above_upper['Count'],
                 mode='markers',
@@ -347,4 +563,4 @@ class PlotlyVisualizer:
                 text=hover_text_outliers,
                 hoverinfo='text',
                 showlegend=True
-            ))
\ No newline at end of file
+            )
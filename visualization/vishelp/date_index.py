@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+class CompanyDateIndex:
+    """
+    In-memory index over the visualization data for fast company and date-range queries.
+
+    The data is sorted by company and date, so each company occupies a contiguous block of rows whose dates are
+    sorted. Date ranges are located with a binary search inside each block, and per-company means are computed from
+    prefix sums, so an aggregated query costs O(companies * log n) instead of a full scan.
+
+    Attributes:
+        df (DataFrame): The indexed data, sorted by 'Company' and 'Date'.
+        value_columns (list): The columns with prefix sums.
+    """
+    def __init__(self, df, value_columns=('Count', 'PP&E', 'Outage per PP&E')):
+        """
+        Builds the index.
+
+        Parameters:
+            df (DataFrame): Data with a categorical 'Company' column and a 'Date' column.
+            value_columns (tuple, optional): Columns to build prefix sums for; defaults to the plotted measures.
+        """
+        self.df = df.sort_values(['Company', 'Date'], kind='stable', na_position='last')
+        self.value_columns = list(value_columns)
+        self.__categories = self.df['Company'].cat.categories
+        self.__dates = self.df['Date'].to_numpy()
+
+        # Row range of each company block, keyed by category code (-1 holds rows without a company)
+        codes = self.df['Company'].cat.codes.to_numpy()
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1])
+        ends = np.concatenate([starts[1:], [len(codes)]])
+        self.__blocks = {int(codes[start]): (start, end) for start, end in zip(starts, ends)}
+
+        # Prefix sums of each measure, skipping NaN like DataFrame.mean does
+        self.__sums = {}
+        self.__counts = {}
+        for col in self.value_columns:
+            values = self.df[col].to_numpy(dtype='float64')
+            valid = ~np.isnan(values)
+            self.__sums[col] = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+            self.__counts[col] = np.concatenate([[0], np.cumsum(valid)])
+
+    def row_ranges(self, selected_companies=None, start_date=None, end_date=None):
+        """
+        Locates the rows of the selected companies between two dates (inclusive).
+
+        Parameters:
+            selected_companies (list, optional): Company names to include; defaults to all companies.
+            start_date, end_date (str or datetime, optional): The date range; open-ended when not given.
+
+        Returns:
+            list: (category code, first row, end row) tuples in index order, one per selected company.
+        """
+        if selected_companies is None:
+            codes = self.__blocks.keys()
+        else:
+            codes = set(self.__categories.get_indexer([c for c in selected_companies if not pd.isna(c)]))
+            codes.discard(-1)
+            if any(pd.isna(c) for c in selected_companies):
+                codes.add(-1)
+        start = None if start_date is None else np.datetime64(pd.to_datetime(start_date), 'ns')
+        end = None if end_date is None else np.datetime64(pd.to_datetime(end_date), 'ns')
+
+        ranges = []
+        for code in sorted(codes, key=lambda c: (c == -1, c)):
+            if code not in self.__blocks:
+                continue
+            lo, hi = self.__blocks[code]
+            dates = self.__dates[lo:hi]
+            first = lo + (np.searchsorted(dates, start, side='left') if start is not None else 0)
+            last = lo + (np.searchsorted(dates, end, side='right') if end is not None else hi - lo)
+            ranges.append((code, first, last))
+        return ranges
+
+    def slice(self, selected_companies=None, start_date=None, end_date=None):
+        """
+        Returns the rows of the selected companies between two dates, in index order.
+        """
+        ranges = self.row_ranges(selected_companies, start_date, end_date)
+        positions = np.concatenate([np.arange(first, last) for _, first, last in ranges] or [np.array([], dtype=int)])
+        return self.df.take(positions)
+
+    def aggregate(self, selected_companies=None, start_date=None, end_date=None):
+        """
+        Computes the mean of each measure per company between two dates from the prefix sums.
+
+        Returns:
+            DataFrame: One row per company with data in the range, with the same layout as a groupby mean.
+        """
+        rows = [(code, first, last) for code, first, last in self.row_ranges(selected_companies, start_date, end_date)
+                if last > first and code != -1]
+        codes = np.array([code for code, _, _ in rows], dtype=int)
+        firsts = np.array([first for _, first, _ in rows], dtype=int)
+        lasts = np.array([last for _, _, last in rows], dtype=int)
+
+        result = pd.DataFrame({'Company': pd.Categorical.from_codes(codes, categories=self.__categories)})
+        for col in self.value_columns:
+            totals = self.__sums[col][lasts] - self.__sums[col][firsts]
+            counts = self.__counts[col][lasts] - self.__counts[col][firsts]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[col] = np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+        return result
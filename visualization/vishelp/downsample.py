@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Selects the points of a series to keep with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always kept. The points in between are split into equal buckets, and from each
+    bucket the point forming the largest triangle with the previously kept point and the average of the next bucket
+    is kept, which preserves peaks and the overall shape of the series.
+
+    Parameters:
+        x (array-like): The x values, sorted ascending.
+        y (array-like): The y values.
+        max_points (int): The number of points to keep.
+
+    Returns:
+        ndarray: The positions of the kept points, ascending.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    edges = (np.floor(np.arange(max_points - 1) * (n - 2) / (max_points - 2)) + 1).astype(int)
+    edges[-1] = n - 1
+    kept = np.empty(max_points, dtype=int)
+    kept[0] = 0
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(np.where(np.isnan(area), -1, area)))
+        kept[bucket + 1] = previous
+    kept[-1] = n - 1
+    return kept
+
+
+def downsample_series(df, x_col, y_col, group_col, max_points, x_range=None):
+    """
+    Downsamples each series of a long-format DataFrame with LTTB, optionally restricted to a visible x range.
+
+    When a range is given, one point on each side of it is kept so lines run to the edges of the view.
+
+    Parameters:
+        df (DataFrame): The data, sorted by `x_col` within each group.
+        x_col (str): The column on the x axis; datetimes are supported.
+        y_col (str): The column on the y axis.
+        group_col (str): The column identifying each series.
+        max_points (int): The maximum number of points kept per series.
+        x_range (list, optional): The visible [start, end] of the x axis.
+
+    Returns:
+        DataFrame: The kept rows, in their original order.
+    """
+    x_values = df[x_col]
+    if pd.api.types.is_datetime64_any_dtype(x_values):
+        x_values = x_values.astype('int64')
+        if x_range is not None:
+            x_range = [pd.Timestamp(bound).value for bound in x_range]
+    x_values = x_values.to_numpy(dtype='float64')
+    y_values = df[y_col].to_numpy(dtype='float64')
+
+    positions = []
+    for rows in df.groupby(group_col, observed=True, sort=False).indices.values():
+        if x_range is not None:
+            first = max(np.searchsorted(x_values[rows], x_range[0], side='left') - 1, 0)
+            last = min(np.searchsorted(x_values[rows], x_range[1], side='right') + 1, len(rows))
+            rows = rows[first:last]
+        positions.append(rows[lttb_indices(x_values[rows], y_values[rows], max_points)])
+    positions = np.sort(np.concatenate(positions)) if positions else np.array([], dtype=int)
+    return df.iloc[positions]
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class FitCache:
+    """
+    A bounded in-memory cache of model fits with least-recently-used eviction and a time to live.
+
+    Attributes:
+        max_entries (int): The maximum number of fits kept.
+        ttl (float): Seconds after which a fit expires; None keeps fits until they are evicted.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that required a fit.
+    """
+    def __init__(self, max_entries=128, ttl=600):
+        """
+        Parameters:
+            max_entries (int, optional): The maximum number of fits kept; defaults to 128. 0 disables caching.
+            ttl (float, optional): Seconds after which a fit expires; defaults to 600.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached result for a key, calling `compute()` and caching its result on a miss.
+
+        Parameters:
+            key (tuple): A hashable key identifying the fit.
+            compute (callable): Computes the result when it is not cached.
+
+        Returns:
+            The cached or computed result.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] <= self.ttl):
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        result = compute()
+        if self.max_entries > 0:
+            with self.__lock:
+                self.__entries[key] = (now, result)
+                self.__entries.move_to_end(key)
+                while len(self.__entries) > self.max_entries:
+                    self.__entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """ Removes all cached fits; the hit and miss counters are kept. """
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self):
+        """
+        Returns the cache counters, for sizing the cache.
+
+        Returns:
+            dict: 'hits', 'misses', 'hit_rate', 'entries' and 'max_entries'.
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'entries': len(self.__entries), 'max_entries': self.max_entries}
+
+
+def canonical_filter_state(selected_companies=None, start_date=None, end_date=None):
+    """
+    Normalizes dashboard filter inputs so equivalent selections produce the same cache key.
+
+    Company order and duplicates are ignored, and dates given as strings or timestamps are normalized to ISO format.
+
+    Returns:
+        tuple: The sorted company names (None for all companies) and the normalized start and end dates.
+    """
+    companies = None if selected_companies is None else tuple(sorted(set(map(str, selected_companies))))
+    dates = tuple(None if date is None else pd.Timestamp(date).isoformat() for date in (start_date, end_date))
+    return (companies,) + dates
@@ -0,0 +1,47 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+@contextmanager
+def collect_phases():
+    """
+    Collects the time the calling thread spends in each timed phase within the block.
+
+    Yields:
+        dict: Seconds spent per phase name, filled in as the phases finish.
+    """
+    previous = getattr(_local, 'phases', None)
+    phases = {}
+    _local.phases = phases
+    try:
+        yield phases
+    finally:
+        _local.phases = previous
+
+
+def timed_phase(name):
+    """
+    Returns a decorator that adds the time spent in a function to the named phase while phases are being collected.
+
+    Only the outermost timed call counts, so a timed function calling another one is not counted twice. Outside of
+    `collect_phases` the function is called directly.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            phases = getattr(_local, 'phases', None)
+            if phases is None or getattr(_local, 'timing', False):
+                return func(*args, **kwargs)
+            _local.timing = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _local.timing = False
+                phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+        return wrapper
+    return decorator
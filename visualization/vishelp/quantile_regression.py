@@ -0,0 +1,89 @@
+import warnings
+
+import numpy as np
+
+
+def fit_quantile_lines(x, y, quantiles, max_iter=5000, p_tol=1e-8):
+    """
+    Fits the linear quantile regression `y ~ x` for several quantiles at once.
+
+    The design matrix is built once and every quantile is solved in the same vectorized loop of iteratively
+    reweighted least squares, using the update, residual clipping and stopping rules of statsmodels' QuantReg. Unlike
+    QuantReg, x is standardized before fitting: with raw PP&E values in the millions, X'X is so ill-conditioned that
+    the iterations often stop far from the optimum. Where `smf.quantreg(...).fit(q=...)` does converge, the estimates
+    agree with it to within 2e-3 relative, as the check loss is nearly flat around the optimum; elsewhere they reach a
+    lower check loss. Rows where x or y is missing are dropped, as patsy does.
+
+    Parameters:
+        x (array-like): The predictor values.
+        y (array-like): The response values.
+        quantiles (iterable): The quantiles to fit, each strictly between 0 and 1.
+        max_iter (int, optional): The maximum number of iterations per quantile; defaults to 5000.
+        p_tol (float, optional): The convergence tolerance on the parameters of the standardized fit, i.e. the
+            intercept at the mean of x and the slope per standard deviation of x; defaults to 1e-8.
+
+    Returns:
+        tuple: Arrays of the intercepts and slopes, in the order of `quantiles`.
+
+    Raises:
+        ValueError: If a quantile is not strictly between 0 and 1 or there is no data to fit.
+    """
+    q = np.asarray(list(quantiles), dtype='float64')
+    if np.any((q <= 0) | (q >= 1)):
+        raise ValueError("Quantiles must be strictly between 0 and 1")
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    if len(x) == 0:
+        raise ValueError("No data to fit")
+
+    # The fit is invariant to an affine change of x, so the standardized parameters are converted back at the end
+    center = x.mean()
+    scale = x.std() or 1.0
+    exog = np.column_stack([np.ones_like(x), (x - center) / scale])
+    p = exog.shape[1]
+    # Per-row cross products, so each weighted X'X and X'y below is a single matrix product
+    exog_outer = (exog[:, :, np.newaxis] * exog[:, np.newaxis, :]).reshape(len(y), p * p)
+    exog_y = exog * y[:, np.newaxis]
+    k = len(q)
+    beta = np.ones((k, p))
+    weights = np.ones((k, len(y)))
+    active = np.ones(k, dtype=bool)
+    history = []
+    n_iter = 0
+
+    while active.any() and n_iter < max_iter:
+        n_iter += 1
+        rows = np.flatnonzero(active)
+        w = weights[rows]
+
+        # Weighted least squares for every active quantile in one batch
+        xtx = (w @ exog_outer).reshape(len(rows), p, p)
+        xty = w @ exog_y
+        new_beta = np.einsum('kij,kj->ki', np.linalg.pinv(xtx), xty)
+
+        resid = y - new_beta @ exog.T
+        small = np.abs(resid) < 0.000001
+        resid[small] = np.where(resid[small] >= 0, 0.000001, -0.000001)
+        qk = q[rows, np.newaxis]
+        resid = np.abs(np.where(resid < 0, qk * resid, (1 - qk) * resid))
+
+        diff = np.max(np.abs(new_beta - beta[rows]), axis=1)
+        beta[rows] = new_beta
+        weights[rows] = 1 / resid
+        active[rows] = diff > p_tol
+
+        # statsmodels stops a quantile whose estimates cycle; checked on the same schedule
+        history = (history + [beta.copy()])[-10:]
+        if n_iter >= 300 and n_iter % 100 == 0:
+            for previous in history[-9:-1]:
+                cycling = active & np.all(beta == previous, axis=1)
+                if cycling.any():
+                    warnings.warn("Convergence cycle detected")
+                    active &= ~cycling
+
+    if active.any():
+        warnings.warn(f"Maximum number of iterations ({max_iter}) reached.")
+    slopes = beta[:, 1] / scale
+    return beta[:, 0] - slopes * center, slopes
@@ -1,14 +1,28 @@
-import scipy.stats as stats
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
 import numpy as np
+import pandas as pd
+from .quantile_regression import fit_quantile_lines
+from .phase_timer import timed_phase
 
 class StatsHelper:
-    def __init__(self, df):
+    def __init__(self, df, cache=None, version=0):
+        """
+        Parameters:
+            df (DataFrame): The data the models are fitted on.
+            cache (FitCache, optional): A cache of model fits. Calls given a `key` are memoized in it.
+            version (int, optional): The dataset version, added to every key so fits of reloaded data are not reused.
+        """
         self.df = df
+        self.cache = cache
+        self.version = version
         self.__check_columns_exist()
 
-    def perform_regression(self, df):
+    @timed_phase('fit')
+    def perform_regression(self, df, key=None):
+        return self.__memoize(('ols', key), lambda: self.__fit_regression(df), key)
+
+    # scipy and statsmodels take over a second to import, so they are imported on first use rather than with the module
+    def __fit_regression(self, df):
+        import statsmodels.api as sm
         X = sm.add_constant(df['PP&E'])
         y = df['Count']
         model = sm.OLS(y, X).fit()
@@ -25,9 +39,14 @@ class StatsHelper:
 
         return slope, intercept, r_value, p_value, residual_std, line_x, line_y
 
-    def perform_quantile_regression(self, df, quantile, x):
+    @timed_phase('fit')
+    def perform_quantile_regression(self, df, quantile, x, key=None):
+        return self.__memoize(('quantreg', key, quantile), lambda: self.__fit_quantile_regression(df, quantile, x), key)
+
+    def __fit_quantile_regression(self, df, quantile, x):
         formula = 'Count ~ Q("PP&E")'
         try:
+            import statsmodels.formula.api as smf
             model = smf.quantreg(formula, df)
             results = model.fit(q=quantile)
             y_pred = results.predict(x[['PP&E']])
@@ -38,7 +57,39 @@ class StatsHelper:
             print("Error in performing quantile regression:", e)
             return None, None, None
 
-    def calculate_confidence_interval(self, df, ci, residual_std, line_x, line_y):
+    @timed_phase('fit')
+    def perform_quantile_regressions(self, df, quantiles, x, key=None):
+        """
+        Fits the quantile regression of 'Count' on 'PP&E' for several quantiles in one batch.
+
+        Parameters:
+            df (DataFrame): The data to fit.
+            quantiles (iterable): The quantiles to fit.
+            x (DataFrame): The 'PP&E' values to predict at.
+            key (tuple, optional): The filter state used to memoize the fits.
+
+        Returns:
+            dict: For each quantile, the predictions, slope and intercept, as returned by `perform_quantile_regression`.
+        """
+        quantiles = tuple(quantiles)
+        return self.__memoize(('quantregs', key, quantiles), lambda: self.__fit_quantile_regressions(df, quantiles, x), key)
+
+    def __fit_quantile_regressions(self, df, quantiles, x):
+        try:
+            intercepts, slopes = fit_quantile_lines(df['PP&E'], df['Count'], quantiles)
+            predictions = np.outer(intercepts, np.ones(len(x))) + np.outer(slopes, x['PP&E'].to_numpy())
+            return {q: (pd.Series(predictions[i], index=x.index), slopes[i], intercepts[i])
+                    for i, q in enumerate(quantiles)}
+        except Exception as e:
+            print("Error in performing quantile regression:", e)
+            return {q: (None, None, None) for q in quantiles}
+
+    @timed_phase('fit')
+    def calculate_confidence_interval(self, df, ci, residual_std, line_x, line_y, key=None):
+        return self.__memoize(('ci', key, ci), lambda: self.__confidence_interval(df, ci, residual_std, line_x, line_y), key)
+
+    def __confidence_interval(self, df, ci, residual_std, line_x, line_y):
+        import scipy.stats as stats
         x_bar = np.mean(df['PP&E'])
         n = len(df['PP&E'])
         t_crit = stats.t.ppf((1 + ci/100) / 2, df=n-2)
@@ -47,6 +98,14 @@ class StatsHelper:
         ci_lower = line_y - t_crit * se_forecast
         return ci_upper, ci_lower
     
+    def __memoize(self, key, compute, filter_key):
+        """
+        Returns `compute()`, memoized under the key and the dataset version when a filter key is given and caching is enabled.
+        """
+        if self.cache is None or filter_key is None:
+            return compute()
+        return self.cache.get_or_compute((self.version,) + key, compute)
+
     def __check_columns_exist(self):
         required_columns = ['Company', 'Year', 'Quarter', 'Count', 'PP&E']
         missing_columns = [col for col in required_columns if col not in self.df.columns]
@@ -1,21 +1,39 @@
 import pandas as pd
 import numpy as np
-from config.config import company_aliases_2, quarters_mapping
+from config.config import company_aliases_2
+from data_prep import AliasResolver, apply_schema
+from .date_index import CompanyDateIndex
+from .phase_timer import timed_phase
 
 class VisualizationPreprocessor:
     def __init__(self, df):
         self.df = df
+        self.alias_resolver = AliasResolver(company_aliases_2)
+        self.index = None
         self.__check_columns_exist()
 
     def preprocess_data(self, df):
-        df['Company'] = df['Company'].map(company_aliases_2)
-        df['Date'] = pd.to_datetime(df['Year'].astype(str) + '-' + df['Quarter'].map(quarters_mapping).astype(str))
+        df['Company'] = self.alias_resolver.resolve(df['Company'])
+        df = apply_schema(df)
+        df['Date'] = pd.to_datetime(pd.DataFrame({'year': df['Year'], 'month': (df['Quarter'] - 1) * 3 + 1, 'day': 1}))
         df['Outage per PP&E'] = df['Count'] / self.df['PP&E']
         df['PP&E'] = pd.to_numeric(df['PP&E'], errors='coerce')
         df = df.dropna(subset=['PP&E'])
         return df
 
+    def build_index(self, df):
+        """
+        Builds a company and date index over preprocessed data and returns the data sorted by company and date.
+
+        Filtering and aggregating the returned frame use the index instead of scanning every row.
+        """
+        self.index = CompanyDateIndex(df)
+        return self.index.df
+
+    @timed_phase('filter')
     def filter_dataframe(self, df, selected_companies=None, start_date=None, end_date=None):
+        if self.index is not None and df is self.index.df:
+            return self.index.slice(selected_companies, start_date, end_date)
         df_filtered = df
         if selected_companies is not None:
             df_filtered = df_filtered[df_filtered['Company'].isin(selected_companies)]
@@ -25,9 +43,22 @@ class VisualizationPreprocessor:
             df_filtered = df_filtered[df_filtered['Date'] <= pd.to_datetime(end_date)]
         return df_filtered
 
+    @timed_phase('filter')
+    def aggregate_between(self, df, selected_companies=None, start_date=None, end_date=None):
+        """
+        Averages the measures per company for the selected companies and date range.
+
+        Equivalent to `group_and_aggregate(filter_dataframe(...))`, but computed from prefix sums for indexed data.
+        """
+        if self.index is not None and df is self.index.df:
+            return self.index.aggregate(selected_companies, start_date, end_date)
+        return self.group_and_aggregate(self.filter_dataframe(df, selected_companies, start_date, end_date))
+
+    @timed_phase('filter')
     def group_and_aggregate(self, df):
-        return df.groupby('Company').agg({'Count': 'mean', 'PP&E': 'mean', 'Outage per PP&E': 'mean'}).reset_index()
+        return df.groupby('Company', observed=True).agg({'Count': 'mean', 'PP&E': 'mean', 'Outage per PP&E': 'mean'}).reset_index()
 
+    @timed_phase('filter')
     def grand_total(self, include_grand_total, df):
         if include_grand_total:
             grand_total = df.copy()
@@ -0,0 +1,29 @@
+"""
+Production WSGI entry point for serving the dashboard with a pre-fork server such as gunicorn.
+
+The data is prepared and indexed when this module is imported. With `preload_app` (see `gunicorn.conf.py`) that
+happens once in the master process, and the forked workers share the loaded data copy-on-write instead of each
+preparing their own copy.
+
+The dashboard is configured with the same options as `dashboard.py`, passed in the DASHBOARD_ARGS environment
+variable:
+
+    DASHBOARD_ARGS='--directory datasets --outage_file outage_data.csv --ppe_file ppe.xlsx' gunicorn -c gunicorn.conf.py
+"""
+import gc
+import importlib
+import os
+import shlex
+from dashboard import create_app, parse_args
+
+app = create_app(parse_args(shlex.split(os.environ.get('DASHBOARD_ARGS', ''))))
+server = app.server
+
+# The plotting and statistics libraries are imported on first use. Importing them here instead lets the workers share
+# them, rather than each paying for the import in its first request
+for module in ('plotly.express', 'statsmodels.api', 'statsmodels.formula.api', 'scipy.stats'):
+    importlib.import_module(module)
+
+# Moves everything loaded so far out of the garbage collector's reach, so collections in the workers do not touch
+# (and thereby copy) the shared pages
+gc.freeze()